@@ -1,6 +1,13 @@
-# app.py — SDG Command Center (8-slide deck, black & white)
-# Slides: KPIs, Operations, Donuts & Bars, Map (Holo Earth), What-If, Forecast, OLAP, SDG Insights (interactive visuals)
+# app.py — SDG Command Center (9-slide deck, black & white)
+# Slides: KPIs, Operations, Donuts & Bars, Map (Holo Earth), What-If, Forecast, OLAP, SDG Insights (interactive visuals),
+#         Customers (cohorts & RFM); Operations also ranks daily anomalies
 import os
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from collections import OrderedDict
 import numpy as np
 import pandas as pd
 import streamlit as st
@@ -15,6 +22,14 @@ try:
 except Exception:
     PROPHET_AVAILABLE = False
 
+# ---------- Optional Parquet export ----------
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except Exception:
+    PARQUET_AVAILABLE = False
+
 # ---------- Page ----------
 st.set_page_config(page_title="SDG Command Center — Slides", page_icon="📊", layout="wide")
 pio.templates.default = "plotly_dark"
@@ -41,8 +56,8 @@ WHITE_PALETTE = ["#FFFFFF", "#DADADA", "#BFBFBF", "#A6A6A6", "#8C8C8C"]
 def get_csv_path() -> str:
     return os.getenv("CSV_PATH", r"https://docs.google.com/spreadsheets/d/19bfG7i-rq7CBxb0Ll-h_O8HOvc3L19b-9FVT38aIvc4/edit?usp=sharing")
 
-@st.cache_data(show_spinner=False)
 def load_data(path: str):
+    # cached by DatasetRegistry below, not st.cache_data (which has no memory bound)
     if not os.path.exists(path):
         return None
     df = pd.read_csv(path, encoding="latin1")
@@ -60,7 +75,8 @@ def load_data(path: str):
         raise ValueError("Order date column not found.")
 
     df[date_col] = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.dropna(subset=[date_col]).copy().rename(columns={date_col: "OrderDate"})
+    # positional index: row ids double as keys into the precomputed indexes below
+    df = df.dropna(subset=[date_col]).rename(columns={date_col: "OrderDate"}).reset_index(drop=True)
 
     # ensure essential fields
     defaults = {
@@ -94,13 +110,579 @@ def load_data(path: str):
     df["Month"] = df["OrderDate"].dt.to_period("M").astype(str)
     return df
 
-PATH = get_csv_path()
+# ---------- Customer index (cohorts & RFM) ----------
+# Built once per dataset and then only extended with appended rows, so the customer slide
+# never has to group the full order frame. Arrays are aligned to df row ids; `perm` holds the
+# compacted rows sorted by (customer, day) with CSR `offsets` per customer, `delta` the rows
+# appended since the last compaction.
+COMPACT_RATIO = 0.10
+
+def _pack_pairs(cust, month):
+    # (customer, month) -> single sortable int64; months are offset so negatives stay ordered
+    return (cust.astype(np.int64) << 24) | (month.astype(np.int64) + (1 << 23))
+
+def _new_customer_index():
+    return {
+        "lock": threading.Lock(), "n_rows": 0, "tail": None,
+        "ids": pd.Index([]), "orders": pd.Index([]),
+        "cust": np.empty(0, np.int64), "day": np.empty(0, np.int64), "month": np.empty(0, np.int64),
+        "order_first": np.empty(0, bool), "first_month": np.empty(0, np.int64),
+        "perm": np.empty(0, np.int64), "delta": np.empty(0, np.int64), "offsets": np.zeros(1, np.int64),
+    }
+
+def extend_customer_index(idx, df):
+    """Index rows of df beyond idx['n_rows'] (append-only sources); rebuilds if df was rewritten."""
+    with idx["lock"]:
+        start = idx["n_rows"]
+        rewritten = len(df) < start or (start and df["OrderDate"].iat[start - 1] != idx["tail"])
+        if rewritten:
+            idx.update({k: v for k, v in _new_customer_index().items() if k != "lock"})
+            start = 0
+        if len(df) == start:
+            return idx
+        part = df.iloc[start:]
+        dates = part["OrderDate"].to_numpy()
+        day = dates.astype("datetime64[D]").astype(np.int64)
+        month = dates.astype("datetime64[M]").astype(np.int64)
+
+        if start == 0:
+            cust, ids = pd.factorize(part["Customer Id"])
+            ids = pd.Index(ids)
+            order_first = ~part["Order Id"].duplicated().to_numpy()
+            orders = pd.Index(part["Order Id"].unique())
+        else:
+            ids = idx["ids"]
+            cust = ids.get_indexer(part["Customer Id"])
+            unseen = cust < 0
+            if unseen.any():
+                ids = ids.append(pd.Index(part["Customer Id"][unseen].unique()))
+                cust[unseen] = ids.get_indexer(part["Customer Id"][unseen])
+            order_first = ~(part["Order Id"].duplicated() | part["Order Id"].isin(idx["orders"])).to_numpy()
+            orders = idx["orders"].append(pd.Index(part["Order Id"][order_first].unique()))
+        cust = cust.astype(np.int64)
+
+        first_month = np.full(len(ids), np.iinfo(np.int64).max, np.int64)
+        first_month[:len(idx["first_month"])] = idx["first_month"]
+        np.minimum.at(first_month, cust, month)
+
+        idx["cust"] = np.concatenate([idx["cust"], cust])
+        idx["day"] = np.concatenate([idx["day"], day])
+        idx["month"] = np.concatenate([idx["month"], month])
+        idx["order_first"] = np.concatenate([idx["order_first"], order_first])
+        idx.update(ids=ids, orders=orders, first_month=first_month, n_rows=len(df),
+                   tail=df["OrderDate"].iat[len(df) - 1])
+
+        new_rows = np.arange(start, len(df), dtype=np.int64)
+        delta = np.concatenate([idx["delta"], new_rows])
+        if start == 0 or len(delta) > COMPACT_RATIO * len(idx["perm"]):
+            perm = np.lexsort((idx["day"], idx["cust"]))
+            idx["perm"], idx["delta"] = perm, np.empty(0, np.int64)
+            idx["offsets"] = np.searchsorted(idx["cust"][perm], np.arange(len(ids) + 1))
+        else:
+            idx["delta"] = delta
+        return idx
+
+def build_customer_index(df):
+    return extend_customer_index(_new_customer_index(), df)
+
+def index_snapshot(idx):
+    """Consistent copy of a customer, anomaly or drill index for readers. The extend_* functions
+    replace arrays rather than writing into them, so a shallow copy taken under the index lock
+    never mixes two versions."""
+    with idx["lock"]:
+        return dict(idx)
+
+def customer_rows(idx, code):
+    """Row ids of one customer's orders (sorted compacted rows + any appended since)."""
+    off = idx["offsets"]
+    main = idx["perm"][off[code]:off[code + 1]] if code + 1 < len(off) else np.empty(0, np.int64)
+    extra = idx["delta"][idx["cust"][idx["delta"]] == code]
+    return np.concatenate([main, extra])
+
+def cohort_counts(idx, mask):
+    """Active customers per (first-order month, months since) over the rows selected by mask."""
+    cust, month = idx["cust"], idx["month"]
+    p = idx["perm"][mask[idx["perm"]]]
+    c, m = cust[p], month[p]
+    keep = np.ones(len(p), bool)
+    keep[1:] = (c[1:] != c[:-1]) | (m[1:] != m[:-1])
+    pairs = _pack_pairs(c[keep], m[keep])            # distinct, already sorted
+    d = idx["delta"][mask[idx["delta"]]]
+    if len(d):
+        pairs = np.unique(np.concatenate([pairs, _pack_pairs(cust[d], month[d])]))
+    if not len(pairs):
+        return pd.DataFrame()
+    pc = pairs >> 24
+    pm = (pairs & ((1 << 24) - 1)) - (1 << 23)
+    cohort = idx["first_month"][pc]
+    age = pm - cohort
+    # only customers whose first order is inside the selection belong to a cohort here
+    start = np.ones(len(pc), bool)
+    start[1:] = pc[1:] != pc[:-1]
+    has_first = (age == 0)[start]
+    ok = has_first[np.cumsum(start) - 1]
+    cohort, age = cohort[ok], age[ok]
+    if not len(cohort):
+        return pd.DataFrame()
+    c0 = cohort.min()
+    n_age = int(age.max()) + 1
+    n_coh = int(cohort.max() - c0) + 1
+    counts = np.bincount((cohort - c0) * n_age + age, minlength=n_coh * n_age).reshape(n_coh, n_age)
+    labels = (np.arange(n_coh) + c0).astype("datetime64[M]").astype(str)
+    out = pd.DataFrame(counts, index=labels, columns=np.arange(n_age))
+    return out[out[0] > 0]
+
+def rfm_scores(idx, mask, sales):
+    """Recency/frequency/monetary per customer over the selected rows, scored 1-5 and segmented."""
+    n_c = len(idx["ids"])
+    rows = np.flatnonzero(mask)
+    c = idx["cust"][rows]
+    monetary = np.bincount(c, weights=sales[rows], minlength=n_c)
+    frequency = np.bincount(c[idx["order_first"][rows]], minlength=n_c)
+    # last order day: tail of each customer's run in the sorted rows, then the unsorted delta
+    last = np.full(n_c, np.iinfo(np.int64).min, np.int64)
+    p = idx["perm"][mask[idx["perm"]]]
+    if len(p):
+        pc = idx["cust"][p]
+        ends = np.r_[pc[1:] != pc[:-1], True]
+        last[pc[ends]] = idx["day"][p][ends]
+    d = idx["delta"][mask[idx["delta"]]]
+    if len(d):
+        np.maximum.at(last, idx["cust"][d], idx["day"][d])
+
+    active = np.flatnonzero(np.bincount(c, minlength=n_c) > 0)
+    if not len(active):
+        return pd.DataFrame()
+    ref_day = last[active].max() + 1
+    out = pd.DataFrame({
+        "code": active,
+        "Customer Id": idx["ids"][active],
+        "Recency (days)": ref_day - last[active],
+        "Frequency": frequency[active],
+        "Monetary": monetary[active],
+    })
+
+    def score(col, ascending=True):
+        s = np.ceil(out[col].rank(method="first", pct=True) * 5).clip(1, 5).astype(int)
+        return s if ascending else 6 - s
+    out["R"] = score("Recency (days)", ascending=False)
+    out["F"] = score("Frequency")
+    out["M"] = score("Monetary")
+    out["Segment"] = np.select(
+        [(out["R"] >= 4) & (out["F"] >= 4),
+         out["F"] >= 4,
+         (out["R"] >= 4) & (out["F"] <= 2),
+         (out["R"] <= 2) & (out["F"] >= 3),
+         (out["R"] <= 2)],
+        ["Champions", "Loyal", "New / Promising", "At Risk", "Hibernating"],
+        default="Needs Attention")
+    return out
+
+# ---------- Anomaly index (Market × Segment × Category daily series) ----------
+# Daily sales / order / late counts are kept as (days × series) matrices and scored with a
+# robust z-score: residual against the trailing median, minus the same-weekday residual of the
+# previous four weeks, scaled by the trailing MAD. Pandas rolling works column-wise on the whole
+# matrix, so there is no per-series Python loop; appended rows only rescore the days they touch.
+SERIES_KEYS = ["Market", "Customer Segment", "Category Name"]
+ANOMALY_WINDOW = 28
+ANOMALY_MIN_ORDERS = 5
+ANOMALY_HISTORY = 3 * ANOMALY_WINDOW + 4 * 7 + 1   # days of context needed to rescore one day
+
+def _new_anomaly_index():
+    return {"lock": threading.Lock(), "n_rows": 0, "tail": None, "day0": 0,
+            "series": None, "sales": None, "orders": None, "late": None,
+            "z_sales": None, "z_late": None, "exp_sales": None, "exp_late": None}
+
+def _robust_z(x, rel_floor=0.0, abs_floor=0.0, window=ANOMALY_WINDOW):
+    """Robust z-scores and expected values for every column of a (days × series) array."""
+    X = pd.DataFrame(x)
+    base = X.shift(1).rolling(window, min_periods=window // 2).median()
+    resid = (X - base).to_numpy()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN weekday slices early on
+        lags = np.full((4,) + resid.shape, np.nan)
+        for k in range(1, 5):
+            lags[k - 1, 7 * k:] = resid[:-7 * k] if len(resid) > 7 * k else np.nan
+        seasonal = np.nan_to_num(np.nanmedian(lags, axis=0))
+    r = resid - seasonal
+    dev = pd.DataFrame(np.abs(r)).shift(1).rolling(window, min_periods=window // 2)
+    mad, mean_ad = dev.median().to_numpy(), dev.mean().to_numpy()
+    expected = base.to_numpy() + seasonal
+    # intermittent series have MAD = 0; fall back to the mean absolute deviation there
+    scale = np.where(mad > 0, 1.4826 * mad, 1.2533 * mean_ad)
+    scale = np.maximum(np.maximum(scale, rel_floor * np.abs(expected)), abs_floor)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = r / scale
+    return z, expected
+
+def _grow(a, shape):
+    out = np.zeros(shape)
+    if a is not None:
+        out[:a.shape[0], :a.shape[1]] = a
+    return out
+
+def extend_anomaly_index(ax, df):
+    """Add rows of df beyond ax['n_rows'] and rescore only the affected days."""
+    with ax["lock"]:
+        start = ax["n_rows"]
+        rewritten = len(df) < start or (start and df["OrderDate"].iat[start - 1] != ax["tail"])
+        day = None
+        if not rewritten and len(df) > start:
+            day = df["OrderDate"].to_numpy()[start:].astype("datetime64[D]").astype(np.int64)
+            rewritten = start and day.min() < ax["day0"]
+        if rewritten:
+            ax.update({k: v for k, v in _new_anomaly_index().items() if k != "lock"})
+            start, day = 0, None
+        if len(df) == start:
+            return ax
+        part = df.iloc[start:]
+        if day is None:
+            day = part["OrderDate"].to_numpy().astype("datetime64[D]").astype(np.int64)
+        if start == 0:
+            ax["day0"] = int(day.min())
+
+        keys = pd.MultiIndex.from_frame(part[SERIES_KEYS].astype(str))
+        if ax["series"] is None:
+            codes, series = keys.factorize()
+        else:
+            series = ax["series"]
+            codes = series.get_indexer(keys)
+            unseen = codes < 0
+            if unseen.any():
+                series = series.append(keys[unseen].unique())
+                codes[unseen] = series.get_indexer(keys[unseen])
+        off = day - ax["day0"]
+        n_days = max(int(off.max()) + 1, 0 if ax["sales"] is None else ax["sales"].shape[0])
+        shape = (n_days, len(series))
+        flat = off * shape[1] + codes
+        size = shape[0] * shape[1]
+        sales, orders, late = (_grow(ax[k], shape) for k in ("sales", "orders", "late"))
+        sales += np.bincount(flat, weights=part["Sales"].to_numpy(dtype=float), minlength=size).reshape(shape)
+        orders += np.bincount(flat, minlength=size).reshape(shape)
+        late += np.bincount(flat, weights=part["is_late"].to_numpy(dtype=float), minlength=size).reshape(shape)
+
+        # rescore from the earliest touched day, with enough history for the rolling windows
+        first = int(off.min())
+        lo = max(0, first - ANOMALY_HISTORY)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(orders[lo:] > 0, late[lo:] / orders[lo:], np.nan)
+        zs, es = _robust_z(sales[lo:], rel_floor=0.10, abs_floor=1.0)
+        zl, el = _robust_z(rate, abs_floor=0.02)
+        thin = orders[lo:] < ANOMALY_MIN_ORDERS
+        zs[thin], zl[thin] = np.nan, np.nan
+        for k, v in (("z_sales", zs), ("exp_sales", es), ("z_late", zl), ("exp_late", el)):
+            full = _grow(ax[k], shape)
+            full[first:] = v[first - lo:]
+            ax[k] = full
+        ax.update(series=series, sales=sales, orders=orders, late=late, n_rows=len(df),
+                  tail=df["OrderDate"].iat[len(df) - 1])
+        return ax
+
+def build_anomaly_index(df):
+    return extend_anomaly_index(_new_anomaly_index(), df)
+
+def anomalies_table(ax, markets, segments, d1, d2, metric="Both", z_thr=3.5, top=50):
+    """Ranked anomalies (|z| ≥ z_thr) for the selected markets/segments and date range."""
+    series = ax["series"]
+    if series is None:
+        return pd.DataFrame()
+    cols = np.ones(len(series), bool)
+    if markets: cols &= series.get_level_values(0).isin([str(m) for m in markets])
+    if segments: cols &= series.get_level_values(1).isin([str(s) for s in segments])
+    lo = max(0, (np.datetime64(d1, "D").astype(np.int64)) - ax["day0"])
+    hi = min(ax["sales"].shape[0], (np.datetime64(d2, "D").astype(np.int64)) - ax["day0"] + 1)
+    if hi <= lo or not cols.any():
+        return pd.DataFrame()
+    picks = [("Late rate", "z_late", "exp_late"), ("Sales", "z_sales", "exp_sales")]
+    if metric != "Both":
+        picks = [p for p in picks if p[0] == metric]
+    out = []
+    col_ids = np.flatnonzero(cols)
+    for name, zk, ek in picks:
+        z = ax[zk][lo:hi][:, col_ids]
+        d, c = np.nonzero(np.abs(np.nan_to_num(z)) >= z_thr)
+        if not len(d):
+            continue
+        c_full, d_full = col_ids[c], d + lo
+        orders = ax["orders"][d_full, c_full]
+        if name == "Sales":
+            value = ax["sales"][d_full, c_full]
+        else:
+            value = ax["late"][d_full, c_full] / np.maximum(orders, 1)
+        out.append(pd.DataFrame({
+            "Date": (d_full + ax["day0"]).astype("datetime64[D]"),
+            "Market": series.get_level_values(0)[c_full],
+            "Segment": series.get_level_values(1)[c_full],
+            "Category": series.get_level_values(2)[c_full],
+            "Metric": name, "Value": value, "Expected": ax[ek][d_full, c_full],
+            "z": z[d, c], "Orders": orders.astype(int),
+        }))
+    if not out:
+        return pd.DataFrame()
+    res = pd.concat(out, ignore_index=True)
+    return res.reindex(res["z"].abs().sort_values(ascending=False).index).head(top).reset_index(drop=True)
+
+# ---------- Drill-through index (group -> row ids) ----------
+# For each drill dimension, row ids grouped by value (CSR: `perm` sorted by (value, row) plus
+# `offsets`); rows appended since the last compaction sit in `delta`. A cell's orders are the
+# intersection of a few sorted row-id arrays, fetched a page at a time with df.take.
+DRILL_DIMS = ["Market", "Customer Segment", "Category Name", "Order Country", "Order City", "Order Year"]
+DRILL_COLUMNS = ["Order Id", "OrderDate", "Customer Id", "Market", "Customer Segment", "Order Country",
+                 "Order City", "Category Name", "Sales", "Order Profit Per Order", "is_late"]
+
+def _new_drill_index():
+    return {"lock": threading.Lock(), "n_rows": 0, "tail": None, "dims": {}}
+
+def extend_drill_index(dx, df):
+    """Index rows of df beyond dx['n_rows'] for every drill dimension."""
+    with dx["lock"]:
+        start = dx["n_rows"]
+        if len(df) < start or (start and df["OrderDate"].iat[start - 1] != dx["tail"]):
+            dx.update(n_rows=0, tail=None, dims={})
+            start = 0
+        if len(df) == start:
+            return dx
+        new_rows = np.arange(start, len(df), dtype=np.int64)
+        dims = {}                                        # fresh dicts: snapshots keep the old ones
+        for dim in DRILL_DIMS:
+            col = df[dim].iloc[start:]
+            d = dx["dims"].get(dim)
+            if d is None:
+                codes, values = pd.factorize(col, sort=True)
+                d = {"values": pd.Index(values), "codes": np.empty(0, np.int64),
+                     "perm": np.empty(0, np.int64), "offsets": np.zeros(1, np.int64), "delta": np.empty(0, np.int64)}
+            else:
+                d = dict(d)
+                codes = d["values"].get_indexer(col)
+                unseen = codes < 0
+                if unseen.any():
+                    d["values"] = d["values"].append(pd.Index(col[unseen].unique()))
+                    codes[unseen] = d["values"].get_indexer(col[unseen])
+            d["codes"] = np.concatenate([d["codes"], codes.astype(np.int64)])
+            delta = np.concatenate([d["delta"], new_rows])
+            if start == 0 or len(delta) > COMPACT_RATIO * len(d["perm"]):
+                d["perm"] = np.argsort(d["codes"], kind="stable")
+                d["offsets"] = np.searchsorted(d["codes"][d["perm"]], np.arange(len(d["values"]) + 1))
+                d["delta"] = np.empty(0, np.int64)
+            else:
+                d["delta"] = delta
+            dims[dim] = d
+        dx.update(dims=dims, n_rows=len(df), tail=df["OrderDate"].iat[len(df) - 1])
+        return dx
+
+def build_drill_index(df):
+    return extend_drill_index(_new_drill_index(), df)
+
+def _intersect_sorted(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    pos = np.searchsorted(b, a).clip(0, len(b) - 1)
+    return a[b[pos] == a]
+
+def drill_rows(dx, selection: dict, within=None):
+    """Sorted row ids matching every {dimension: value} in selection, restricted to `within`."""
+    arrays = []
+    for dim, value in selection.items():
+        d = dx["dims"][dim]
+        code = d["values"].get_indexer([value])[0]
+        if code < 0:
+            return np.empty(0, np.int64)
+        off = d["offsets"]
+        main = d["perm"][off[code]:off[code + 1]] if code + 1 < len(off) else np.empty(0, np.int64)
+        extra = d["delta"][d["codes"][d["delta"]] == code]
+        arrays.append(np.concatenate([main, extra]))   # delta rows are all newer, so still sorted
+    if within is not None:
+        arrays.append(np.asarray(within, dtype=np.int64))
+    if not arrays:
+        return np.empty(0, np.int64)
+    arrays.sort(key=len)
+    rows = arrays[0]
+    for other in arrays[1:]:
+        rows = _intersect_sorted(rows, other)
+    return rows
+
+def drill_through(key, dims, within=None):
+    """Pick one value per dimension (a cell of the view above) and page through its orders."""
+    dims = [d for d in dims if d in DRILL_DIMS]
+    if not dims: return
+    with st.expander("🔎 Drill-through — orders behind a number"):
+        dx = session_index("drill", build_drill_index, extend_drill_index)
+        cols = st.columns(len(dims))
+        selection = {}
+        for col, dim in zip(cols, dims):
+            with col:
+                v = st.selectbox(dim, ["(any)"] + dx["dims"][dim]["values"].tolist(), key=f"{key}_drill_{dim}")
+            if v != "(any)":
+                selection[dim] = v
+        if not selection:
+            st.caption("Choose at least one value to list its orders.")
+            return
+        rows = drill_rows(dx, selection, f.index.to_numpy() if within is None else within)
+        page_size = 50
+        n_pages = max(1, -(-len(rows) // page_size))
+        a, b = st.columns([1, 3])
+        with a:
+            page = st.number_input("Page", 1, n_pages, 1, key=f"{key}_drill_page")
+        with b:
+            st.caption(f"{len(rows):,} matching rows — page {min(page, n_pages)} of {n_pages}")
+        page = min(page, n_pages)
+        show = [c for c in DRILL_COLUMNS if c in df.columns]
+        st.dataframe(df.take(rows[(page - 1) * page_size:page * page_size])[show],
+                     use_container_width=True, hide_index=True)
+
+# ---------- Dataset registry (memory-budgeted frame cache) ----------
+# One process-wide registry holds every loaded dataset plus its derived indexes. Entries are
+# evicted least-recently-used first whenever resident bytes would exceed DATA_MEMORY_BUDGET_MB,
+# and a file is refused up front if its estimated in-memory size cannot fit at all.
+LOAD_SIZE_FACTOR = 5   # rough in-memory bytes per CSV byte, used before a file is parsed
+
+def get_datasets() -> dict:
+    """Datasets offered in the sidebar: DATASETS='Name=path;Name2=path2', else CSV_PATH."""
+    spec = os.getenv("DATASETS", "").strip()
+    if not spec:
+        return {"Default": get_csv_path()}
+    pairs = [item.split("=", 1) for item in spec.split(";") if "=" in item]
+    return {name.strip(): path.strip() for name, path in pairs}
+
+def get_memory_budget() -> int:
+    return int(float(os.getenv("DATA_MEMORY_BUDGET_MB", "2048")) * 1024**2)
+
+def _nbytes(obj) -> int:
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True, index=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    if isinstance(obj, dict):
+        return sum(_nbytes(v) for v in obj.values())
+    return 0
+
+class DatasetRegistry:
+    def __init__(self, budget: int):
+        self.budget = budget
+        self._lock = threading.RLock()
+        self._loading = {}                       # name -> lock, so each file is parsed once
+        self._entries = OrderedDict()            # name -> entry, oldest use first
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(e["frame_bytes"] + sum(e["derived_bytes"].values()) for e in self._entries.values())
+
+    def _evict_for(self, need: int, keep: str):
+        # caller holds the lock; drop LRU entries (never `keep`) until `need` more bytes fit
+        for name in [n for n in self._entries if n != keep]:
+            if self.resident_bytes() + need <= self.budget:
+                break
+            del self._entries[name]
+
+    def get(self, name: str, path: str):
+        """Frame for a dataset, loading it (and evicting others) if it is not resident."""
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        with self._lock:
+            e = self._entries.get(name)
+            if e is not None and e["path"] == path and e["mtime"] == mtime:
+                self._entries.move_to_end(name)
+                return e["df"]
+            load_lock = self._loading.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                e = self._entries.get(name)
+                if e is not None and e["path"] == path and e["mtime"] == mtime:
+                    self._entries.move_to_end(name)
+                    return e["df"]
+                if mtime is None:
+                    return None
+                estimate = os.path.getsize(path) * LOAD_SIZE_FACTOR
+                if estimate > self.budget:
+                    raise MemoryError(f"Dataset '{name}' needs ~{estimate/1024**2:,.0f} MB, "
+                                      f"over the {self.budget/1024**2:,.0f} MB budget.")
+                self._evict_for(estimate, keep=name)
+            df = load_data(path)
+            size = _nbytes(df)
+            with self._lock:
+                old = self._entries.pop(name, None)
+                if size > self.budget:
+                    raise MemoryError(f"Dataset '{name}' uses {size/1024**2:,.0f} MB, "
+                                      f"over the {self.budget/1024**2:,.0f} MB budget.")
+                # a changed file keeps its indexes; they extend themselves from the new frame
+                derived = old["derived"] if old is not None and old["path"] == path else {}
+                self._entries[name] = {
+                    "path": path, "mtime": mtime, "df": df, "frame_bytes": size,
+                    "derived": derived, "derived_bytes": {k: _nbytes(v) for k, v in derived.items()},
+                    "loaded_at": pd.Timestamp.now(), "hits": 0,
+                }
+                self._evict_for(0, keep=name)
+            return df
+
+    def derived(self, name: str, key: str, df, build, update=None):
+        """Index over the session's frame `df`: built once per resident dataset, then passed
+        through `update`. If the dataset was evicted or reloaded since the session got df, the
+        index is built for df alone and not cached (its row ids must match the session's df)."""
+        with self._lock:
+            e = self._entries.get(name)
+            if e is not None and e["df"] is df:
+                self._entries.move_to_end(name)
+                e["hits"] += 1
+                build_lock = self._loading.setdefault((name, key), threading.Lock())
+        if e is None or e["df"] is not df:
+            return build(df)
+        with build_lock:
+            obj = e["derived"].get(key)
+            obj = build(df) if obj is None else (update(obj, df) if update else obj)
+        size = _nbytes(obj)
+        with self._lock:
+            if self._entries.get(name) is e:
+                e["derived"][key] = obj
+                e["derived_bytes"][key] = size
+                self._evict_for(0, keep=name)
+        return obj
+
+    def stats(self) -> pd.DataFrame:
+        with self._lock:
+            rows = [{
+                "Dataset": n,
+                "Frame MB": e["frame_bytes"] / 1024**2,
+                "Index MB": sum(e["derived_bytes"].values()) / 1024**2,
+                "Indexes": ", ".join(sorted(e["derived"])) or "–",
+                "Rows": len(e["df"]),
+                "Loaded": e["loaded_at"].strftime("%H:%M:%S"),
+            } for n, e in reversed(self._entries.items())]
+        return pd.DataFrame(rows)
+
+@st.cache_resource(show_spinner=False)
+def dataset_registry():
+    return DatasetRegistry(get_memory_budget())
+
+def session_index(key, build, update):
+    """Snapshot of a shared index that matches this session's df. Indexes are extended in place
+    on reload, so if another session already moved it on to a newer file, build a private one."""
+    idx = index_snapshot(registry.derived(DATASET, key, df, build, update))
+    if idx["n_rows"] != len(df) or (len(df) and idx["tail"] != df["OrderDate"].iat[-1]):
+        idx = index_snapshot(build(df))
+    return idx
+
+DATASETS = get_datasets()
 st.sidebar.subheader("Data Source")
+DATASET = (st.sidebar.selectbox("Dataset", list(DATASETS), key="dataset")
+           if len(DATASETS) > 1 else next(iter(DATASETS)))
+PATH = DATASETS[DATASET]
 st.sidebar.code(PATH, language="text")
-df = load_data(PATH)
+registry = dataset_registry()
+try:
+    df = registry.get(DATASET, PATH)
+except MemoryError as e:
+    st.error(str(e))
+    st.stop()
 if df is None:
     st.error(f"CSV not found at:\n{PATH}")
     st.stop()
+with st.sidebar.expander("Memory"):
+    st.caption(f"Resident {registry.resident_bytes()/1024**2:,.0f} MB of {registry.budget/1024**2:,.0f} MB budget")
+    st.dataframe(registry.stats().style.format({"Frame MB": "{:,.1f}", "Index MB": "{:,.1f}"}),
+                 use_container_width=True, hide_index=True)
 
 # ---------- Filters ----------
 st.sidebar.subheader("Filters")
@@ -128,6 +710,7 @@ SLIDES = [
     "Slide 6 — Forecast",
     "Slide 7 — OLAP Explorer",
     "Slide 8 — SDG Insights (Interactive)",
+    "Slide 9 — Customers (Cohorts & RFM)",
 ]
 
 if "slide_index" not in st.session_state:
@@ -178,6 +761,80 @@ def fig_style(fig, h=340):
     )
     return fig
 
+# ---------- Pivot paging & export ----------
+# The OLAP pivot can run to hundreds of thousands of cells; search, sort, column selection and
+# paging happen here so only one page is sent to the browser, and exports stream to disk in chunks.
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_MAX_AGE_S = 3600   # pivot exports older than this are swept from EXPORT_DIR
+
+def flatten_pivot(pvt, row_dims):
+    """Pivot -> flat frame: one column per row dimension, one string-named column per value column."""
+    if isinstance(pvt, pd.Series):
+        pvt = pvt.to_frame()
+    flat = pvt.copy()
+    flat.columns = [" • ".join(map(str, c)) if isinstance(c, tuple) else str(c) for c in flat.columns]
+    if row_dims:
+        flat = flat.reset_index()
+    else:
+        flat = flat.reset_index(drop=True)
+    return flat
+
+def pivot_page(flat, row_dims, search="", sort_by=None, ascending=False, columns=None, page=1, page_size=50):
+    """One page of the pivot after row search, sort and column selection; returns (page, total rows)."""
+    view = flat
+    if search and row_dims:
+        label = view[row_dims[0]].astype(str)
+        for d in row_dims[1:]:
+            label = label + " " + view[d].astype(str)
+        view = view[label.str.contains(search, case=False, regex=False).to_numpy()]
+    if sort_by in view.columns:
+        view = view.sort_values(sort_by, ascending=ascending, kind="stable")
+    total = len(view)
+    start = (page - 1) * page_size
+    cols = list(row_dims) + [c for c in (columns or []) if c in view.columns]
+    return view.iloc[start:start + page_size][cols], total
+
+def _sweep_exports(out_dir, keep=()):
+    """Delete pivot exports older than EXPORT_MAX_AGE_S (other sessions' included)."""
+    cutoff = time.time() - EXPORT_MAX_AGE_S
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name.startswith("pivot_") and path not in keep:
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass   # another session got there first
+
+def export_pivot(flat, fmt="CSV", session_tag="", chunk_rows=EXPORT_CHUNK_ROWS) -> str:
+    """Write the full flattened pivot to EXPORT_DIR chunk by chunk; returns the file path.
+    File names carry the session tag so concurrent sessions never share a file."""
+    out_dir = os.getenv("EXPORT_DIR", tempfile.gettempdir())
+    os.makedirs(out_dir, exist_ok=True)
+    _sweep_exports(out_dir)
+    ext = "parquet" if fmt == "Parquet" else "csv"
+    path = os.path.join(out_dir, f"pivot_{session_tag}_{pd.Timestamp.now():%Y%m%d_%H%M%S}.{ext}")
+    if fmt == "Parquet":
+        # one schema from the whole frame: a chunk's own inference turns an all-None column into null
+        schema = pa.Schema.from_pandas(flat, preserve_index=False)
+        with pq.ParquetWriter(path, schema) as writer:   # opened first, so zero rows still make a file
+            for start in range(0, len(flat), chunk_rows):
+                writer.write_table(pa.Table.from_pandas(flat.iloc[start:start + chunk_rows],
+                                                        schema=schema, preserve_index=False))
+    else:
+        with open(path, "w", newline="", encoding="utf-8") as fh:
+            flat.iloc[:0].to_csv(fh, index=False)              # header, even with no rows
+            for start in range(0, len(flat), chunk_rows):
+                flat.iloc[start:start + chunk_rows].to_csv(fh, index=False, header=False)
+    return path
+
+def _file_reader(path):
+    """download_button data that reads the file only when the user clicks."""
+    def read():
+        with open(path, "rb") as fh:
+            return fh.read()
+    return read
+
 # ---------- Slide functions ----------
 def slide_1_kpis():
     st.markdown("## Executive KPIs")
@@ -235,6 +892,22 @@ def slide_2_ops():
     risk = f.pivot_table(index="Market", columns="Customer Segment", values="SLA_Breach", aggfunc="mean")*100
     fig_h = px.imshow(risk.fillna(0), aspect="auto", color_continuous_scale="Reds", labels=dict(color="Breach %"))
     fig_style(fig_h, h=420); st.plotly_chart(fig_h, use_container_width=True)
+    drill_through("ops", ["Market", "Customer Segment"])
+
+    st.markdown("<div class='space'></div>", unsafe_allow_html=True)
+    st.markdown("### Anomalies (Market × Segment × Category, daily)")
+    ax = session_index("anomalies", build_anomaly_index, extend_anomaly_index)
+    c1, c2, c3 = st.columns(3)
+    with c1: metric = st.radio("Metric", ["Both", "Late rate", "Sales"], horizontal=True, key="an_metric")
+    with c2: z_thr = st.slider("Robust z threshold", 2.0, 8.0, 3.5, 0.5, key="an_z")
+    with c3: top = st.slider("Top N", 10, 200, 50, 10, key="an_top")
+    an = anomalies_table(ax, mk, sg, d1, d2, metric, z_thr, top)
+    if yr and len(an): an = an[pd.DatetimeIndex(an["Date"]).year.isin(yr)]
+    if an.empty:
+        st.info("No anomalies above the threshold in the current selection.")
+    else:
+        st.dataframe(an.style.format({"Value": "{:,.2f}", "Expected": "{:,.2f}", "z": "{:+.1f}"}),
+                     use_container_width=True, height=360)
 
 def slide_3_composition():
     st.markdown("## Composition — Donuts & Bars")
@@ -290,6 +963,7 @@ def slide_4_map():
         fig.update_layout(coloraxis_colorbar=dict(title="Breach %"),
                           margin=dict(l=10, r=10, t=20, b=10), height=520)
         st.plotly_chart(fig, use_container_width=True)
+        drill_through("map", ["Order Country"])
         return
 
     # Fallback to lat/lon bubbles
@@ -377,6 +1051,9 @@ def slide_6_forecast():
         fig.add_scatter(x=s["ds"], y=s["ma"], name="MA(6)", line_color="#BFBFBF")
         fig_style(fig); st.plotly_chart(fig, use_container_width=True)
 
+def _reset_olap_page():
+    st.session_state.olap_page = 1
+
 def slide_7_olap():
     st.markdown("## OLAP Explorer — Slice · Dice · Drill")
     if not len(f): st.info("No data."); return
@@ -432,7 +1109,50 @@ def slide_7_olap():
         return
 
     st.markdown("### Pivot Table")
-    st.dataframe(pvt)
+    flat = flatten_pivot(pvt, row_dims)
+    value_cols = [c for c in flat.columns if c not in row_dims]
+    p1, p2, p3, p4 = st.columns([1.4, 1.2, 0.8, 0.6])
+    with p1:
+        search = st.text_input("Search rows", key="olap_search", disabled=not row_dims, on_change=_reset_olap_page)
+    with p2:
+        sort_by = st.selectbox("Sort by", ["(pivot order)"] + value_cols, key="olap_sort", on_change=_reset_olap_page)
+    with p3:
+        ascending = st.radio("Order", ["Desc", "Asc"], horizontal=True, key="olap_order",
+                             on_change=_reset_olap_page) == "Asc"
+    with p4:
+        page_size = st.selectbox("Rows/page", [25, 50, 100, 250], index=1, key="olap_page_size",
+                                 on_change=_reset_olap_page)
+    show_cols = st.multiselect("Columns", value_cols, default=value_cols[:30], key="olap_show_cols")
+    # page widget reads the filtered size from the previous run's total, then is clamped
+    page = int(st.session_state.get("olap_page", 1))
+    view, total = pivot_page(flat, row_dims, search, sort_by, ascending, show_cols, page, page_size)
+    n_pages = max(1, -(-total // page_size))
+    if page > n_pages:
+        page = st.session_state.olap_page = n_pages
+        view, total = pivot_page(flat, row_dims, search, sort_by, ascending, show_cols, page, page_size)
+    st.dataframe(view, use_container_width=True, hide_index=True)
+    drill_through("olap", row_dims + col_dims, within=df_.index.to_numpy())
+    n1, n2, n3 = st.columns([1, 2, 2])
+    with n1:
+        st.number_input("Page", 1, n_pages, key="olap_page")
+    with n2:
+        st.caption(f"{total:,} rows × {len(value_cols):,} columns — page {page} of {n_pages}")
+    with n3:
+        formats = ["CSV", "Parquet"] if PARQUET_AVAILABLE else ["CSV"]
+        e1, e2 = st.columns(2)
+        with e1: fmt = st.selectbox("Export", formats, key="olap_export_fmt", label_visibility="collapsed")
+        with e2:
+            if st.button("Export full pivot", key="olap_export"):
+                old = st.session_state.get("olap_export_path")
+                if old and os.path.exists(old):
+                    os.remove(old)   # one export per session on disk
+                tag = st.session_state.setdefault("olap_export_tag", uuid.uuid4().hex[:12])
+                st.session_state.olap_export_path = export_pivot(flat, fmt, tag)
+        if st.session_state.get("olap_export_path") and os.path.exists(st.session_state.olap_export_path):
+            path = st.session_state.olap_export_path
+            # the file is only read when the button is clicked, not on every rerun
+            st.download_button(f"Download {os.path.basename(path)}", _file_reader(path),
+                               file_name=os.path.basename(path), key="olap_download")
 
     st.markdown("<div class='space'></div>", unsafe_allow_html=True)
 
@@ -444,10 +1164,16 @@ def slide_7_olap():
         topk = st.slider("Top-K rows by total", 5, 30, 10, key="olap_topk")
 
     if chart_type == "Heatmap":
-        fig = px.imshow(
-            pvt if isinstance(pvt, pd.DataFrame) else pvt.to_frame(),
-            color_continuous_scale="Blues", aspect="auto", labels=dict(color=measure)
-        )
+        # only the current page and the selected columns, like the table above
+        cells = view.drop(columns=row_dims)
+        if row_dims:
+            cells.index = view[row_dims].astype(str).agg(" • ".join, axis=1)
+        else:
+            cells.index = [measure]
+        if cells.empty:
+            st.info("Nothing to chart on this page.")
+            return
+        fig = px.imshow(cells, color_continuous_scale="Blues", aspect="auto", labels=dict(color=measure))
         fig_style(fig, h=460)
         st.plotly_chart(fig, use_container_width=True)
     else:
@@ -543,6 +1269,7 @@ def slide_8_sdg():
         fig_style(fig_city, h=360)
         st.plotly_chart(fig_city, use_container_width=True)
         st.caption("City-level hotspots for operational root cause (lanes, lead-times, carriers).")
+        drill_through("sdg", ["Order City"])
 
     # Seasonality — heatmap of Late % Month × Market + CO2 proxy line
     with r2b:
@@ -585,6 +1312,78 @@ def slide_8_sdg():
 
     st.caption("Focus on the markets (late%), categories (high-sales/low-margin), and cities (hotspots) above to lift SDG-aligned outcomes.")
 
+# ---------- Slide 9 — Customers (cohorts & RFM on the customer index) ----------
+def slide_9_customers():
+    st.markdown("## Customers — Cohort Retention & RFM")
+    if not len(f): st.info("No data."); return
+    cix = session_index("customers", build_customer_index, extend_customer_index)
+    mask = np.zeros(len(df), bool)
+    mask[f.index.to_numpy()] = True
+
+    rfm = rfm_scores(cix, mask, df["Sales"].to_numpy())
+    c1, c2, c3, c4 = st.columns(4)
+    n_cust = len(rfm)
+    with c1: card_kpi("Customers", f"{n_cust:,}")
+    with c2: card_kpi("Repeat Rate", f"{(rfm['Frequency'] > 1).mean()*100:,.1f}%" if n_cust else "–")
+    with c3: card_kpi("Orders / Customer", f"{rfm['Frequency'].mean():,.2f}" if n_cust else "–")
+    with c4: card_kpi("Revenue / Customer", f"${rfm['Monetary'].mean():,.0f}" if n_cust else "–")
+    st.markdown("<div class='space'></div>", unsafe_allow_html=True)
+
+    # Cohort retention
+    a, h, b = st.columns([1, 1, 1])
+    with a:
+        n_coh = st.slider("Cohorts (latest N months)", 6, 36, 12, key="cust_ncoh")
+    with h:
+        n_age = st.slider("Months since first order (up to)", 1, 36, 12, key="cust_nage")
+    with b:
+        view = st.radio("Cohort metric", ["Retention %", "Active customers"], horizontal=True, key="cust_view")
+    counts = cohort_counts(cix, mask)
+    if counts.empty:
+        st.info("No cohorts in the current selection.")
+    else:
+        counts = counts.tail(n_coh)
+        counts = counts.loc[:, counts.columns[counts.columns <= n_age]]
+        mat = counts.div(counts[0], axis=0)*100 if view == "Retention %" else counts
+        mat = mat.where(counts > 0)
+        fig = px.imshow(mat, aspect="auto", color_continuous_scale="Greys",
+                        labels=dict(x="Months since first order", y="Cohort", color=view))
+        fig_style(fig, h=440); st.plotly_chart(fig, use_container_width=True)
+
+    st.markdown("<div class='space'></div>", unsafe_allow_html=True)
+
+    # RFM segments
+    if not n_cust: return
+    r1, r2 = st.columns([1, 1.2])
+    with r1:
+        seg = (rfm.groupby("Segment").agg(Customers=("code", "size"), Revenue=("Monetary", "sum"))
+               .reset_index().sort_values("Revenue", ascending=False))
+        fig = go.Figure()
+        fig.add_bar(x=seg["Segment"], y=seg["Customers"], name="Customers", marker_color="#FFF")
+        fig.add_bar(x=seg["Segment"], y=seg["Revenue"], name="Revenue", marker_color="#8C8C8C", yaxis="y2")
+        fig.update_layout(barmode="group", yaxis2=dict(overlaying="y", side="right", showgrid=False))
+        fig.update_xaxes(tickangle=-25); fig_style(fig, h=380); st.plotly_chart(fig, use_container_width=True)
+    with r2:
+        pick = st.selectbox("Segment", ["All"] + seg["Segment"].tolist(), key="cust_seg")
+        top = rfm if pick == "All" else rfm[rfm["Segment"] == pick]
+        top = top.nlargest(25, "Monetary").copy()
+        # names come from each customer's first indexed row, not a scan of the frame
+        first_rows = [customer_rows(cix, c)[0] for c in top["code"]]
+        names = df.take(first_rows)
+        top.insert(2, "Name", (names["Customer Fname"].astype(str) + " " + names["Customer Lname"].astype(str)).to_numpy())
+        st.dataframe(top.drop(columns="code"), use_container_width=True, height=380)
+
+    # Customer lookup straight from the per-customer row arrays
+    cid = st.text_input("Customer lookup (Customer Id)", key="cust_lookup").strip()
+    if cid:
+        code = cix["ids"].get_indexer([cid])[0]
+        if code < 0 and cid.lstrip("-").isdigit():
+            code = cix["ids"].get_indexer([int(cid)])[0]
+        if code < 0:
+            st.warning("Customer not found.")
+        else:
+            rows = customer_rows(cix, code)
+            st.dataframe(df.take(rows[mask[rows]]), use_container_width=True)
+
 # ---------- Dispatch ----------
 i = st.session_state.slide_index
 st.markdown(f"### {SLIDES[i]}")
@@ -596,7 +1395,8 @@ elif i == 3: slide_4_map()
 elif i == 4: slide_5_whatif()
 elif i == 5: slide_6_forecast()
 elif i == 6: slide_7_olap()
-else:         slide_8_sdg()
+elif i == 7: slide_8_sdg()
+else:         slide_9_customers()
 
 st.markdown("<div class='bigspace'></div>", unsafe_allow_html=True)
 st.markdown("---")
@@ -0,0 +1,333 @@
+"""In-process fake of the gspread surface jio.py uses, for load tests that burn no API quota.
+
+Run the portal with JIO_FAKE_SHEETS=1 and _authorize_sheets_client() returns a client for the
+process-wide FakeSheetsServer below instead of authorizing against Google. Every API call
+sleeps for the configured latency, counts against an optional per-minute quota (answered with
+429s like the real API) and is recorded in the server's call log. jio_loadtest.py seeds the
+server and drives sessions through the app.
+"""
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import gspread
+from gspread.utils import a1_range_to_grid_range, numericise_all
+
+# Defaults, overridable from the environment (the load-test driver sets them from its flags)
+FAKE_LATENCY_MS = float(os.getenv("FAKE_SHEETS_LATENCY_MS", "120"))
+FAKE_JITTER_MS = float(os.getenv("FAKE_SHEETS_JITTER_MS", "40"))
+FAKE_ERROR_RATE = float(os.getenv("FAKE_SHEETS_429_RATE", "0")) # Fraction of calls answered with a random 429
+FAKE_QUOTA_PER_MINUTE = int(os.getenv("FAKE_SHEETS_QUOTA_PER_MINUTE", "0")) # 0 = no quota
+
+
+class _FakeResponse:
+    """Just enough of a requests.Response for gspread.exceptions.APIError and the request layer."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        self.status_code = status_code
+        self.text = message
+        self.headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+        self._error = {"code": status_code, "message": message, "status": "RESOURCE_EXHAUSTED"}
+
+    def json(self):
+        return {"error": self._error}
+
+
+class FakeSheetsServer:
+    """Holds every fake spreadsheet plus the latency/quota settings and a log of served calls."""
+
+    def __init__(self, latency_ms=FAKE_LATENCY_MS, jitter_ms=FAKE_JITTER_MS,
+                 error_rate=FAKE_ERROR_RATE, quota_per_minute=FAKE_QUOTA_PER_MINUTE, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self._rand = random.Random(seed)
+        self._lock = threading.RLock()
+        self._spreadsheets = {}
+        self._window = [] # Admission times within the last minute, for the quota
+        self.calls = [] # (started_at, method, spreadsheet_id, worksheet_title, seconds, status)
+
+    def client(self):
+        return FakeClient(self)
+
+    def spreadsheet(self, sheet_id, create=True):
+        with self._lock:
+            if sheet_id not in self._spreadsheets:
+                if not create:
+                    raise gspread.exceptions.SpreadsheetNotFound(sheet_id)
+                self._spreadsheets[sheet_id] = FakeSpreadsheet(self, sheet_id)
+            return self._spreadsheets[sheet_id]
+
+    def seed(self, sheet_id, title, rows):
+        """Creates (or overwrites) a worksheet with the given rows, header first. Not logged."""
+        spreadsheet = self.spreadsheet(sheet_id)
+        with self._lock:
+            spreadsheet._sheets[title] = FakeWorksheet(spreadsheet, title, rows)
+            spreadsheet._touch()
+        return spreadsheet._sheets[title]
+
+    def rows(self, sheet_id, title):
+        """A worksheet's cells as the API would return them (strings). Not logged."""
+        return self.spreadsheet(sheet_id, create=False)._sheets[title]._read()
+
+    def reset_log(self):
+        with self._lock:
+            self.calls = []
+            self._window = []
+
+    def clear(self):
+        """Drops every spreadsheet and the call log, e.g. between tests."""
+        with self._lock:
+            self._spreadsheets = {}
+        self.reset_log()
+
+    def _admit(self):
+        """Returns the 429 response for a call the quota or error injection rejects, else None."""
+        with self._lock:
+            now = time.monotonic()
+            if self.quota_per_minute:
+                self._window = [t for t in self._window if now - t < 60]
+                if len(self._window) >= self.quota_per_minute:
+                    return _FakeResponse(429, "Quota exceeded for quota metric 'Read requests'",
+                                         retry_after=max(1, math.ceil(60 - (now - self._window[0]))))
+                self._window.append(now)
+            if self.error_rate and self._rand.random() < self.error_rate:
+                return _FakeResponse(429, "Quota exceeded (injected)")
+            return None
+
+    def request(self, method, spreadsheet_id, title=None):
+        """Simulates one round trip: latency, then the quota check. Raises APIError on a 429."""
+        started = time.time()
+        delay = max(0.0, self.latency_ms + self._rand.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+        time.sleep(delay)
+        rejected = self._admit()
+        with self._lock:
+            self.calls.append((started, method, spreadsheet_id, title, time.time() - started,
+                               rejected.status_code if rejected else 200))
+        if rejected is not None:
+            raise gspread.exceptions.APIError(rejected)
+
+    def summary(self):
+        """Call counts by method and by status over the current log."""
+        with self._lock:
+            calls = list(self.calls)
+        return {"calls": len(calls),
+                "by_method": Counter(call[1] for call in calls),
+                "by_status": Counter(call[5] for call in calls)}
+
+
+class FakeClient:
+    def __init__(self, server):
+        self.server = server
+
+    def open_by_key(self, key):
+        self.server.request("open_by_key", key)
+        return self.server.spreadsheet(key, create=False)
+
+
+class FakeSpreadsheet:
+    def __init__(self, server, sheet_id):
+        self.server = server
+        self.id = sheet_id
+        self._sheets = {}
+        self._modified = time.time()
+
+    def _touch(self):
+        """Moves the modification time on, strictly, so back-to-back writes get distinct times."""
+        with self.server._lock:
+            self._modified = max(time.time(), self._modified + 0.001)
+
+    def get_lastUpdateTime(self):
+        """Drive's modifiedTime for the spreadsheet, as an RFC 3339 string like the real one."""
+        self.server.request("get_lastUpdateTime", self.id)
+        stamp = datetime.fromtimestamp(self._modified, timezone.utc)
+        return stamp.strftime("%Y-%m-%dT%H:%M:%S.") + f"{stamp.microsecond // 1000:03d}Z"
+
+    def worksheet(self, title):
+        self.server.request("worksheet", self.id, title)
+        if title not in self._sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self._sheets[title]
+
+    def worksheets(self):
+        self.server.request("worksheets", self.id)
+        return list(self._sheets.values())
+
+    def add_worksheet(self, title, rows=100, cols=26, **kwargs):
+        self.server.request("add_worksheet", self.id, title)
+        with self.server._lock:
+            self._sheets.setdefault(title, FakeWorksheet(self, title, []))
+            self._touch()
+        return self._sheets[title]
+
+    def get_worksheet_by_id(self, sheet_id):
+        self.server.request("get_worksheet_by_id", self.id)
+        for worksheet in self._sheets.values():
+            if worksheet.id == sheet_id:
+                return worksheet
+        raise gspread.exceptions.WorksheetNotFound(sheet_id)
+
+    def del_worksheet(self, worksheet):
+        self.server.request("del_worksheet", self.id, worksheet.title)
+        with self.server._lock:
+            self._sheets.pop(worksheet.title, None)
+            self._touch()
+
+    def values_batch_get(self, ranges, **kwargs):
+        self.server.request("values_batch_get", self.id)
+        value_ranges = []
+        for range_name in ranges:
+            title, _, cells = range_name.partition("!")
+            worksheet = self._sheets[title.strip("'")]
+            value_ranges.append({"range": range_name, "values": worksheet._read(cells or None)})
+        return {"spreadsheetId": self.id, "valueRanges": value_ranges}
+
+
+class FakeWorksheet:
+    """A worksheet held as a list of rows. Cells keep the value written; reads return strings,
+    except get_all_records, which numericises like gspread does.
+    """
+
+    def __init__(self, spreadsheet, title, rows):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = abs(hash((spreadsheet.id, title))) % 10 ** 9
+        self._rows = [list(row) for row in rows]
+        self.isSheetHidden = False
+
+    @property
+    def client(self):
+        return self.spreadsheet.server.client()
+
+    @property
+    def row_count(self):
+        return max(1000, len(self._rows))
+
+    @property
+    def col_count(self):
+        return max([26] + [len(row) for row in self._rows])
+
+    def _request(self, method):
+        self.spreadsheet.server.request(method, self.spreadsheet.id, self.title)
+
+    def _read(self, range_name=None):
+        with self.spreadsheet.server._lock:
+            if range_name is None:
+                rows = self._rows
+            else:
+                grid = a1_range_to_grid_range(range_name)
+                first_col = grid.get("startColumnIndex", 0)
+                last_col = grid.get("endColumnIndex")
+                rows = [row[first_col:last_col] for row in
+                        self._rows[grid.get("startRowIndex", 0):grid.get("endRowIndex")]]
+            return [["" if cell is None else str(cell) for cell in row] for row in rows]
+
+    def _write(self, range_name, values):
+        with self.spreadsheet.server._lock:
+            grid = a1_range_to_grid_range(range_name) if range_name else {}
+            first_row, first_col = grid.get("startRowIndex", 0), grid.get("startColumnIndex", 0)
+            for i, values_row in enumerate(values):
+                while len(self._rows) <= first_row + i:
+                    self._rows.append([])
+                row = self._rows[first_row + i]
+                for j, value in enumerate(values_row):
+                    row.extend([""] * (first_col + j + 1 - len(row)))
+                    row[first_col + j] = value
+            self.spreadsheet._touch()
+
+    def get_all_values(self, **kwargs):
+        self._request("get_all_values")
+        return self._read()
+
+    def get_all_records(self, **kwargs):
+        self._request("get_all_records")
+        values = self._read()
+        if not values:
+            return []
+        header = values[0]
+        return [dict(zip(header, numericise_all(row + [""] * (len(header) - len(row)))[:len(header)]))
+                for row in values[1:]]
+
+    def get(self, range_name=None, **kwargs):
+        self._request("get")
+        return self._read(range_name)
+
+    def row_values(self, row, **kwargs):
+        self._request("row_values")
+        values = self._read(f"{row}:{row}")
+        return values[0] if values else []
+
+    def col_values(self, col, **kwargs):
+        self._request("col_values")
+        values = [row[col - 1] if len(row) >= col else "" for row in self._read()]
+        while values and values[-1] == "": # The API trims trailing blanks
+            values.pop()
+        return values
+
+    def append_row(self, values, **kwargs):
+        self.append_rows([values])
+
+    def append_rows(self, values, **kwargs):
+        self._request("append_rows")
+        with self.spreadsheet.server._lock:
+            self._rows.extend(list(row) for row in values)
+            self.spreadsheet._touch()
+
+    def update(self, *args, **kwargs):
+        """Accepts both update(range_name, values) and update(values, range_name), like gspread 6."""
+        self._request("update")
+        range_name, values = kwargs.get("range_name"), kwargs.get("values")
+        for arg in args:
+            if isinstance(arg, str):
+                range_name = arg
+            else:
+                values = arg
+        self._write(range_name, values or [])
+
+    def batch_update(self, data, **kwargs):
+        self._request("batch_update")
+        for update in data:
+            self._write(update["range"], update["values"])
+
+    def update_title(self, title):
+        self._request("update_title")
+        with self.spreadsheet.server._lock:
+            sheets = self.spreadsheet._sheets
+            sheets[title] = sheets.pop(self.title)
+            self.title = title
+            self.spreadsheet._touch()
+
+    def hide(self):
+        self._request("hide")
+        self.isSheetHidden = True
+        self.spreadsheet._touch()
+
+    def copy_to(self, destination_spreadsheet_id):
+        self._request("copy_to")
+        server = self.spreadsheet.server
+        copy = server.seed(destination_spreadsheet_id, f"Copy of {self.title}", self._read())
+        return {"sheetId": copy.id, "title": copy.title}
+
+    def clear(self):
+        self._request("clear")
+        with self.spreadsheet.server._lock:
+            self._rows = []
+            self.spreadsheet._touch()
+
+
+_default_server = None
+_default_lock = threading.Lock()
+
+
+def default_server():
+    """The process-wide fake server that JIO_FAKE_SHEETS=1 connects the portal to."""
+    global _default_server
+    with _default_lock:
+        if _default_server is None:
+            _default_server = FakeSheetsServer()
+        return _default_server
@@ -1,9 +1,23 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import gspread
 from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
 import os
+import functools
+import hashlib
+import json
+import math
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from contextlib import contextmanager
 
 # --- Streamlit Page Configuration (MUST BE FIRST STREAMLIT COMMANDS) ---
 # This ensures set_page_config is called only once at the very beginning of the script execution.
@@ -20,7 +34,10 @@ SHEET_CONFIG = {
     "tracker": {"id": "1tq_g6q7tnS2OQjhehSu4lieR3wTOJ-_s0RfItq0XzWI", "name": "Sheet1"},
     "response": {"id": "1pdfnjg9gzRSpecLyw6kXzVmuPCj1ozq_DJGstQHEzdY", "name": "Form Responses 1"},
     "log": {"id": "1K7myr-bi4ry3z_tQyGg25nRJrn9QrGupeP3Tem1z4kQ", "name": "Sheet1"},
-    "blog": {"id": "1uyURjMiA8C1A7Yb5ZVAtUurb7ChCIKwKN7XeJhDP0Cg", "name": "Sheet1"},
+    # count_col: column counted for "rows in use" (default 1 = A); see BLOG_COLUMNS
+    "blog": {"id": "1uyURjMiA8C1A7Yb5ZVAtUurb7ChCIKwKN7XeJhDP0Cg", "name": "Sheet1", "count_col": 4},
+    # Response-sync watermark, kept next to the tracker (created on first use)
+    "sync_state": {"id": "1tq_g6q7tnS2OQjhehSu4lieR3wTOJ-_s0RfItq0XzWI", "name": "Sync State"},
 }
 GOOGLE_CREDS_FILE = "reliance-jio-461118-fe5eb8ae75a7.json"
 ADMIN_PASSWORD = "admin@jio"
@@ -36,6 +53,22 @@ MANAGER_NAMES = [
     "Jio Financial Manager", "Jio Legal Services"
 ]
 
+# Business verticals each manager sees in the Issue Tracker (matched case-insensitively
+# against the tracker's "Business Vertical" column, as submitted through the form). These are
+# placeholders: the real names are the form's Business Vertical options, so deployments put
+# {"manager name": ["vertical", ...]} in JIO_MANAGER_VERTICALS_FILE, which replaces entries here.
+MANAGER_VERTICALS = {
+    "Jio Policy Manager": ["Jio Policy"],
+    "Jio Retail Manager": ["Jio Retail"],
+    "Jio Platforms Manager": ["Jio Platforms"],
+    "Jio Financial Manager": ["Jio Financial Services"],
+    "Jio Legal Services": ["Jio Legal"],
+}
+MANAGER_VERTICALS_FILE = os.getenv("JIO_MANAGER_VERTICALS_FILE", "manager_verticals.json")
+if os.path.exists(MANAGER_VERTICALS_FILE):
+    with open(MANAGER_VERTICALS_FILE, encoding="utf-8") as f:
+        MANAGER_VERTICALS.update({name: list(verticals) for name, verticals in json.load(f).items()})
+
 INTERN_NAMES = [
     "Zishan Mallick", "Satvik Ahlawat", "Trapti Singh", "Ujjwal Akshith Mondreti",
     "Aanchal Verma", "Rohit Mishra"
@@ -99,6 +132,9 @@ RESPONSE_COLUMNS = {
     "date_submission": "Date of Submission"
 }
  
+# The blog sheet's columns are author, title, content, time (A-D). Posts are counted from the
+# time column (SHEET_CONFIG["blog"]["count_col"] = 4): the portal stamps it on every post, while
+# author can be blank, and the API stops a column read at the column's last non-blank cell.
 BLOG_COLUMNS = {
     "author": "author",
     "title": "title",
@@ -115,17 +151,430 @@ LOG_COLUMNS = {
     "timestamp": "Timestamp"
 }
  
+# Tracker fields filled in from the matching form response when they are blank
+RESPONSE_TO_TRACKER_MAP = {
+    RESPONSE_COLUMNS["email_phone"]: TRACKER_COLUMNS["email_phone"],
+    RESPONSE_COLUMNS["description"]: TRACKER_COLUMNS["description"],
+    RESPONSE_COLUMNS["issue_type"]: TRACKER_COLUMNS["issue_type"],
+    RESPONSE_COLUMNS["gov_body"]: TRACKER_COLUMNS["gov_body"],
+    RESPONSE_COLUMNS["priority_level"]: TRACKER_COLUMNS["priority"],
+    RESPONSE_COLUMNS["proposed_resolution"]: TRACKER_COLUMNS["resolution"],
+    RESPONSE_COLUMNS["file"]: TRACKER_COLUMNS["file"],
+    RESPONSE_COLUMNS["date_submission"]: TRACKER_COLUMNS["date"]
+}
+ 
  
+# --- API Call Accounting ---
+# Each script run (rerun) records the Sheets helpers it called and the API calls that went out
+# on its behalf (counts, latency, approximate bytes), tagged with the user and tab. Calls from
+# background workers are tallied per thread. Admins see the numbers in the diagnostics panel,
+# and every finished rerun is appended to a rolling JSON-lines metrics file.
+API_METRICS_FILE = os.getenv("JIO_METRICS_FILE", "jio_api_metrics.jsonl")
+API_METRICS_MAX_BYTES = 5 * 1024 * 1024 # Rolled over to <file>.1 past this size
+API_METRICS_HISTORY = 500 # Finished reruns kept in memory for the panel
+API_LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000]
+
+
+PAYLOAD_SAMPLE_ITEMS = 32 # Longer lists are sized from this many evenly spaced items
+
+
+def _payload_bytes(value):
+    """Approximate wire size of a request or response payload (its JSON encoding), estimated
+    without serializing it: lists longer than PAYLOAD_SAMPLE_ITEMS are sized from a sample of
+    their items, so a full-sheet read costs the same to measure as a small one.
+    Handles (spreadsheets, worksheets) returned by metadata calls count as 0.
+    """
+    if isinstance(value, str):
+        return len(value) + 2
+    if value is None or isinstance(value, (bool, int, float)):
+        return len(str(value))
+    if isinstance(value, dict):
+        return 2 + sum(len(str(key)) + 4 + _payload_bytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        if len(value) <= PAYLOAD_SAMPLE_ITEMS:
+            return 2 + sum(_payload_bytes(item) + 1 for item in value)
+        step = len(value) / PAYLOAD_SAMPLE_ITEMS
+        sample = sum(_payload_bytes(value[int(i * step)]) + 1 for i in range(PAYLOAD_SAMPLE_ITEMS))
+        return 2 + round(sample * len(value) / PAYLOAD_SAMPLE_ITEMS)
+    return 0
+
+
+class ApiMetrics:
+    """Per-rerun and process-wide accounting of helper and Sheets API calls.
+    The current rerun lives in a thread-local: Streamlit runs each session's script on its own
+    thread, so calls land on the rerun that made them. Calls on other threads count as background.
+    """
+
+    def __init__(self, path=API_METRICS_FILE, max_bytes=API_METRICS_MAX_BYTES, history=API_METRICS_HISTORY):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reruns = deque(maxlen=history)
+        self.background = {} # thread name -> {method: [calls, seconds, bytes out, bytes in]}
+        self.histogram = {} # method -> call counts per latency bucket (the last one is "slower")
+
+    def _current(self):
+        return getattr(self._local, "rerun", None)
+
+    def begin_rerun(self):
+        self._local.rerun = {"started": time.time(), "tab": "", "helpers": {}, "api": {}, "errors": 0, "throttled": 0}
+
+    def set_tab(self, tab):
+        rerun = self._current()
+        if rerun is not None:
+            rerun["tab"] = tab
+
+    def record_helper(self, name, seconds):
+        rerun = self._current()
+        if rerun is not None:
+            stats = rerun["helpers"].setdefault(name, [0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+
+    def record_call(self, method, seconds, request, response, error):
+        """Observer for SheetsRequestLayer: one entry per attempt, retries included."""
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        bytes_out, bytes_in = _payload_bytes(request), _payload_bytes(response)
+        rerun = self._current()
+        with self._lock:
+            counts = self.histogram.setdefault(method, [0] * (len(API_LATENCY_BUCKETS_MS) + 1))
+            counts[bisect_left(API_LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+            if rerun is None:
+                target = self.background.setdefault(threading.current_thread().name, {})
+            else:
+                target = rerun["api"]
+                rerun["errors"] += error is not None
+                rerun["throttled"] += status == 429
+            stats = target.setdefault(method, [0, 0.0, 0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] += bytes_out
+            stats[3] += bytes_in
+
+    def end_rerun(self, user):
+        """Closes the current rerun, keeps it for the panel and appends it to the metrics file."""
+        rerun = self._current()
+        if rerun is None:
+            return
+        self._local.rerun = None
+        api = rerun["api"]
+        record = {
+            "time": datetime.fromtimestamp(rerun["started"]).strftime("%Y-%m-%d %H:%M:%S"),
+            "user": user,
+            "tab": rerun["tab"],
+            "seconds": round(time.time() - rerun["started"], 3),
+            "api_calls": sum(stats[0] for stats in api.values()),
+            "api_seconds": round(sum(stats[1] for stats in api.values()), 3),
+            "bytes_out": sum(stats[2] for stats in api.values()),
+            "bytes_in": sum(stats[3] for stats in api.values()),
+            "errors": rerun["errors"],
+            "throttled": rerun["throttled"],
+            "api": {method: {"calls": c, "seconds": round(t, 3), "bytes_out": o, "bytes_in": i}
+                    for method, (c, t, o, i) in api.items()},
+            "helpers": {name: {"calls": c, "seconds": round(t, 3)} for name, (c, t) in rerun["helpers"].items()},
+        }
+        with self._lock:
+            self.reruns.append(record)
+            try:
+                if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError:
+                pass # Metrics must never break a page view
+
+    def recent(self):
+        with self._lock:
+            return list(self.reruns)
+
+    def histogram_frame(self):
+        """API call latency histogram, one row per method."""
+        labels = [f"<{ms}ms" for ms in API_LATENCY_BUCKETS_MS] + [f">={API_LATENCY_BUCKETS_MS[-1]}ms"]
+        with self._lock:
+            rows = {method: list(counts) for method, counts in self.histogram.items()}
+        return pd.DataFrame.from_dict(rows, orient="index", columns=labels).sort_index()
+
+    def background_frame(self):
+        with self._lock:
+            rows = [{"thread": thread, "method": method, "calls": c, "seconds": round(t, 2), "KB in": round(i / 1024, 1)}
+                    for thread, methods in self.background.items() for method, (c, t, o, i) in methods.items()]
+        return pd.DataFrame(rows)
+
+
+@st.cache_resource(show_spinner=False)
+def init_api_metrics():
+    """Initializes the shared API accounting once per process."""
+    return ApiMetrics()
+
+api_metrics = init_api_metrics()
+api_metrics.begin_rerun() # Closed after main(), so module-level setup calls count too
+
+
+def track_helper(fn):
+    """Records each call of a Sheets helper (count and latency, cache hits included) on the current rerun."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            api_metrics.record_helper(fn.__name__, time.perf_counter() - started)
+    return wrapper
+
+
+# --- Sheets Request Layer ---
+# Every Sheets API call goes through one process-wide SheetsRequestLayer: a token bucket keeps
+# the process under the per-minute quota, 429s (and 5xx / connection errors on calls that are
+# safe to repeat) are retried with exponential backoff and full jitter, and identical reads
+# issued at the same time by different sessions share one in-flight request.
+SHEETS_REQUESTS_PER_MINUTE = float(os.getenv("SHEETS_REQUESTS_PER_MINUTE", "60"))
+SHEETS_BURST = int(os.getenv("SHEETS_BURST", "10"))
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "5"))
+SHEETS_BACKOFF_BASE_SECONDS = 1.0
+SHEETS_BACKOFF_MAX_SECONDS = 32.0
+
+
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per second, at most `capacity` saved up."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated = clock()
+
+    def acquire(self):
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1 # Reserve now, so waiting callers queue up in order
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self._sleep(wait)
+
+
+class _Flight:
+    """One in-flight coalesced read; followers wait on `done` and share its outcome."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SheetsRequestLayer:
+    """Rate-limited, retrying, coalescing executor for Sheets API calls.
+    The bucket, sleep and random source are injectable so it can run against a fake server.
+    """
+
+    def __init__(self, bucket, max_retries=SHEETS_MAX_RETRIES, sleep=time.sleep, rand=random.random, observer=None):
+        self.bucket = bucket
+        self.max_retries = max_retries
+        self.observer = observer # Called as observer(method, seconds, request, response, error) per attempt
+        self._sleep = sleep
+        self._rand = rand
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "coalesced": 0}
+
+    @staticmethod
+    def _status(error):
+        return getattr(getattr(error, "response", None), "status_code", None)
+
+    def _retryable(self, error, idempotent):
+        status = self._status(error)
+        if status == 429:
+            return True # Rejected by the quota, so nothing happened; always safe to resend
+        if not idempotent:
+            return False # A 5xx append may still have landed; resending could duplicate rows
+        return (status is not None and status >= 500) or isinstance(error, (ConnectionError, TimeoutError, OSError))
+
+    def _delay(self, error, attempt):
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            retry_after = 0.0
+        backoff = min(SHEETS_BACKOFF_MAX_SECONDS, SHEETS_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        return max(retry_after, backoff * self._rand()) # Full jitter spreads out retrying sessions
+
+    def _execute(self, fn, args, kwargs, idempotent):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            with self._lock:
+                self.stats["calls"] += 1
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                self._observe(fn, args, kwargs, started, None, e)
+                if attempt >= self.max_retries or not self._retryable(e, idempotent):
+                    raise
+                with self._lock:
+                    self.stats["retries"] += 1
+                    self.stats["throttled"] += self._status(e) == 429
+                self._sleep(self._delay(e, attempt))
+                attempt += 1
+            else:
+                self._observe(fn, args, kwargs, started, result, None)
+                return result
+
+    def _observe(self, fn, args, kwargs, started, result, error):
+        if self.observer is not None:
+            request = [args, kwargs] if kwargs else list(args)
+            self.observer(getattr(fn, "__name__", "call"), time.perf_counter() - started, request, result, error)
+
+    def call(self, fn, *args, coalesce_key=None, idempotent=True, **kwargs):
+        """Runs fn(*args, **kwargs) under the rate limit with retries. Calls sharing a
+        coalesce_key while one is in flight get that call's result (treat it as read-only).
+        """
+        if coalesce_key is None:
+            return self._execute(fn, args, kwargs, idempotent)
+        with self._lock:
+            flight = self._inflight.get(coalesce_key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[coalesce_key] = _Flight()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = self._execute(fn, args, kwargs, idempotent)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[coalesce_key]
+            flight.done.set()
+
+
+@st.cache_resource(show_spinner=False)
+def init_sheets_api():
+    """Initializes the shared request layer once per process."""
+    bucket = TokenBucket(SHEETS_REQUESTS_PER_MINUTE / 60.0, SHEETS_BURST)
+    return SheetsRequestLayer(bucket, observer=api_metrics.record_call)
+
+sheets_api = init_sheets_api()
+
+
+def sheets_read(worksheet, method, *args, **kwargs):
+    """Reads through the request layer; identical concurrent reads are coalesced."""
+    key = (worksheet.spreadsheet.id, worksheet.title, method, repr(args), repr(sorted(kwargs.items())))
+    return sheets_api.call(getattr(worksheet, method), *args, coalesce_key=key, **kwargs)
+
+
+def sheets_write(worksheet, method, *args, idempotent=True, **kwargs):
+    """Writes through the request layer. Pass idempotent=False for appends, which are only
+    retried when the quota rejected them outright.
+    """
+    return sheets_api.call(getattr(worksheet, method), *args, idempotent=idempotent, **kwargs)
+
+
 # --- Google Sheets Setup ---
-# Initialize the Google Sheets client once and cache it for efficiency.
+# One connection per process, shared by every session and rerun (st.cache_resource).
+# It re-authorizes when the client gets old or an auth error comes back, and keeps a registry
+# of worksheet handles so reruns make no open_by_key/worksheet metadata calls.
+CLIENT_MAX_AGE_SECONDS = 45 * 60 # Re-authorize well before the 1h service-account token expiry
+# JIO_FAKE_SHEETS=1 talks to the in-process fake in fake_sheets.py instead (used by jio_loadtest.py)
+USE_FAKE_SHEETS = os.getenv("JIO_FAKE_SHEETS", "") == "1"
+
+
+def _authorize_sheets_client():
+    """Builds a freshly authorized gspread client from the service-account secrets."""
+    if USE_FAKE_SHEETS:
+        import fake_sheets
+        return fake_sheets.default_server().client()
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+    creds_dict = st.secrets["google_sheets"]
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+    return gspread.authorize(creds)
+
+
+class SheetsConnection:
+    """Process-wide gspread client plus a registry of worksheet handles keyed by (sheet_id, name)."""
+
+    def __init__(self, authorize, api):
+        self._authorize = authorize
+        self._api = api
+        self._lock = threading.RLock()
+        self._client = None
+        self._authorized_at = 0.0
+        self._spreadsheets = {}
+        self._handles = {}
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None or time.time() - self._authorized_at > CLIENT_MAX_AGE_SECONDS:
+                self.refresh()
+            return self._client
+
+    def refresh(self):
+        """Re-authorizes; cached handles belong to the old session, so they are dropped too."""
+        with self._lock:
+            self._client = self._authorize()
+            self._authorized_at = time.time()
+            self._spreadsheets.clear()
+            self._handles.clear()
+
+    def spreadsheet(self, sheet_id):
+        client = self.client # May re-authorize (and clear handles) before the lookup
+        with self._lock:
+            handle = self._spreadsheets.get(sheet_id)
+        if handle is None:
+            handle = self._api.call(client.open_by_key, sheet_id, coalesce_key=("open_by_key", sheet_id))
+            with self._lock:
+                self._spreadsheets[sheet_id] = handle
+        return handle
+
+    def worksheet(self, sheet_id, worksheet_name):
+        key = (sheet_id, worksheet_name)
+        _ = self.client # May re-authorize (and clear handles) before the lookup
+        with self._lock:
+            handle = self._handles.get(key)
+        if handle is None:
+            handle = self._api.call(self.spreadsheet(sheet_id).worksheet, worksheet_name, coalesce_key=("worksheet",) + key)
+            with self._lock:
+                self._handles[key] = handle
+        return handle
+
+    def invalidate(self, worksheet):
+        """Forgets the handle for a worksheet (and its spreadsheet) so the next lookup re-opens it."""
+        with self._lock:
+            for key, handle in list(self._handles.items()):
+                if handle is worksheet:
+                    del self._handles[key]
+                    self._spreadsheets.pop(key[0], None)
+
+    def handle_error(self, worksheet, error):
+        """Drops stale state after a failed call: the client on 401, the handle on 400/404."""
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        if status == 401:
+            with self._lock:
+                self._client = None
+        elif status in (400, 404) or isinstance(error, gspread.exceptions.WorksheetNotFound):
+            self.invalidate(worksheet)
+
+
+@st.cache_resource(show_spinner=False)
 def init_sheets_client():
-    """Initializes the Google Sheets client and caches it."""
+    """Initializes the shared Google Sheets connection once per process."""
     try:
-        scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-        creds_dict = st.secrets["google_sheets"]
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-        client = gspread.authorize(creds)
-        return client
+        connection = SheetsConnection(_authorize_sheets_client, sheets_api)
+        _ = connection.client # Authorize eagerly so credential problems surface here
+        return connection
     except Exception as e:
         st.error("❌ Failed to initialize Google Sheets client. Please check your credentials.")
         st.error(f"Error: {e}")
@@ -134,72 +583,1670 @@ def init_sheets_client():
 client = init_sheets_client()
  
  
+# The sheet helpers below report failures with st.error on a page. Off the page (the response
+# sync worker has no ScriptRunContext, so st.error there is silently dropped) the caller wraps
+# its work in collect_errors() and gets the messages back instead.
+_error_sink = threading.local()
+
+
+def report_error(message):
+    """Shows message with st.error, or hands it to the enclosing collect_errors() on this thread."""
+    errors = getattr(_error_sink, "errors", None)
+    if errors is None:
+        st.error(message)
+    else:
+        errors.append(message)
+
+
+@contextmanager
+def collect_errors():
+    """Collects report_error messages raised on this thread into the yielded list."""
+    previous = getattr(_error_sink, "errors", None)
+    _error_sink.errors = errors = []
+    try:
+        yield errors
+    finally:
+        _error_sink.errors = previous
+
+
+@track_helper
 def get_worksheet(client, sheet_id, worksheet_name):
-    """Retrieves a Google Sheet worksheet."""
+    """Retrieves a Google Sheet worksheet from the shared handle registry."""
     try:
-        sheet = client.open_by_key(sheet_id)
-        return sheet.worksheet(worksheet_name)
+        return client.worksheet(sheet_id, worksheet_name)
     except gspread.exceptions.SpreadsheetNotFound:
-        st.error(f"Spreadsheet with ID '{sheet_id}' not found. Please verify the ID in SHEET_CONFIG.")
+        report_error(f"Spreadsheet with ID '{sheet_id}' not found. Please verify the ID in SHEET_CONFIG.")
         return None
     except gspread.exceptions.WorksheetNotFound:
-        st.error(f"Worksheet '{worksheet_name}' not found in spreadsheet '{sheet_id}'. Please verify the worksheet name in SHEET_CONFIG.")
+        report_error(f"Worksheet '{worksheet_name}' not found in spreadsheet '{sheet_id}'. Please verify the worksheet name in SHEET_CONFIG.")
         return None
     except Exception as e:
-        st.error(f"An unexpected error occurred while accessing worksheet: {e}")
+        report_error(f"An unexpected error occurred while accessing worksheet: {e}")
         return None
+
+
+def get_sheet(key):
+    """Retrieves the worksheet for a SHEET_CONFIG entry (e.g. "tracker")."""
+    return get_worksheet(client, SHEET_CONFIG[key]["id"], SHEET_CONFIG[key]["name"])
  
  
-def get_dataframe_from_sheet(worksheet):
-    """Retrieves all records from a worksheet as a Pandas DataFrame, cleaning column names."""
-    try:
-        data = worksheet.get_all_records()
+# --- Shared Read Cache ---
+# Worksheet frames are cached process-wide for SHEET_CACHE_TTL_SECONDS, so tab switches and
+# concurrent sessions share one download. The write helpers below patch the cached frame in
+# place (or drop it when they can't), so a session sees its own writes without a re-download.
+# Paged readers cache row counts and row ranges here too, under the same TTL and patching.
+SHEET_CACHE_TTL_SECONDS = float(os.getenv("SHEET_CACHE_TTL_SECONDS", "60"))
+
+
+class SheetReadCache:
+    """Cached DataFrames keyed by (spreadsheet id, worksheet title)."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._frames = {} # key -> (DataFrame, fetched_at)
+        self._counts = {} # key -> (sheet rows incl. header, fetched_at)
+        self._ranges = {} # (key, first_row, last_row) -> (rows, fetched_at)
+        self._tokens = {} # key -> (change probe token, taken_at), see Change Probes below
+
+    @staticmethod
+    def key(worksheet):
+        return (worksheet.spreadsheet.id, worksheet.title)
+
+    def get(self, worksheet, ttl=None):
+        """Returns a private copy of the cached frame, or None if missing or older than ttl."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._frames.get(self.key(worksheet))
+        if entry is None or time.time() - entry[1] > ttl:
+            return None
+        return entry[0].copy()
+
+    def put(self, worksheet, df):
+        with self._lock:
+            self._frames[self.key(worksheet)] = (df.copy(), time.time())
+
+    def has(self, worksheet, ttl=None):
+        """Whether a frame younger than ttl is cached (without copying it)."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._frames.get(self.key(worksheet))
+        return entry is not None and time.time() - entry[1] <= ttl
+
+    def revalidate(self, worksheet, token, probed_at, max_age):
+        """Compares a change-probe token (probed at probed_at) with the one stored for the sheet.
+        If it matches, and was first seen less than max_age ago, every entry fetched since then
+        was still current at probed_at, so that becomes their fetch time and True is returned.
+        Otherwise the token is stored.
+        """
+        key = self.key(worksheet)
+        with self._lock:
+            stored = self._tokens.get(key)
+            if stored is None or stored[0] != token or probed_at - stored[1] > max_age:
+                self._tokens[key] = (token, probed_at)
+                return False
+            taken_at = stored[1]
+            for entries, entry_key in ([(self._frames, key), (self._counts, key)] +
+                                       [(self._ranges, k) for k in self._ranges if k[0] == key]):
+                entry = entries.get(entry_key)
+                if entry is not None and entry[1] >= taken_at:
+                    entries[entry_key] = (entry[0], max(entry[1], probed_at))
+            return True
+
+    def invalidate(self, worksheet):
+        key = self.key(worksheet)
+        with self._lock:
+            self._frames.pop(key, None)
+            self._counts.pop(key, None)
+            for range_key in [k for k in self._ranges if k[0] == key]:
+                del self._ranges[range_key]
+
+    def get_count(self, worksheet, ttl=None):
+        """Number of sheet rows (header included) from a fresh cached frame or count, else None."""
+        ttl = self.ttl if ttl is None else ttl
+        key = self.key(worksheet)
+        with self._lock:
+            frame, count = self._frames.get(key), self._counts.get(key)
+        if frame is not None and not frame[0].empty and time.time() - frame[1] <= ttl:
+            return len(frame[0]) + 1
+        if count is not None and time.time() - count[1] <= ttl:
+            return count[0]
+        return None
+
+    def put_count(self, worksheet, count):
+        with self._lock:
+            self._counts[self.key(worksheet)] = (count, time.time())
+
+    def get_range(self, worksheet, first_row, last_row, ttl=None):
+        """Cached raw rows for sheet rows first_row..last_row, or None if missing or stale."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            entry = self._ranges.get((self.key(worksheet), first_row, last_row))
+        if entry is None or time.time() - entry[1] > ttl:
+            return None
+        return [list(row) for row in entry[0]]
+
+    def put_range(self, worksheet, first_row, last_row, rows):
+        with self._lock:
+            self._ranges[(self.key(worksheet), first_row, last_row)] = ([list(row) for row in rows], time.time())
+
+    def patch_append(self, worksheet, row_data):
+        self.patch_append_rows(worksheet, [row_data])
+
+    def patch_append_rows(self, worksheet, rows):
+        """Adds appended rows to the cached frame; drops the entry if they don't fit it."""
+        with self._lock:
+            count = self._counts.get(self.key(worksheet))
+            if count is not None:
+                self._counts[self.key(worksheet)] = (count[0] + len(rows), count[1])
+            entry = self._frames.get(self.key(worksheet))
+            if entry is None:
+                return
+            df, fetched_at = entry
+            if df.empty or any(len(row) != len(df.columns) for row in rows):
+                del self._frames[self.key(worksheet)]
+                return
+            new_rows = pd.DataFrame([list(row) for row in rows], columns=df.columns)
+            self._frames[self.key(worksheet)] = (pd.concat([df, new_rows], ignore_index=True), fetched_at)
+
+    def patch_row(self, worksheet, row_index, row_data):
+        """Overwrites one data row (1-based sheet row, header is row 1) in the cached frame."""
+        with self._lock:
+            for range_key in [k for k in self._ranges
+                              if k[0] == self.key(worksheet) and k[1] <= row_index <= k[2]]:
+                del self._ranges[range_key] # Cached pages holding the row are stale now
+            entry = self._frames.get(self.key(worksheet))
+            if entry is None:
+                return
+            df, fetched_at = entry
+            position = row_index - 2
+            if not 0 <= position < len(df) or len(row_data) > len(df.columns):
+                del self._frames[self.key(worksheet)]
+                return
+            df = df.copy()
+            for col, value in zip(df.columns, row_data):
+                numeric_ok = pd.api.types.is_numeric_dtype(df[col]) and isinstance(value, (int, float))
+                if df[col].dtype != object and not numeric_ok:
+                    df[col] = df[col].astype(object) # Sheets cells are loosely typed
+                df.at[position, col] = value
+            self._frames[self.key(worksheet)] = (df, fetched_at)
+
+    def patch_cells(self, worksheet, payload):
+        """Applies batch_update blocks to the cached frame, keeping its fetch time. Drops the frame
+        if a block falls outside it, the row count if rows were added, and pages holding a written row.
+        """
+        key = self.key(worksheet)
+        grids = [(gspread.utils.a1_range_to_grid_range(block["range"]), block["values"]) for block in payload]
+        with self._lock:
+            count = self._counts.get(key)
+            if count is not None and any(grid["endRowIndex"] > count[0] for grid, _ in grids):
+                del self._counts[key] # Rows were added past the end
+            for grid, _ in grids:
+                for range_key in [k for k in self._ranges if k[0] == key
+                                  and k[1] <= grid["endRowIndex"] and grid["startRowIndex"] + 1 <= k[2]]:
+                    del self._ranges[range_key]
+            entry = self._frames.get(key)
+            if entry is None:
+                return
+            df, fetched_at = entry
+            df = df.copy()
+            for grid, values in grids:
+                position, column = grid["startRowIndex"] - 1, grid.get("startColumnIndex", 0)
+                if position < 0 or position + len(values) > len(df) or column + len(values[0]) > len(df.columns):
+                    del self._frames[key]
+                    return
+                for offset, row in enumerate(values):
+                    for col, value in zip(df.columns[column:], row):
+                        if df[col].dtype != object:
+                            df[col] = df[col].astype(object) # Sheets cells are loosely typed
+                        df.at[position + offset, col] = value
+            self._frames[key] = (df, fetched_at)
+
+
+@st.cache_resource(show_spinner=False)
+def init_sheet_cache():
+    """Initializes the shared read cache once per process."""
+    return SheetReadCache(SHEET_CACHE_TTL_SECONDS)
+
+sheet_cache = init_sheet_cache()
+ 
+ 
+# --- Change Probes ---
+# Before re-downloading a sheet whose cached copy has expired, the storage backends ask a change
+# probe for a cheap token. If it matches the token seen when the copy was fetched, the copy is
+# kept for another TTL instead, so idle dashboards cost one small call per spreadsheet per TTL.
+# JIO_CHANGE_PROBE picks the probe:
+#   "modified" - the spreadsheet's Drive modifiedTime (default; one call covers every tab in it)
+#   "rows"     - rows in use, from column A (only safe for append-only sheets: edits don't show)
+#   "off"      - no probing, every expired read is a full read
+# Tokens are trusted for at most CHANGE_PROBE_MAX_AGE_SECONDS, which bounds the damage if Drive
+# is slow to move modifiedTime after an edit.
+JIO_CHANGE_PROBE = os.getenv("JIO_CHANGE_PROBE", "modified").lower()
+CHANGE_PROBE_MAX_AGE_SECONDS = float(os.getenv("CHANGE_PROBE_MAX_AGE_SECONDS", "600"))
+CHANGE_PROBE_SHARE_SECONDS = 2 # One probe answers every read of the same target within this window
+
+
+class ChangeProbe:
+    """Cheap "has this sheet changed?" tokens. Subclasses pick the target a token covers and
+    fetch it; a token is shared by reads of the same target for CHANGE_PROBE_SHARE_SECONDS.
+    token() returns (token, probed_at); a None token means "no signal, do the full read".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = {} # target -> (token, probed_at)
+
+    def target(self, worksheet):
+        return (worksheet.spreadsheet.id, worksheet.title)
+
+    def fetch(self, worksheet):
+        return None
+
+    def token(self, worksheet):
+        target = self.target(worksheet)
+        with self._lock:
+            recent = self._recent.get(target)
+        if recent is not None and time.time() - recent[1] <= CHANGE_PROBE_SHARE_SECONDS:
+            return recent
+        probed_at = time.time() # Taken before the call, so it never post-dates what the token saw
+        try:
+            token = self.fetch(worksheet)
+        except Exception:
+            return None, probed_at # A failed probe must never stop the full read
+        with self._lock:
+            self._recent[target] = (token, probed_at)
+        return token, probed_at
+
+
+class ModifiedTimeProbe(ChangeProbe):
+    """The spreadsheet's last modification time from Drive; it moves on any edit to any tab."""
+
+    def target(self, worksheet):
+        return worksheet.spreadsheet.id
+
+    def fetch(self, worksheet):
+        spreadsheet = worksheet.spreadsheet
+        return sheets_api.call(spreadsheet.get_lastUpdateTime,
+                               coalesce_key=("get_lastUpdateTime", spreadsheet.id))
+
+
+class RowCountProbe(ChangeProbe):
+    """Rows in use, read from column A. Misses in-place edits, so only for append-only sheets."""
+
+    def fetch(self, worksheet):
+        return len(sheets_read(worksheet, "col_values", count_column(worksheet)))
+
+
+CHANGE_PROBES = {"modified": ModifiedTimeProbe, "rows": RowCountProbe, "off": ChangeProbe}
+
+
+@st.cache_resource(show_spinner=False)
+def init_change_probe():
+    """Initializes the configured change probe once per process."""
+    return CHANGE_PROBES.get(JIO_CHANGE_PROBE, ChangeProbe)()
+
+change_probe = init_change_probe()
+
+
+def revalidate_cached(worksheet):
+    """Probes a sheet whose cached entries have expired; True if they are still current."""
+    token, probed_at = change_probe.token(worksheet)
+    return token is not None and sheet_cache.revalidate(worksheet, token, probed_at, CHANGE_PROBE_MAX_AGE_SECONDS)
+ 
+ 
+# --- Storage Backends ---
+# The helpers below read and write through a storage backend. By default Sheets is the database
+# (SheetsStorage). With JIO_STORAGE=sqlite every sheet gets a local SQLite copy (SQLiteStorage):
+# page views read locally, and writes land locally and are replicated to Sheets in order from an
+# outbox, so the portal keeps working while Sheets is slow or down.
+JIO_STORAGE = os.getenv("JIO_STORAGE", "sheets").lower()
+JIO_SQLITE_PATH = os.getenv("JIO_SQLITE_PATH", "jio_store.sqlite3")
+REPLICATION_RETRY_SECONDS = 30
+
+
+def _plain(value):
+    """Cell value as plain JSON: NaN/None -> "", numpy scalars -> Python."""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return value.item() if hasattr(value, "item") else value
+
+
+def count_column(worksheet):
+    """1-based column whose filled cells count a sheet's rows: SHEET_CONFIG "count_col", else A.
+    It must be filled on every row, since the API stops at the column's last non-blank cell.
+    """
+    for cfg in SHEET_CONFIG.values():
+        if cfg["id"] == worksheet.spreadsheet.id and cfg["name"] == worksheet.title:
+            return cfg.get("count_col", 1)
+    return 1
+
+
+def _records_frame(values):
+    """Frame from raw sheet rows (row 1 = header), shaped like get_all_records would give."""
+    if len(values) < 2:
+        return pd.DataFrame() # Handle empty sheet case gracefully
+    header = values[0]
+    rows = [list(row[:len(header)]) + [""] * (len(header) - len(row)) for row in values[1:]]
+    # Sheets cells are loosely typed; object columns accept any edited value
+    df = pd.DataFrame(rows, columns=header, dtype=object)
+    # Strip whitespace from column names to ensure robust matching
+    df.columns = df.columns.astype(str).str.strip()
+    return df
+
+
+class SheetsStorage:
+    """Sheets as the database: reads go through the shared read cache, writes go straight out."""
+
+    def read(self, worksheet, ttl=None):
+        cached = sheet_cache.get(worksheet, ttl)
+        if cached is not None:
+            return cached
+        if ttl != 0 and revalidate_cached(worksheet): # ttl=0 asks for a real read
+            cached = sheet_cache.get(worksheet, ttl)
+            if cached is not None:
+                return cached
+        data = sheets_read(worksheet, "get_all_records")
         if not data: # Handle empty sheet case gracefully
-            return pd.DataFrame()
-        df = pd.DataFrame(data)
-        # Strip whitespace from column names to ensure robust matching
-        df.columns = df.columns.str.strip()
+            df = pd.DataFrame()
+        else:
+            # Sheets cells are loosely typed; object columns accept any edited value
+            df = pd.DataFrame(data, dtype=object)
+            # Strip whitespace from column names to ensure robust matching
+            df.columns = df.columns.str.strip()
+        sheet_cache.put(worksheet, df)
         return df
+
+    def values(self, worksheet):
+        return sheets_read(worksheet, "get_all_values")
+
+    def row_count(self, worksheet):
+        """Sheet rows in use (header included), from the sheet's count column (see count_column)
+        when nothing cached knows it.
+        """
+        count = sheet_cache.get_count(worksheet)
+        if count is None and revalidate_cached(worksheet):
+            count = sheet_cache.get_count(worksheet)
+        if count is None:
+            count = len(sheets_read(worksheet, "col_values", count_column(worksheet)))
+            sheet_cache.put_count(worksheet, count)
+        return count
+
+    def read_rows(self, worksheet, first_row, last_row, fresh=False):
+        """Raw rows first_row..last_row (1-based, inclusive) with one A1 range read.
+        fresh=True skips the cache (used to re-check a row right before a conditional write).
+        """
+        rows = None if fresh else sheet_cache.get_range(worksheet, first_row, last_row)
+        if rows is None and not fresh and revalidate_cached(worksheet):
+            rows = sheet_cache.get_range(worksheet, first_row, last_row)
+        if rows is None:
+            rows = sheets_read(worksheet, "get", f"{first_row}:{last_row}")
+            sheet_cache.put_range(worksheet, first_row, last_row, rows)
+        return rows
+
+    def append_rows(self, worksheet, rows):
+        sheets_write(worksheet, "append_rows", rows, value_input_option="RAW", idempotent=False)
+        sheet_cache.patch_append_rows(worksheet, rows)
+
+    def update_row(self, worksheet, row_index, row_data):
+        # len(row_data) gives the number of columns to update
+        range_to_update = f'A{row_index}:{gspread.utils.rowcol_to_a1(row_index, len(row_data))}'
+        sheets_write(worksheet, "update", range_to_update, [row_data])
+        sheet_cache.patch_row(worksheet, row_index, row_data)
+
+    def update_range(self, worksheet, range_name, values):
+        sheets_write(worksheet, "update", range_name, values)
+        sheet_cache.invalidate(worksheet)
+
+    def replace(self, worksheet, df):
+        # Convert DataFrame to a list of lists, including the header
+        sheets_write(worksheet, "update", [df.columns.tolist()] + df.values.tolist())
+        sheet_cache.invalidate(worksheet) # Drops cached counts and pages too
+        sheet_cache.put(worksheet, df)
+
+    def batch_update(self, worksheet, payload):
+        """Sends the batch_update payload and patches just the written cells into the cache.
+        The caller's frame isn't cached: rows it didn't write may be older than the cache TTL.
+        """
+        sheets_write(worksheet, "batch_update", payload)
+        sheet_cache.patch_cells(worksheet, payload)
+
+    def _cached(self, worksheet, part):
+        if part == "all":
+            return sheet_cache.has(worksheet)
+        if part == "count":
+            return sheet_cache.get_count(worksheet) is not None
+        return sheet_cache.get_range(worksheet, 1, 1) is not None
+
+    def prefetch(self, items):
+        """Warms the read cache for (worksheet, part) pairs from one spreadsheet, where part is
+        "all" (the frame), "count" (rows in use) or "header" (row 1). Several missing parts go
+        out as one values_batch_get; a single one uses the normal read.
+        """
+        missing = [(ws, part) for ws, part in items if not self._cached(ws, part)]
+        probed = {sheet_cache.key(ws): ws for ws, _ in missing}
+        if any([revalidate_cached(ws) for ws in probed.values()]): # Probe every sheet, then re-check
+            missing = [(ws, part) for ws, part in missing if not self._cached(ws, part)]
+        if len(missing) == 1:
+            worksheet, part = missing[0]
+            if part == "all":
+                self.read(worksheet)
+            elif part == "count":
+                self.row_count(worksheet)
+            else:
+                self.read_rows(worksheet, 1, 1)
+            return
+        if not missing:
+            return
+        ranges = []
+        for worksheet, part in missing:
+            title = "'" + worksheet.title.replace("'", "''") + "'"
+            if part == "count":
+                letter = gspread.utils.rowcol_to_a1(1, count_column(worksheet))[:-1]
+                ranges.append(f"{title}!{letter}:{letter}")
+            else:
+                ranges.append(title if part == "all" else f"{title}!{PREFETCH_RANGES[part]}")
+        spreadsheet = missing[0][0].spreadsheet
+        response = sheets_api.call(spreadsheet.values_batch_get, ranges,
+                                   coalesce_key=("values_batch_get", spreadsheet.id, tuple(ranges)))
+        for (worksheet, part), value_range in zip(missing, response.get("valueRanges", [])):
+            values = value_range.get("values", [])
+            if part == "all":
+                # Numericised like get_all_records, so the frame matches a normal read
+                sheet_cache.put(worksheet, _records_frame(values[:1] + [gspread.utils.numericise_all(row) for row in values[1:]]))
+            elif part == "count":
+                sheet_cache.put_count(worksheet, len(values))
+            else:
+                sheet_cache.put_range(worksheet, 1, 1, values[:1])
+
+    def pending_count(self):
+        return 0
+
+
+class SQLiteStorage:
+    """Local SQLite copy of every sheet with Sheets as a write-behind replica.
+    Rows are stored under their sheet row number (row 1 is the header) as JSON cell lists, so A1
+    ranges mean the same thing locally and remotely. A write updates the local rows and queues
+    the matching Sheets call in the outbox in one transaction; a replicator thread sends the
+    outbox in order (at-least-once). Sheets are seeded from Google on first use; inbound sheets
+    (filled by Google Forms) are re-pulled when the local copy is older than the read's ttl and
+    the change probe says the sheet moved.
+    """
+
+    def __init__(self, path, inbound=()):
+        self.inbound = set(inbound)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sheets (sheet_id TEXT, title TEXT, pulled_at REAL,
+                PRIMARY KEY (sheet_id, title));
+            CREATE TABLE IF NOT EXISTS sheet_rows (sheet_id TEXT, title TEXT, row_no INTEGER, cells TEXT,
+                PRIMARY KEY (sheet_id, title, row_no));
+            CREATE TABLE IF NOT EXISTS outbox (seq INTEGER PRIMARY KEY AUTOINCREMENT, sheet_id TEXT,
+                title TEXT, method TEXT, args TEXT, kwargs TEXT, attempts INTEGER DEFAULT 0, last_error TEXT);
+        """)
+        self._wake = threading.Event()
+        self._thread = None
+        self._tokens = {} # key -> (change probe token, taken_at) for inbound sheets
+        self.last_error = None
+
+    @staticmethod
+    def key(worksheet):
+        return (worksheet.spreadsheet.id, worksheet.title)
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+                self._db.execute("COMMIT")
+                return result
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def _seed(self, worksheet, key):
+        """(Re)loads a sheet's rows from Sheets, numericised the way get_all_records does."""
+        values = sheets_read(worksheet, "get_all_values")
+        rows = [values[0]] + [gspread.utils.numericise_all(row) for row in values[1:]] if values else []
+
+        def load():
+            self._db.execute("DELETE FROM sheet_rows WHERE sheet_id = ? AND title = ?", key)
+            self._db.executemany("INSERT INTO sheet_rows VALUES (?, ?, ?, ?)",
+                                 [(*key, i + 1, json.dumps(row)) for i, row in enumerate(rows)])
+            self._db.execute("INSERT OR REPLACE INTO sheets VALUES (?, ?, ?)", (*key, time.time()))
+        self._transaction(load)
+
+    def _ensure(self, worksheet, ttl=None):
+        key = self.key(worksheet)
+        with self._lock:
+            found = self._db.execute(
+                "SELECT pulled_at FROM sheets WHERE sheet_id = ? AND title = ?", key).fetchone()
+            pending = self._db.execute(
+                "SELECT COUNT(*) FROM outbox WHERE sheet_id = ? AND title = ?", key).fetchone()[0]
+        if found is None:
+            self._seed(worksheet, key) # Nothing local yet, so Sheets has to answer
+            return key
+        ttl = SHEET_CACHE_TTL_SECONDS if ttl is None else ttl
+        if key in self.inbound and not pending and time.time() - found[0] > ttl:
+            probed_at = self._unchanged(worksheet, key) if ttl != 0 else None
+            if probed_at is not None:
+                with self._lock:
+                    self._db.execute("UPDATE sheets SET pulled_at = MAX(pulled_at, ?) WHERE sheet_id = ? AND title = ?",
+                                     (probed_at, *key))
+                if time.time() - probed_at <= ttl:
+                    return key
+            try:
+                self._seed(worksheet, key)
+            except Exception:
+                pass # Sheets unavailable: keep serving the local copy
+        return key
+
+    def _unchanged(self, worksheet, key):
+        """The probe time if the change probe says the sheet is as it was at the last pull, else
+        None. Stores the new token (probed before the pull that follows) when it isn't.
+        """
+        token, probed_at = change_probe.token(worksheet)
+        if token is None:
+            return None
+        with self._lock:
+            stored = self._tokens.get(key)
+            if stored is not None and stored[0] == token and probed_at - stored[1] <= CHANGE_PROBE_MAX_AGE_SECONDS:
+                return probed_at
+            self._tokens[key] = (token, probed_at)
+        return None
+
+    def values(self, worksheet, ttl=None):
+        key = self._ensure(worksheet, ttl)
+        with self._lock:
+            stored = self._db.execute(
+                "SELECT row_no, cells FROM sheet_rows WHERE sheet_id = ? AND title = ? ORDER BY row_no", key).fetchall()
+        values = []
+        for row_no, cells in stored:
+            values.extend([] for _ in range(row_no - 1 - len(values))) # Gaps read as empty rows
+            values.append(json.loads(cells))
+        return values
+
+    def read(self, worksheet, ttl=None):
+        return _records_frame(self.values(worksheet, ttl))
+
+    def row_count(self, worksheet):
+        key = self._ensure(worksheet)
+        with self._lock:
+            last = self._db.execute("SELECT MAX(row_no) FROM sheet_rows WHERE sheet_id = ? AND title = ?", key).fetchone()[0]
+        return last or 0
+
+    def read_rows(self, worksheet, first_row, last_row, fresh=False):
+        key = self._ensure(worksheet) # Local rows are authoritative, so they are always fresh
+        with self._lock:
+            stored = dict(self._db.execute(
+                "SELECT row_no, cells FROM sheet_rows WHERE sheet_id = ? AND title = ? AND row_no BETWEEN ? AND ?",
+                (*key, first_row, last_row)).fetchall())
+        return [json.loads(stored[row_no]) if row_no in stored else [] for row_no in range(first_row, last_row + 1)]
+
+    def _set_cells(self, key, start_row, start_col, values):
+        """Writes a block of values with its top-left cell at (start_row, start_col), 1-based."""
+        for i, new in enumerate(values):
+            row_no = start_row + i
+            found = self._db.execute("SELECT cells FROM sheet_rows WHERE sheet_id = ? AND title = ? AND row_no = ?",
+                                     (*key, row_no)).fetchone()
+            cells = json.loads(found[0]) if found else []
+            cells.extend([""] * (start_col - 1 + len(new) - len(cells)))
+            cells[start_col - 1:start_col - 1 + len(new)] = new
+            self._db.execute("INSERT OR REPLACE INTO sheet_rows VALUES (?, ?, ?, ?)", (*key, row_no, json.dumps(cells)))
+
+    def _write(self, worksheet, apply, method, args, kwargs=None):
+        """Applies a write locally and queues the same Sheets call, atomically."""
+        key = self._ensure(worksheet)
+
+        def write():
+            apply(key)
+            self._db.execute("INSERT INTO outbox (sheet_id, title, method, args, kwargs) VALUES (?, ?, ?, ?, ?)",
+                             (*key, method, json.dumps(args), json.dumps(kwargs or {})))
+        self._transaction(write)
+        self._wake.set()
+
+    @staticmethod
+    def _start(range_name):
+        grid = gspread.utils.a1_range_to_grid_range(range_name)
+        return grid.get("startRowIndex", 0) + 1, grid.get("startColumnIndex", 0) + 1
+
+    def append_rows(self, worksheet, rows):
+        rows = [[_plain(v) for v in row] for row in rows]
+
+        def apply(key):
+            last = self._db.execute("SELECT MAX(row_no) FROM sheet_rows WHERE sheet_id = ? AND title = ?", key).fetchone()[0]
+            self._set_cells(key, (last or 0) + 1, 1, rows)
+        self._write(worksheet, apply, "append_rows", [rows], {"value_input_option": "RAW"})
+
+    def update_row(self, worksheet, row_index, row_data):
+        self.update_range(worksheet, f'A{row_index}:{gspread.utils.rowcol_to_a1(row_index, len(row_data))}', [row_data])
+
+    def update_range(self, worksheet, range_name, values):
+        values = [[_plain(v) for v in row] for row in values]
+        self._write(worksheet, lambda key: self._set_cells(key, *self._start(range_name), values),
+                    "update", [range_name, values])
+
+    def replace(self, worksheet, df):
+        self.update_range(worksheet, "A1", [df.columns.tolist()] + df.values.tolist())
+
+    def batch_update(self, worksheet, payload):
+        payload = [{"range": block["range"], "values": [[_plain(v) for v in row] for row in block["values"]]}
+                   for block in payload]
+
+        def apply(key):
+            for block in payload:
+                self._set_cells(key, *self._start(block["range"]), block["values"])
+        self._write(worksheet, apply, "batch_update", [payload])
+
+    def prefetch(self, items):
+        pass # Reads are local
+
+    def pending_count(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def replicate(self):
+        """Sends queued writes to Sheets in order, stopping at the first failure."""
+        while True:
+            with self._lock:
+                entry = self._db.execute(
+                    "SELECT seq, sheet_id, title, method, args, kwargs FROM outbox ORDER BY seq LIMIT 1").fetchone()
+            if entry is None:
+                self.last_error = None
+                return True
+            seq, sheet_id, title, method, args, kwargs = entry
+            worksheet = None
+            try:
+                worksheet = client.worksheet(sheet_id, title)
+                sheets_api.call(getattr(worksheet, method), *json.loads(args),
+                                idempotent=method != "append_rows", **json.loads(kwargs))
+            except Exception as e:
+                if worksheet is not None:
+                    client.handle_error(worksheet, e)
+                self.last_error = f"{title}: {e}"
+                with self._lock:
+                    self._db.execute("UPDATE outbox SET attempts = attempts + 1, last_error = ? WHERE seq = ?", (str(e), seq))
+                return False
+            with self._lock:
+                self._db.execute("DELETE FROM outbox WHERE seq = ?", (seq,))
+
+    def _replicate_loop(self):
+        while True:
+            ok = self.replicate()
+            self._wake.wait(None if ok else REPLICATION_RETRY_SECONDS)
+            self._wake.clear()
+
+    def start_replication(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._replicate_loop, name="sheets-replication", daemon=True)
+                self._thread.start()
+        self._wake.set() # Drain anything left over from a previous run
+
+
+@st.cache_resource(show_spinner=False)
+def init_storage():
+    """Initializes the configured storage backend once per process."""
+    if JIO_STORAGE == "sqlite":
+        response = SHEET_CONFIG["response"]
+        store = SQLiteStorage(JIO_SQLITE_PATH, inbound=[(response["id"], response["name"])])
+        store.start_replication()
+        return store
+    return SheetsStorage()
+
+storage = init_storage()
+ 
+ 
+@track_helper
+def get_dataframe_from_sheet(worksheet, ttl=None):
+    """Retrieves all records from a worksheet as a Pandas DataFrame, cleaning column names.
+    With the Sheets backend it is served from the shared read cache when the cached copy is
+    younger than ttl seconds.
+    """
+    try:
+        return storage.read(worksheet, ttl)
     except Exception as e:
-        st.error(f"Error reading data from worksheet '{worksheet.title}': {e}")
+        client.handle_error(worksheet, e)
+        report_error(f"Error reading data from worksheet '{worksheet.title}': {e}")
         return pd.DataFrame()  # Return empty DataFrame to avoid further errors
  
  
+@track_helper
 def append_row_to_sheet(worksheet, row_data):
     """Appends a row to a Google Sheet worksheet."""
     try:
-        worksheet.append_row(row_data)
+        storage.append_rows(worksheet, [row_data])
+        notify_rows_appended(worksheet, [row_data])
         return True
     except Exception as e:
-        st.error(f"Error appending row to worksheet '{worksheet.title}': {e}")
+        client.handle_error(worksheet, e)
+        report_error(f"Error appending row to worksheet '{worksheet.title}': {e}")
         return False
  
  
+@track_helper
 def update_worksheet_row(worksheet, row_index, row_data):
     """Updates a specific row in a Google Sheet worksheet.
     row_index is 1-based (Google Sheets API). row_data is a list of values for the row.
     """
     try:
-        # Determine the A1 notation range for the row to update
-        # len(row_data) gives the number of columns to update
-        range_to_update = f'A{row_index}:{gspread.utils.rowcol_to_a1(row_index, len(row_data))}'
-        worksheet.update(range_to_update, [row_data])
+        storage.update_row(worksheet, row_index, row_data)
+        notify_rows_written(worksheet, row_index, [row_data])
         return True
     except Exception as e:
-        st.error(f"Error updating row {row_index} in worksheet '{worksheet.title}': {e}")
+        client.handle_error(worksheet, e)
+        report_error(f"Error updating row {row_index} in worksheet '{worksheet.title}': {e}")
         return False
  
+@track_helper
 def update_entire_worksheet(worksheet, df):
     """Updates the entire worksheet with the given DataFrame, including headers."""
     try:
-        # Convert DataFrame to a list of lists, including the header
-        data_to_write = [df.columns.tolist()] + df.values.tolist()
-        worksheet.update(data_to_write)
+        storage.replace(worksheet, df)
+        notify_frame_written(worksheet, df)
         return True
     except Exception as e:
-        st.error(f"Error updating entire worksheet '{worksheet.title}': {e}")
+        client.handle_error(worksheet, e)
+        report_error(f"Error updating entire worksheet '{worksheet.title}': {e}")
         return False
  
+# --- Tab Prefetch ---
+# Each tab declares the sheet data it reads first. Before the tab renders, those reads are
+# issued together: one values_batch_get per spreadsheet when several parts are missing. The
+# results land in the shared read cache, where the tab's own reads then find them. Every tab
+# reads from a single spreadsheet today, so the groups are fetched one after another.
+PREFETCH_RANGES = {"header": "1:1"} # "all" reads the whole worksheet, "count" its count column
+TAB_PREFETCH = {
+    "Blog Board": [("blog", "count"), ("blog", "header")], # The page itself depends on the count
+    "Issue Tracker": [("tracker", "all")],
+    "Issue Analytics": [("tracker", "all")],
+}
+
+
+def prefetch_sheets(specs):
+    """Warms the cache for [(SHEET_CONFIG key, part)]. Best effort: failures are left for the
+    tab's own reads to retry and report.
+    """
+    groups = {}
+    for key, part in specs:
+        if key == "tracker" and part == "all" and not issue_repository.stale():
+            continue # The tracker tabs render from the repository, which is still fresh
+        groups.setdefault(SHEET_CONFIG[key]["id"], []).append((key, part))
+    for group in groups.values():
+        try:
+            storage.prefetch([(client.worksheet(SHEET_CONFIG[key]["id"], SHEET_CONFIG[key]["name"]), part)
+                              for key, part in group])
+        except Exception:
+            pass
+
+
+# --- Search Index ---
+# An in-memory inverted index over tracker issues and blog posts (token -> {document: weighted
+# term frequency}, documents keyed by (sheet, sheet row)). It is loaded once per sheet from the
+# cached frame and then kept current by the write helpers, which report every append, row edit
+# and rewrite; a full reload only happens every SEARCH_RELOAD_SECONDS to catch edits made
+# directly in Google Sheets. Queries rank with BM25 and match every query word as a prefix.
+SEARCH_FIELDS = {
+    "tracker": {"title": TRACKER_COLUMNS["issue_title"],
+                "text": [TRACKER_COLUMNS["description"], TRACKER_COLUMNS["resolution"], TRACKER_COLUMNS["response"]],
+                "show": [TRACKER_COLUMNS["id"], TRACKER_COLUMNS["issue_title"], TRACKER_COLUMNS["status"]]},
+    "blog": {"title": BLOG_COLUMNS["title"],
+             "text": [BLOG_COLUMNS["content"]],
+             "show": [BLOG_COLUMNS["title"], BLOG_COLUMNS["author"], BLOG_COLUMNS["timestamp"], BLOG_COLUMNS["content"]]},
+}
+SEARCH_TITLE_WEIGHT = 2 # A title word counts as much as two body words
+SEARCH_MIN_PREFIX = 2 # Shorter query words must match a whole word
+SEARCH_RELOAD_SECONDS = float(os.getenv("SEARCH_RELOAD_SECONDS", "600"))
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(str(text).lower()) if not pd.isna(text) else []
+
+
+def search_kind(worksheet):
+    """The SEARCH_FIELDS entry a worksheet belongs to, or None if it isn't searchable."""
+    for kind in SEARCH_FIELDS:
+        cfg = SHEET_CONFIG[kind]
+        if worksheet.spreadsheet.id == cfg["id"] and worksheet.title == cfg["name"]:
+            return kind
+    return None
+
+
+class SearchIndex:
+    """Incrementally maintained inverted index with BM25 ranking and prefix matching."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {} # token -> {doc: weighted tf}
+        self._docs = {} # doc -> (Counter of tokens, length, shown fields)
+        self._vocab = [] # Sorted tokens, for prefix lookup by bisection
+        self._headers = {} # kind -> sheet header, once loaded
+        self._next_row = {} # kind -> sheet row the next append lands on
+        self._loaded_at = {}
+        self._total_length = 0
+
+    def loaded(self, kind):
+        loaded_at = self._loaded_at.get(kind)
+        return loaded_at is not None and time.time() - loaded_at < SEARCH_RELOAD_SECONDS
+
+    def _remove(self, doc):
+        entry = self._docs.pop(doc, None)
+        if entry is None:
+            return
+        for token in entry[0]:
+            postings = self._postings.get(token)
+            postings.pop(doc, None)
+            if not postings:
+                del self._postings[token]
+                del self._vocab[bisect_left(self._vocab, token)]
+        self._total_length -= entry[1]
+
+    def _add(self, doc, record, sorted_vocab=True):
+        fields = SEARCH_FIELDS[doc[0]]
+        counts = Counter()
+        for token in tokenize(record.get(fields["title"], "")):
+            counts[token] += SEARCH_TITLE_WEIGHT
+        for col in fields["text"]:
+            counts.update(tokenize(record.get(col, "")))
+        if not counts:
+            return
+        for token, tf in counts.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                if sorted_vocab:
+                    self._vocab.insert(bisect_left(self._vocab, token), token)
+            postings[doc] = tf
+        length = sum(counts.values())
+        self._docs[doc] = (counts, length, {col: record.get(col, "") for col in fields["show"]})
+        self._total_length += length
+
+    def load(self, kind, df):
+        """(Re)builds one sheet's documents from its frame (data row i is sheet row i + 2)."""
+        with self._lock:
+            for doc in [d for d in self._docs if d[0] == kind]:
+                self._remove(doc)
+            for i, record in enumerate(df.to_dict("records")):
+                self._add((kind, i + 2), record, sorted_vocab=False)
+            self._vocab = sorted(self._postings) # One sort instead of an insert per new token
+            self._headers[kind] = list(df.columns)
+            self._next_row[kind] = len(df) + 2
+            self._loaded_at[kind] = time.time()
+
+    def update_rows(self, worksheet, first_row, rows):
+        """Re-indexes raw sheet rows starting at sheet row first_row (appends and row edits)."""
+        kind = search_kind(worksheet)
+        if kind is None or kind not in self._headers:
+            return # Not searchable, or not loaded yet (the first search loads it fresh)
+        with self._lock:
+            header = self._headers[kind]
+            for offset, row in enumerate(rows):
+                doc = (kind, first_row + offset)
+                self._remove(doc)
+                self._add(doc, dict(zip(header, row)))
+            self._next_row[kind] = max(self._next_row[kind], first_row + len(rows))
+
+    def append_rows(self, worksheet, rows):
+        """Indexes rows appended after the last known sheet row."""
+        kind = search_kind(worksheet)
+        if kind in self._next_row:
+            self.update_rows(worksheet, self._next_row[kind], rows)
+
+    def update_frame(self, worksheet, df, rows=None):
+        """Re-indexes the given sheet rows (all rows if None) from a frame written back whole."""
+        kind = search_kind(worksheet)
+        if kind is None or kind not in self._headers:
+            return
+        if rows is None or list(df.columns) != self._headers[kind]:
+            self.load(kind, df)
+            return
+        records = df.to_dict("records")
+        with self._lock:
+            for row in rows:
+                doc = (kind, row)
+                self._remove(doc)
+                if 0 <= row - 2 < len(records):
+                    self._add(doc, records[row - 2])
+            self._next_row[kind] = max(self._next_row[kind], len(records) + 2)
+
+    def _expand(self, word):
+        """Indexed tokens matching a query word (as a prefix when it is long enough)."""
+        if len(word) < SEARCH_MIN_PREFIX:
+            return [word] if word in self._postings else []
+        start = bisect_left(self._vocab, word)
+        end = start
+        while end < len(self._vocab) and self._vocab[end].startswith(word):
+            end += 1
+        return self._vocab[start:end]
+
+    def search(self, query, kind, limit=20, k1=1.2, b=0.75):
+        """Top documents of one kind matching every query word, as (sheet row, score, shown fields)."""
+        words = list(dict.fromkeys(tokenize(query)))
+        if not words:
+            return []
+        with self._lock:
+            n_docs = max(len(self._docs), 1)
+            avg_length = self._total_length / n_docs or 1.0
+            scores = None
+            for word in words:
+                word_scores = {}
+                for token in self._expand(word):
+                    postings = self._postings[token]
+                    idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for doc, tf in postings.items():
+                        if doc[0] != kind or (scores is not None and doc not in scores):
+                            continue
+                        length = self._docs[doc][1]
+                        score = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / avg_length))
+                        word_scores[doc] = max(word_scores.get(doc, 0.0), score) # Best expansion
+                scores = word_scores if scores is None else {
+                    doc: scores[doc] + score for doc, score in word_scores.items()}
+                if not scores:
+                    return []
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0][1]))[:limit]
+            return [(doc[1], score, dict(self._docs[doc][2])) for doc, score in best]
+
+
+@st.cache_resource(show_spinner=False)
+def init_search_index():
+    """Initializes the shared search index once per process."""
+    return SearchIndex()
+
+search_index = init_search_index()
+
+
+def search_sheet(kind, query, limit=20):
+    """Runs a search, loading (or periodically reloading) the sheet's documents first."""
+    if not search_index.loaded(kind):
+        worksheet = get_sheet(kind)
+        if worksheet is None:
+            return []
+        search_index.load(kind, get_dataframe_from_sheet(worksheet))
+    return search_index.search(query, kind, limit)
+
+
+# --- Issue Repository ---
+# The tracker held in memory once per process with hash indexes (value -> set of row positions)
+# on ID, contact, business vertical, status and priority, so lookups and per-role views don't
+# scan the sheet. It is reloaded from the read cache when older than SHEET_CACHE_TTL_SECONDS
+# and otherwise patched by the write helpers, like the search index.
+ISSUE_INDEX_KEYS = ["id", "contact", "business_vertical", "status", "priority"]
+
+
+def _index_key(value):
+    return "" if pd.isna(value) else str(value).strip()
+
+
+class IssueRepository:
+    """Tracker rows (position = sheet row - 2) with hash indexes and cached per-user views."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._df = pd.DataFrame()
+        self._loaded_at = None
+        self._indexes = {key: {} for key in ISSUE_INDEX_KEYS}
+        self._views = {} # user name -> sorted positions
+        self.write_lock = threading.Lock() # Serializes read-check-write of tracker rows
+
+    def stale(self):
+        return self._loaded_at is None or time.time() - self._loaded_at > SHEET_CACHE_TTL_SECONDS
+
+    def load(self, df):
+        with self._lock:
+            self._df = df.reset_index(drop=True).astype(object)
+            self._indexes = {key: {} for key in ISSUE_INDEX_KEYS}
+            for pos in range(len(self._df)):
+                self._index_row(pos)
+            self._views.clear()
+            self._loaded_at = time.time()
+
+    def _index_row(self, pos, unindex=False):
+        for key in ISSUE_INDEX_KEYS:
+            col = TRACKER_COLUMNS[key]
+            if col not in self._df.columns:
+                continue
+            value = _index_key(self._df.iat[pos, self._df.columns.get_loc(col)])
+            if unindex:
+                positions = self._indexes[key].get(value)
+                if positions is not None:
+                    positions.discard(pos)
+                    if not positions:
+                        del self._indexes[key][value]
+            else:
+                self._indexes[key].setdefault(value, set()).add(pos)
+
+    def __len__(self):
+        return len(self._df)
+
+    def columns(self):
+        return list(self._df.columns)
+
+    def frame(self):
+        """Copy of the whole tracker as loaded and patched."""
+        with self._lock:
+            return self._df.copy()
+
+    def position(self, issue_id):
+        with self._lock:
+            positions = self._indexes["id"].get(_index_key(issue_id))
+            return min(positions) if positions else None # IDs should be unique; first row wins
+
+    def get(self, issue_id):
+        """The issue's row as a dict, or None (one hash lookup)."""
+        with self._lock:
+            pos = self.position(issue_id)
+            return None if pos is None else self._df.iloc[pos].to_dict()
+
+    def values(self, key):
+        """Distinct non-blank values of an indexed column."""
+        with self._lock:
+            return sorted(value for value in self._indexes[key] if value)
+
+    def where(self, positions=None, **criteria):
+        """Positions whose indexed columns take any of the given values, e.g. status=["Open"]."""
+        with self._lock:
+            candidates = []
+            for key, wanted in criteria.items():
+                postings = [self._indexes[key].get(_index_key(value), set()) for value in wanted]
+                candidates.append(postings[0] if len(postings) == 1 else set().union(*postings))
+            if positions is not None:
+                candidates.append(set(positions))
+            if not candidates:
+                return list(range(len(self._df)))
+            # Intersect into a copy of the smallest set, so the cost follows the matches, not the sheet
+            candidates.sort(key=len)
+            result = set(candidates[0])
+            for matches in candidates[1:]:
+                if not result:
+                    break
+                result &= matches
+            return sorted(result)
+
+    def view(self, user_name):
+        """Positions a user may see: everything for admins, their verticals for managers."""
+        with self._lock:
+            if user_name not in self._views:
+                if user_name in ADMIN_NAMES:
+                    positions = list(range(len(self._df)))
+                else:
+                    verticals = {v.lower() for v in MANAGER_VERTICALS.get(user_name, [])}
+                    positions = self.where(business_vertical=[
+                        value for value in self._indexes["business_vertical"] if value.lower() in verticals])
+                self._views[user_name] = positions
+            return list(self._views[user_name])
+
+    def rows(self, positions):
+        with self._lock:
+            return self._df.iloc[positions]
+
+    # Write notifications (see notify_rows_written and friends)
+    def update_rows(self, worksheet, first_row, rows):
+        if search_kind(worksheet) != "tracker" or self._loaded_at is None or self._df.empty:
+            return
+        with self._lock:
+            for offset, row in enumerate(rows):
+                pos = first_row - 2 + offset
+                values = (list(row) + [""] * len(self._df.columns))[:len(self._df.columns)]
+                if pos == len(self._df):
+                    self._df.loc[pos] = values
+                elif 0 <= pos < len(self._df):
+                    self._index_row(pos, unindex=True)
+                    self._df.iloc[pos] = values
+                else:
+                    continue
+                self._index_row(pos)
+            self._views.clear()
+
+    def append_rows(self, worksheet, rows):
+        self.update_rows(worksheet, len(self._df) + 2, rows)
+
+    def update_frame(self, worksheet, df, rows=None):
+        if search_kind(worksheet) != "tracker" or self._loaded_at is None:
+            return
+        with self._lock:
+            if rows is None or list(df.columns) != list(self._df.columns) or len(df) < len(self._df):
+                loaded_at = self._loaded_at
+                self.load(df)
+                self._loaded_at = loaded_at # A write is not a fresh read
+                return
+            for row in rows:
+                if 0 <= row - 2 < len(df):
+                    self.update_rows(worksheet, row, [df.iloc[row - 2].tolist()])
+
+
+@st.cache_resource(show_spinner=False)
+def init_issue_repository():
+    """Initializes the shared issue repository once per process."""
+    return IssueRepository()
+
+issue_repository = init_issue_repository()
+
+
+def get_issue_repository(tracker_ws):
+    """The issue repository, reloaded from the tracker sheet when it has gone stale."""
+    if issue_repository.stale():
+        issue_repository.load(get_dataframe_from_sheet(tracker_ws))
+    return issue_repository
+
+
+# --- Write Notifications ---
+# In-memory structures derived from sheets (search index, issue repository) are told about
+# every successful write made through the helpers, so they stay current without reloading.
+WRITE_LISTENERS = [search_index, issue_repository]
+
+
+def notify_rows_written(worksheet, first_row, rows):
+    """Raw rows written starting at sheet row first_row."""
+    for listener in WRITE_LISTENERS:
+        listener.update_rows(worksheet, first_row, rows)
+
+
+def notify_rows_appended(worksheet, rows):
+    for listener in WRITE_LISTENERS:
+        listener.append_rows(worksheet, rows)
+
+
+def notify_frame_written(worksheet, df, rows=None):
+    """A whole frame written back; rows lists the sheet rows that changed (None: unknown)."""
+    for listener in WRITE_LISTENERS:
+        listener.update_frame(worksheet, df, rows)
+
+
+# --- Diff Writes ---
+# Instead of rewriting the whole sheet, compare the frame as read with the edited frame and send
+# only the changed cells: adjacent changed cells in a row are coalesced into one run, runs with
+# the same columns on consecutive rows into one block, and all blocks go out in one batch_update.
+# Past FULL_REWRITE_FRACTION of changed cells a plain full rewrite is cheaper.
+FULL_REWRITE_FRACTION = 0.3
+
+
+def _sheet_values(df):
+    """Frame values as Sheets would show them: strings, with NaN/None as blank."""
+    return df.astype(object).where(df.notna(), "").astype(str).to_numpy()
+
+
+def _json_cell(value):
+    if pd.isna(value):
+        return ""
+    return value.item() if hasattr(value, "item") else value # numpy scalars -> Python
+
+
+def diff_ranges(original, modified):
+    """Changed blocks as batch_update payload ([{"range", "values"}]), or None if the header
+    changed or rows were removed (a diff can't express that; rewrite instead).
+    Sheet row 1 is the header, so data row i lives on sheet row i + 2.
+    """
+    if original.empty or list(original.columns) != list(modified.columns) or len(modified) < len(original):
+        return None
+    old, new = _sheet_values(original), _sheet_values(modified)
+    changed = np.ones(new.shape, dtype=bool) # Appended rows are entirely new
+    changed[:len(old)] = old != new[:len(old)]
+
+    blocks = [] # [first_row, last_row, first_col, last_col]
+    open_blocks = {} # (first_col, last_col) -> block still growing downwards
+    for r in np.flatnonzero(changed.any(axis=1)):
+        edges = np.diff(np.concatenate(([0], changed[r].astype(np.int8), [0])))
+        runs = zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1)
+        still_open = {}
+        for c0, c1 in runs:
+            block = open_blocks.get((c0, c1))
+            if block is not None and block[1] == r - 1:
+                block[1] = r
+            else:
+                block = [r, r, c0, c1]
+                blocks.append(block)
+            still_open[(c0, c1)] = block
+        open_blocks = still_open
+
+    values = modified.to_numpy(dtype=object)
+    payload = []
+    for r0, r1, c0, c1 in blocks:
+        start = gspread.utils.rowcol_to_a1(r0 + 2, c0 + 1)
+        end = gspread.utils.rowcol_to_a1(r1 + 2, c1 + 1)
+        payload.append({
+            "range": start if start == end else f"{start}:{end}",
+            "values": [[_json_cell(v) for v in row] for row in values[r0:r1 + 1, c0:c1 + 1]],
+        })
+    return payload
+
+
+def write_dataframe_changes(worksheet, original, modified, allow_rewrite=True):
+    """Writes only the cells that differ between original and modified (one batch_update),
+    falling back to update_entire_worksheet for structural changes or large edits.
+    With allow_rewrite=False only the changed cells are ever written (conditional writes).
+    """
+    payload = diff_ranges(original, modified)
+    if payload is None:
+        if allow_rewrite:
+            return update_entire_worksheet(worksheet, modified)
+        report_error(f"Cannot write a structural change to worksheet '{worksheet.title}' as a cell update.")
+        return False
+    if not payload:
+        return True
+    n_changed = sum(len(block["values"]) * len(block["values"][0]) for block in payload)
+    if allow_rewrite and n_changed > FULL_REWRITE_FRACTION * modified.size:
+        return update_entire_worksheet(worksheet, modified)
+    try:
+        storage.batch_update(worksheet, payload)
+        changed_rows = set()
+        for block in payload:
+            first_row = gspread.utils.a1_range_to_grid_range(block["range"])["startRowIndex"] + 1
+            changed_rows.update(range(first_row, first_row + len(block["values"])))
+        notify_frame_written(worksheet, modified, sorted(changed_rows))
+        return True
+    except Exception as e:
+        client.handle_error(worksheet, e)
+        report_error(f"Error updating cells in worksheet '{worksheet.title}': {e}")
+        return False
+
+
+# --- Conditional Tracker Writes ---
+# Issue edits use optimistic concurrency. The edit form keeps the issue as it was when opened (its
+# base); on save the row is re-read from the sheet and merged field by field: a field only this
+# user changed is written, a field someone else changed in the meantime to a different value is
+# a conflict and keeps their value. "Last Updated" + "Updated By" serve as the row version, so
+# when they still match the base nobody touched the row. The re-read and write happen under the
+# repository's write lock and send only the edited cells, never a full-sheet rewrite.
+
+
+def _same(a, b):
+    return _index_key(a) == _index_key(b) # Sheets cells are loosely typed; compare as text
+
+
+def row_version(row):
+    return (_index_key(row.get(TRACKER_COLUMNS["last_updated"])), _index_key(row.get(TRACKER_COLUMNS["updated_by"])))
+
+
+def read_issue_row(tracker_ws, repo, issue_id):
+    """The issue's current sheet row, read fresh, as (sheet row, dict); (None, None) if it's gone."""
+    for attempt in range(2):
+        pos = repo.position(issue_id)
+        if pos is not None:
+            row_no = pos + 2
+            values = storage.read_rows(tracker_ws, row_no, row_no, fresh=True)
+            values = list(values[0]) if values else []
+            header = repo.columns()
+            row = dict(zip(header, values + [""] * (len(header) - len(values))))
+            if _same(row.get(TRACKER_COLUMNS["id"]), issue_id):
+                return row_no, row
+        # The row moved (or the issue is new to this process): reload from the sheet and look again
+        repo.load(get_dataframe_from_sheet(tracker_ws, ttl=0))
+    return None, None
+
+
+def save_issue_edits(tracker_ws, repo, issue_id, base, edits, updated_by):
+    """Merges edits (column -> new value, relative to base) into the issue's current row.
+    Returns (applied, conflicts, error): applied maps column -> (old, new) for written fields,
+    conflicts maps column -> (their value, your value) for fields left as someone else set them.
+    """
+    with repo.write_lock:
+        row_no, current = read_issue_row(tracker_ws, repo, issue_id)
+        if row_no is None:
+            return {}, {}, "This issue no longer exists in the tracker."
+        notify_rows_written(tracker_ws, row_no, [list(current.values())]) # In-memory copies catch up
+
+        untouched = row_version(current) == row_version(base)
+        applied, conflicts = {}, {}
+        for col, new_value in edits.items():
+            theirs = current.get(col, "")
+            if untouched or _same(theirs, base.get(col, "")) or _same(theirs, new_value):
+                if not _same(theirs, new_value):
+                    applied[col] = (theirs, new_value)
+            else:
+                conflicts[col] = (theirs, new_value)
+        if not applied:
+            return applied, conflicts, None
+
+        original = repo.frame()
+        modified = original.copy()
+        pos = row_no - 2
+        for col, (_, new_value) in applied.items():
+            modified.at[pos, col] = new_value
+        modified.at[pos, TRACKER_COLUMNS["last_updated"]] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        modified.at[pos, TRACKER_COLUMNS["updated_by"]] = updated_by
+        if not write_dataframe_changes(tracker_ws, original, modified, allow_rewrite=False):
+            return {}, conflicts, "Failed to save changes to the tracker sheet."
+        return applied, conflicts, None
+ 
+ 
+# --- Audit Log Writer ---
+# Log rows are collected during a rerun and sent with one append_rows call. Before each send
+# they are appended to a local spill file. A flush moves the spilled rows to a sending file and
+# deletes that only after Sheets accepts them, so rows survive a failed flush or a crash
+# mid-flush and are resent by the next flush (at-least-once delivery). Only the file moves
+# happen under the writer's lock; sessions logging a change never wait on the network call.
+#
+# The log is partitioned by month: rows go to a "Log YYYY-MM" worksheet in the log spreadsheet
+# (by their timestamp), created with its header on first use, so nothing on the write path
+# reads or grows with the whole history. When a new month's partition is created, partitions
+# older than LOG_HOT_MONTHS are archived: moved to LOG_ARCHIVE_SHEET_ID when that is set,
+# otherwise hidden in place. The original SHEET_CONFIG["log"] worksheet keeps the history
+# written before partitioning.
+AUDIT_SPILL_FILE = os.getenv("AUDIT_SPILL_FILE", "audit_log_spill.jsonl")
+LOG_PARTITION_PREFIX = "Log " # Followed by YYYY-MM
+LOG_HOT_MONTHS = int(os.getenv("LOG_HOT_MONTHS", "3")) # Current month included
+LOG_ARCHIVE_SHEET_ID = os.getenv("LOG_ARCHIVE_SHEET_ID", "")
+LOG_HEADER = [
+    LOG_COLUMNS["timestamp"],
+    LOG_COLUMNS["updated_by"],
+    LOG_COLUMNS["field"],
+    LOG_COLUMNS["old_value"],
+    LOG_COLUMNS["new_value"],
+    LOG_COLUMNS["issue_id"]
+]
+
+
+def audit_row(issue_id, field, old_value, new_value, updated_by=None):
+    """Builds one audit-log row in the log sheet's column order."""
+    return [
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        st.session_state.user_name if updated_by is None else updated_by,
+        field,
+        str(old_value) if pd.notna(old_value) else "", # Convert NaN to empty string for log
+        str(new_value) if pd.notna(new_value) else "",
+        str(issue_id)
+    ]
+
+
+def _month_index(month):
+    """"YYYY-MM" -> months since year 0, for partition age arithmetic."""
+    year, mon = month.split("-")
+    return int(year) * 12 + int(mon) - 1
+
+
+class AuditLogPartitions:
+    """Opens (creating when needed) the monthly log worksheets and archives old ones."""
+
+    def __init__(self, sheet_id, hot_months=LOG_HOT_MONTHS, archive_id=LOG_ARCHIVE_SHEET_ID):
+        self.sheet_id = sheet_id
+        self.hot_months = hot_months
+        self.archive_id = archive_id
+        self._lock = threading.Lock()
+        self._ready = set() # Months whose worksheet is known to exist with a header
+        self._rotated_for = None # Newest month rotation has run for in this process
+        self.last_error = None
+
+    @staticmethod
+    def name(month):
+        return f"{LOG_PARTITION_PREFIX}{month}"
+
+    @staticmethod
+    def month_of(row):
+        """Partition month for a log row, from its "YYYY-MM-DD HH:MM:SS" timestamp."""
+        stamp = str(row[0]) if row else ""
+        return stamp[:7] if re.match(r"\d{4}-\d{2}", stamp) else datetime.now().strftime("%Y-%m")
+
+    def worksheet(self, month):
+        """The partition for a month. The header is checked once per process with a one-row read."""
+        name = self.name(month)
+        try:
+            worksheet = client.worksheet(self.sheet_id, name)
+        except gspread.exceptions.WorksheetNotFound:
+            spreadsheet = client.spreadsheet(self.sheet_id)
+            worksheet = sheets_api.call(spreadsheet.add_worksheet, title=name, rows=1000, cols=len(LOG_HEADER), idempotent=False)
+            storage.update_range(worksheet, f"A1:{gspread.utils.rowcol_to_a1(1, len(LOG_HEADER))}", [LOG_HEADER])
+            with self._lock:
+                self._ready.add(month)
+        with self._lock:
+            ready = month in self._ready
+        if not ready:
+            if not any(str(v).strip() for v in (storage.read_rows(worksheet, 1, 1) or [[]])[0]):
+                storage.update_range(worksheet, f"A1:{gspread.utils.rowcol_to_a1(1, len(LOG_HEADER))}", [LOG_HEADER])
+            with self._lock:
+                self._ready.add(month)
+        self._maybe_rotate(month)
+        return worksheet
+
+    def _maybe_rotate(self, month):
+        """Starts one background rotation per process per new month (a few metadata calls)."""
+        with self._lock:
+            if self._rotated_for is not None and self._rotated_for >= month:
+                return
+            self._rotated_for = month
+        threading.Thread(target=self.rotate, args=(month,), name="audit-log-rotation", daemon=True).start()
+
+    def rotate(self, current_month):
+        """Archives partitions more than hot_months - 1 months older than current_month.
+        Returns the archived worksheet names.
+        """
+        if storage.pending_count():
+            with self._lock:
+                self._rotated_for = None # Don't move sheets with queued writes; retry on the next flush
+            return []
+        cutoff = _month_index(current_month) - self.hot_months + 1
+        archived = []
+        try:
+            spreadsheet = client.spreadsheet(self.sheet_id)
+            for worksheet in sheets_api.call(spreadsheet.worksheets):
+                month = worksheet.title[len(LOG_PARTITION_PREFIX):]
+                if (not worksheet.title.startswith(LOG_PARTITION_PREFIX) or not re.fullmatch(r"\d{4}-\d{2}", month)
+                        or _month_index(month) >= cutoff or getattr(worksheet, "isSheetHidden", False)):
+                    continue
+                if self.archive_id:
+                    copied = sheets_api.call(worksheet.copy_to, self.archive_id, idempotent=False)
+                    archive = sheets_api.call(client.spreadsheet(self.archive_id).get_worksheet_by_id, copied["sheetId"])
+                    sheets_api.call(archive.update_title, worksheet.title)
+                    sheets_api.call(spreadsheet.del_worksheet, worksheet, idempotent=False)
+                else:
+                    sheets_api.call(worksheet.hide)
+                client.invalidate(worksheet)
+                sheet_cache.invalidate(worksheet)
+                with self._lock:
+                    self._ready.discard(month)
+                archived.append(worksheet.title)
+        except Exception as e:
+            self.last_error = f"Audit log rotation stopped: {e}" # Runs off the page; the next new month retries
+        return archived
+
+
+class AuditLogWriter:
+    """Process-wide batched writer for the audit log, backed by a local spill file."""
+
+    def __init__(self, spill_path, partitions):
+        self.spill_path = spill_path
+        self.sending_path = spill_path + ".sending" # Rows taken by the flush in progress
+        self.partitions = partitions
+        self._lock = threading.Lock() # Guards the two files; never held across a network call
+        self._send_lock = threading.Lock() # One flush sends at a time
+
+    def _spill(self, rows):
+        with open(self.spill_path, "a", encoding="utf-8") as fh:
+            for row in rows:
+                fh.write(json.dumps(row) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    @staticmethod
+    def _read(path):
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as fh:
+            return [json.loads(line) for line in fh if line.strip()]
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._read(self.sending_path)) + len(self._read(self.spill_path))
+
+    def _take(self):
+        """Moves spilled rows behind any left from a failed (or crashed) flush into the sending
+        file, so rows logged while this flush sends go to a fresh spill file.
+        """
+        with self._lock:
+            pending = self._read(self.sending_path) + self._read(self.spill_path)
+            if os.path.exists(self.spill_path):
+                tmp_path = self.sending_path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as fh:
+                    fh.writelines(json.dumps(row) + "\n" for row in pending)
+                    fh.flush()
+                    os.fsync(fh.fileno())
+                os.replace(tmp_path, self.sending_path)
+                os.remove(self.spill_path)
+        return pending
+
+    def flush(self, rows=()):
+        """Spills rows, then sends everything pending with one append_rows call per month."""
+        if rows:
+            with self._lock:
+                self._spill(rows)
+        with self._send_lock:
+            pending = self._take()
+            if not pending:
+                return True
+            by_month = {}
+            for row in pending:
+                by_month.setdefault(self.partitions.month_of(row), []).append(row)
+            unsent = []
+            for month in sorted(by_month):
+                if not unsent:
+                    worksheet = None
+                    try:
+                        # The request layer retries quota rejections; anything else stays spilled for next time
+                        worksheet = self.partitions.worksheet(month)
+                        storage.append_rows(worksheet, by_month[month])
+                        continue
+                    except Exception as e:
+                        if worksheet is not None:
+                            client.handle_error(worksheet, e)
+                        error = e
+                unsent.extend(by_month[month])
+            with self._lock: # Unsent rows stay in the sending file, ahead of newer spills
+                if unsent:
+                    with open(self.sending_path, "w", encoding="utf-8") as fh:
+                        fh.writelines(json.dumps(row) + "\n" for row in unsent)
+                else:
+                    os.remove(self.sending_path)
+            if unsent:
+                report_error(f"Could not write {len(unsent)} audit log entries (kept locally, will retry): {error}")
+            return not unsent
+
+
+@st.cache_resource(show_spinner=False)
+def init_audit_log():
+    """Initializes the shared audit-log writer once per process."""
+    return AuditLogWriter(AUDIT_SPILL_FILE, AuditLogPartitions(SHEET_CONFIG["log"]["id"]))
+
+audit_log = init_audit_log()
+ 
+ 
+# --- Task Submission Store ---
+# Uploaded task files are streamed in fixed-size chunks into a content-addressed object
+# directory (objects/<first two hex digits>/<sha256>), hashed on the way, so a session never
+# builds a second in-memory copy of a file and identical uploads are stored once. Each
+# submission (intern, week, file name, size, hash) is a row in a SQLite index beside the
+# objects; listings read only the index, which is unique on (intern, week, hash) so processes
+# sharing the directory can't index the same submission twice. Streamlit itself still buffers
+# each upload whole before it reaches the store; server.maxUploadSize in .streamlit/config.toml
+# caps that buffer.
+SUBMISSIONS_DIR = os.getenv("JIO_SUBMISSIONS_DIR", "submissions")
+SUBMISSION_CHUNK_BYTES = 1024 * 1024
+SUBMISSION_COLUMNS = ["intern", "week", "file_name", "size", "sha256", "submitted_at"]
+
+
+class SubmissionStore:
+    """Process-wide store for task uploads: chunked object files plus a metadata index."""
+
+    def __init__(self, root, chunk_bytes=SUBMISSION_CHUNK_BYTES):
+        self.root = root
+        self.chunk_bytes = chunk_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite3"), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS submissions (id INTEGER PRIMARY KEY AUTOINCREMENT, intern TEXT,
+                week TEXT, file_name TEXT, size INTEGER, sha256 TEXT, submitted_at TEXT);
+            CREATE INDEX IF NOT EXISTS submissions_by_intern ON submissions (intern, week);
+            DELETE FROM submissions WHERE id NOT IN (SELECT MIN(id) FROM submissions GROUP BY intern, week, sha256);
+            CREATE UNIQUE INDEX IF NOT EXISTS submissions_once ON submissions (intern, week, sha256);
+        """) # The DELETE clears duplicates indexed before the unique index existed
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _write_object(self, stream):
+        """Copies stream into the object directory one chunk at a time; returns (sha256, size)."""
+        digest = hashlib.sha256()
+        size = 0
+        fd, part_path = tempfile.mkstemp(dir=os.path.join(self.root, "objects"), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = stream.read(self.chunk_bytes)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            sha256 = digest.hexdigest()
+            path = self.object_path(sha256)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(part_path) # Same content is already stored
+            else:
+                os.replace(part_path, path)
+            return sha256, size
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+    def add(self, stream, intern, week, file_name):
+        """Stores an upload and indexes it. Returns (sha256, size, duplicate); duplicate means
+        this intern already submitted the same file for the week (no new index row then).
+        """
+        if hasattr(stream, "seek"):
+            stream.seek(0)
+        sha256, size = self._write_object(stream)
+        with self._lock:
+            inserted = self._db.execute(
+                "INSERT OR IGNORE INTO submissions (intern, week, file_name, size, sha256, submitted_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (intern, week, file_name, size, sha256, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))).rowcount
+        return sha256, size, inserted == 0
+
+    def list(self, intern=None):
+        """Submission metadata, newest first. File bodies are never read."""
+        query = f"SELECT {', '.join(SUBMISSION_COLUMNS)} FROM submissions"
+        params = ()
+        if intern is not None:
+            query += " WHERE intern = ?"
+            params = (intern,)
+        with self._lock:
+            rows = self._db.execute(query + " ORDER BY id DESC", params).fetchall()
+        return pd.DataFrame(rows, columns=SUBMISSION_COLUMNS)
+
+
+@st.cache_resource(show_spinner=False)
+def init_submission_store():
+    """Initializes the shared submission store once per process. Called on first use rather
+    than at import, so processes that never take an upload (the load test) create no files.
+    """
+    return SubmissionStore(SUBMISSIONS_DIR)
+
+
+def list_submissions(intern=None):
+    """Submission metadata; empty without creating the store when nothing was ever uploaded."""
+    if not os.path.exists(os.path.join(SUBMISSIONS_DIR, "index.sqlite3")):
+        return pd.DataFrame(columns=SUBMISSION_COLUMNS)
+    return init_submission_store().list(intern)
+
+
+def display_submissions(df):
+    """Shows submission metadata with readable sizes."""
+    if df.empty:
+        st.info("No submissions yet.")
+        return
+    df = df.copy()
+    df["size"] = df["size"].map(lambda n: f"{n / 1024:.0f} KB" if n < 1024 * 1024 else f"{n / (1024 * 1024):.1f} MB")
+    df["sha256"] = df["sha256"].str[:12] # Enough to tell files apart at a glance
+    st.dataframe(df.rename(columns={"intern": "Intern", "week": "Week", "file_name": "File", "size": "Size",
+                                    "sha256": "SHA-256", "submitted_at": "Submitted"}),
+                 use_container_width=True, hide_index=True)
+ 
+ 
 # --- Streamlit UI Functions ---
 def display_tasks():
     """Displays the weekly tasks and submission form."""
@@ -211,45 +2258,106 @@ def display_tasks():
         st.write(f"**{week}:** {desc}")
  
     st.subheader("Submit Your Work")
-    with st.form("task_form"):
+    # clear_on_submit drops the uploaded file from the session once it has been stored
+    with st.form("task_form", clear_on_submit=True):
         selected_week = st.selectbox("Select Week", list(TASKS.keys()))
         uploaded_file = st.file_uploader("Upload File", type=["pdf", "docx"])
         submitted = st.form_submit_button("Submit")
         if submitted and uploaded_file:
-            st.success(f"✅ File uploaded for {selected_week}")
+            try:
+                _, _, duplicate = init_submission_store().add(uploaded_file, st.session_state.user_name, selected_week, uploaded_file.name)
+                if duplicate:
+                    st.info(f"You already submitted this file for {selected_week}.")
+                else:
+                    st.success(f"✅ File uploaded for {selected_week}")
+            except OSError as e:
+                st.error(f"Could not store the file: {e}")
         elif submitted and not uploaded_file:
             st.warning("Please upload a file to submit.")
+
+    if st.session_state.user_name in ADMIN_NAMES + MANAGER_NAMES:
+        st.subheader("All Submissions")
+        display_submissions(list_submissions())
+    else:
+        st.subheader("Your Submissions")
+        display_submissions(list_submissions(st.session_state.user_name))
  
  
+BLOG_PAGE_SIZE = 10 # Posts per blog board page
+
+
 def display_blog_board():
     """Displays the blog board with viewing, posting, and editing functionality."""
     st.header("Blog Board")
     st.info("View and share updates and insights. Only Admins & Chairman can post and edit.")
  
-    blog_ws = get_worksheet(client, SHEET_CONFIG["blog"]["id"], SHEET_CONFIG["blog"]["name"])
+    blog_ws = get_sheet("blog")
     if blog_ws is None: # If worksheet could not be retrieved, stop here.
         return
  
-    blogs_df = get_dataframe_from_sheet(blog_ws)
- 
     # Initialize session state for editing if not present
-    if 'edit_blog_idx' not in st.session_state:
-        st.session_state.edit_blog_idx = None
+    if 'edit_blog_row' not in st.session_state:
+        st.session_state.edit_blog_row = None # Sheet row of the post being edited
+    if 'edit_blog_original' not in st.session_state:
+        st.session_state.edit_blog_original = {}
     if 'edit_blog_title' not in st.session_state:
         st.session_state.edit_blog_title = ""
     if 'edit_blog_content' not in st.session_state:
         st.session_state.edit_blog_content = ""
  
-    if not blogs_df.empty:
-        # Check if all expected blog columns exist in the DataFrame
+    # Only the current page is read (one A1 range read, newest posts first), and widgets are
+    # created for the visible posts only, so the page costs the same however big the board gets
+    try:
+        total_rows = storage.row_count(blog_ws) # Header included
+        header = [str(h).strip() for h in storage.read_rows(blog_ws, 1, 1)[0]] if total_rows else []
+    except Exception as e:
+        client.handle_error(blog_ws, e)
+        st.error(f"Error reading data from worksheet '{blog_ws.title}': {e}")
+        return
+    n_posts = max(total_rows - 1, 0)
+ 
+    if n_posts:
+        # Check if all expected blog columns exist in the sheet header
         expected_cols = [BLOG_COLUMNS["title"], BLOG_COLUMNS["author"], BLOG_COLUMNS["timestamp"], BLOG_COLUMNS["content"]]
-        if not all(col in blogs_df.columns for col in expected_cols):
+        count_col = SHEET_CONFIG["blog"]["count_col"]
+        if header[count_col - 1:count_col] != [BLOG_COLUMNS["timestamp"]]:
+            st.warning(f"Blog posts are counted from column {count_col}, which should be '{BLOG_COLUMNS['timestamp']}'. "
+                       "Please update SHEET_CONFIG['blog']['count_col'].")
+            return
+        if not all(col in header for col in expected_cols):
             st.warning("Blog sheet columns do not match expected format. Please check sheet configuration and actual column headers.")
             return # Exit function if columns are incorrect
  
-        for idx, blog in blogs_df.iterrows():
-            # Check if this blog post is currently being edited
-            is_editing_this_post = (st.session_state.edit_blog_idx == idx)
+        blog_query = st.text_input("Search posts", key="blog_search", placeholder="Words (or the start of words) from titles and content")
+        if blog_query:
+            hits = search_sheet("blog", blog_query)
+            st.subheader(f"Search results ({len(hits)})")
+            for _, _, post in hits:
+                st.markdown(f"#### 🔎 {post[BLOG_COLUMNS['title']]}\n**By:** {post[BLOG_COLUMNS['author']]} &nbsp;&nbsp; ⏱ {post[BLOG_COLUMNS['timestamp']]}")
+                st.markdown(f"> {post[BLOG_COLUMNS['content']]}")
+            if not hits:
+                st.info("No posts match the search.")
+            st.markdown("---")
+ 
+        n_pages = -(-n_posts // BLOG_PAGE_SIZE)
+        if st.session_state.get("blog_page", 1) > n_pages:
+            st.session_state.blog_page = n_pages # The board shrank since the last rerun
+        page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="blog_page")
+        st.caption(f"Page {page} of {n_pages} · {n_posts} posts, newest first")
+        last_row = total_rows - (page - 1) * BLOG_PAGE_SIZE
+        first_row = max(2, last_row - BLOG_PAGE_SIZE + 1)
+        try:
+            page_rows = storage.read_rows(blog_ws, first_row, last_row)
+        except Exception as e:
+            client.handle_error(blog_ws, e)
+            st.error(f"Error reading data from worksheet '{blog_ws.title}': {e}")
+            return
+ 
+        for row_in_sheet in range(last_row, first_row - 1, -1):
+            values = page_rows[row_in_sheet - first_row] if row_in_sheet - first_row < len(page_rows) else []
+            blog = dict(zip(header, list(values) + [""] * (len(header) - len(values))))
+            if not any(str(v).strip() for v in blog.values()):
+                continue # Blank row in the sheet
  
             post_time = blog.get(BLOG_COLUMNS["timestamp"], 'Unknown')
  
@@ -261,8 +2369,9 @@ def display_blog_board():
                 col1, col2 = st.columns([1, 5])
                 with col1:
                     # Disable edit button if another post is already being edited
-                    if st.button("Edit Blog", key=f"edit_blog_{idx}", disabled=st.session_state.edit_blog_idx is not None):
-                        st.session_state.edit_blog_idx = idx
+                    if st.button("Edit Blog", key=f"edit_blog_{row_in_sheet}", disabled=st.session_state.edit_blog_row is not None):
+                        st.session_state.edit_blog_row = row_in_sheet
+                        st.session_state.edit_blog_original = blog
                         st.session_state.edit_blog_title = blog[BLOG_COLUMNS['title']]
                         st.session_state.edit_blog_content = blog[BLOG_COLUMNS['content']]
                         st.rerun() # Rerun to show the edit form
@@ -271,8 +2380,8 @@ def display_blog_board():
         st.info("No blog posts available yet.")
  
     # Edit functionality form (only for Admins and Chairman, and if a post is selected for editing)
-    if (st.session_state.is_admin or st.session_state.user_name == "Chairman") and st.session_state.edit_blog_idx is not None:
-        st.subheader(f"Edit Blog Post (Index: {st.session_state.edit_blog_idx})")
+    if (st.session_state.is_admin or st.session_state.user_name == "Chairman") and st.session_state.edit_blog_row is not None:
+        st.subheader(f"Edit Blog Post (Row: {st.session_state.edit_blog_row})")
         with st.form("edit_blog_form"):
             edited_title = st.text_input("Title", value=st.session_state.edit_blog_title, key="edited_blog_title")
             edited_content = st.text_area("Content", value=st.session_state.edit_blog_content, key="edited_blog_content")
@@ -285,38 +2394,32 @@ def display_blog_board():
  
             if submit_edit:
                 if edited_title and edited_content:
-                    # Retrieve the original row to preserve other columns (like author, timestamp)
-                    # Use .iloc to access by integer position if index is not unique or reset
-                    # Assuming blogs_df is still valid from the initial fetch
-                    if blogs_df.empty:
-                        st.error("Cannot save changes: Original blog data not found.")
-                        st.session_state.edit_blog_idx = None
-                        st.rerun()
-                        return
- 
-                    original_blog_row = blogs_df.iloc[st.session_state.edit_blog_idx]
+                    # The post as it was shown when Edit was clicked preserves the other columns
+                    original_blog_row = st.session_state.edit_blog_original
  
                     # Construct the updated row data in the exact order of your Google Sheet columns
                     # Based on BLOG_COLUMNS mapping: author, title, content, time
                     updated_blog_values = [
-                        original_blog_row[BLOG_COLUMNS["author"]],
+                        original_blog_row.get(BLOG_COLUMNS["author"], ""),
                         edited_title,
                         edited_content,
-                        original_blog_row[BLOG_COLUMNS["timestamp"]]
+                        original_blog_row.get(BLOG_COLUMNS["timestamp"], "")
                     ]
  
-                    # gspread uses 1-based indexing for rows. Add 2 (1 for header, 1 for 0-based index)
-                    row_in_sheet = st.session_state.edit_blog_idx + 2
+                    # Posts are only ever appended, so the sheet row stays valid
+                    row_in_sheet = st.session_state.edit_blog_row
                     if blog_ws and update_worksheet_row(blog_ws, row_in_sheet, updated_blog_values):
                         st.success("Blog post updated successfully!")
-                        st.session_state.edit_blog_idx = None # Clear edit state
+                        st.session_state.edit_blog_row = None # Clear edit state
+                        st.session_state.edit_blog_original = {}
                         st.session_state.edit_blog_title = ""
                         st.session_state.edit_blog_content = ""
                         st.rerun() # Rerun to refresh the blog list and clear form
                 else:
                     st.warning("Please fill in both title and content for the blog post.")
             elif cancel_edit:
-                st.session_state.edit_blog_idx = None # Clear edit state
+                st.session_state.edit_blog_row = None # Clear edit state
+                st.session_state.edit_blog_original = {}
                 st.session_state.edit_blog_title = ""
                 st.session_state.edit_blog_content = ""
                 st.rerun() # Rerun to clear form
@@ -354,34 +2457,253 @@ def display_intern_profiles():
     st.dataframe(df_profiles, use_container_width=True)
  
  
-def update_tracker_with_responses(log_ws):
-    """Updates the issue tracker with responses from the response sheet and logs changes."""
-    tracker_ws = get_worksheet(client, SHEET_CONFIG["tracker"]["id"], SHEET_CONFIG["tracker"]["name"])
-    response_ws = get_worksheet(client, SHEET_CONFIG["response"]["id"], SHEET_CONFIG["response"]["name"])
- 
-    if log_ws is None or tracker_ws is None or response_ws is None:
-        return # Exit if any required worksheet is not found
+def _is_blank(values):
+    """Vectorized "empty cell" test: NaN/None or whitespace-only text."""
+    values = np.asarray(values, dtype=object)
+    missing = pd.isna(values)
+    text = np.where(missing, "", values).astype(str)
+    return missing | (np.char.strip(text) == "")
+
+
+def reconcile_responses(tracker_df, responses_df, updated_by):
+    """Fills blank tracker cells from matching form responses as a keyed (hash) join.
+    Responses match tracker rows on (contact, issue title); for each blank tracker cell the
+    first matching response with a non-blank value wins. Returns the updated tracker, the
+    audit-log rows for every filled cell and the number of issues changed; raises KeyError
+    when the sheets lack the key columns.
+    """
+    contact_person_col = RESPONSE_COLUMNS["contact_person"]
+    issue_title_col = RESPONSE_COLUMNS["issue_title"]
+    tracker_contact_col = TRACKER_COLUMNS["contact"]
+    tracker_issue_title_col = TRACKER_COLUMNS["issue_title"]
+ 
+    # Validate existence of matching columns in both sheets
+    if contact_person_col not in responses_df.columns or issue_title_col not in responses_df.columns:
+        raise KeyError(f"Response sheet is missing required matching columns ('{contact_person_col}' or '{issue_title_col}'). Skipping.")
+    if tracker_contact_col not in tracker_df.columns or tracker_issue_title_col not in tracker_df.columns:
+        raise KeyError(f"Tracker sheet is missing required matching columns ('{tracker_contact_col}' or '{tracker_issue_title_col}'). Cannot process responses.")
+ 
+    # Hash index on (contact, title) -> first tracker row, then one lookup for all responses
+    tracker_keys = pd.MultiIndex.from_arrays([
+        tracker_df[tracker_contact_col].astype(str), tracker_df[tracker_issue_title_col].astype(str)])
+    first_rows = np.flatnonzero(~tracker_keys.duplicated())
+    key_index = tracker_keys[first_rows]
+    response_keys = pd.MultiIndex.from_arrays([
+        responses_df[contact_person_col].astype(str), responses_df[issue_title_col].astype(str)])
+    hits = key_index.get_indexer(response_keys)
+    target = np.where(hits >= 0, first_rows[np.maximum(hits, 0)], -1) # Tracker row per response
+ 
+    tracker_df = tracker_df.copy()
+    issue_ids = tracker_df[TRACKER_COLUMNS["id"]].astype(str).to_numpy()
+    changes = []
+    for resp_col, tracker_col in RESPONSE_TO_TRACKER_MAP.items():
+        if tracker_col not in tracker_df.columns or resp_col not in responses_df.columns:
+            continue
+        new_values = responses_df[resp_col].to_numpy(dtype=object)
+        candidates = np.flatnonzero((target >= 0) & ~_is_blank(new_values))
+        # First candidate response per tracker row (candidates are in response order)
+        rows, first = np.unique(target[candidates], return_index=True)
+        sources = candidates[first]
+        col_pos = tracker_df.columns.get_loc(tracker_col)
+        current = tracker_df.iloc[rows, col_pos].to_numpy(dtype=object, copy=True) # Not a view: logged as old values
+        fill = _is_blank(current) # Only update if the tracker field is empty or NaN
+        rows, sources = rows[fill], sources[fill]
+        if not len(rows):
+            continue
+        tracker_df.iloc[rows, col_pos] = new_values[sources]
+        changes.append((sources, np.full(len(rows), col_pos), rows,
+                        np.full(len(rows), tracker_col, dtype=object), current[fill], new_values[sources]))
+ 
+    if not changes:
+        return tracker_df, [], 0
+    sources, col_order, rows, fields, old_values, new_values = (np.concatenate(part) for part in zip(*changes))
+    order = np.lexsort((col_order, sources)) # Log in response order, then column order
+    rows, fields, old_values, new_values = rows[order], fields[order], old_values[order], new_values[order]
+    changed_rows = np.unique(rows)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    for col, value in ((TRACKER_COLUMNS["last_updated"], now), (TRACKER_COLUMNS["updated_by"], updated_by)):
+        if col not in tracker_df.columns:
+            tracker_df[col] = pd.Series("", index=tracker_df.index, dtype=object) # Created, as .at would
+        tracker_df.iloc[changed_rows, tracker_df.columns.get_loc(col)] = value
+ 
+    def as_text(values):
+        return np.where(pd.isna(values), "", values).astype(str).tolist() # NaN -> "" for the log
+    log_rows = [
+        [now, updated_by, field, old, new, issue_id]
+        for field, old, new, issue_id in zip(
+            fields.tolist(), as_text(old_values), as_text(new_values), issue_ids[rows].tolist())
+    ]
+    return tracker_df, log_rows, len(changed_rows)
+ 
+ 
+# --- Response Sync Watermark ---
+# Form responses are append-only, so the sync remembers the last response row it processed (and
+# that row's Timestamp) in the "Sync State" worksheet and only reads the rows after it, in bounded
+# range reads. When the row at the watermark no longer carries the recorded timestamp (responses
+# were deleted or re-sorted), or FULL_RESCAN_HOURS have passed, it re-scans the whole sheet, which
+# also picks up edited responses and ones whose tracker row was added later.
+SYNC_BATCH_ROWS = 500
+FULL_RESCAN_HOURS = float(os.getenv("FULL_RESCAN_HOURS", "24"))
+SYNC_STATE_KEYS = ["response_row", "response_timestamp", "last_full_scan"]
+
+
+@st.cache_resource(show_spinner=False)
+def init_response_headers():
+    """Response-sheet header rows per worksheet, so incremental reads skip row 1."""
+    return {}
+
+response_headers = init_response_headers()
+
+
+def get_sync_state_worksheet():
+    """Returns the Sync State worksheet, creating it on first use (None if that fails)."""
+    cfg = SHEET_CONFIG["sync_state"]
+    try:
+        return client.worksheet(cfg["id"], cfg["name"])
+    except gspread.exceptions.WorksheetNotFound:
+        try:
+            spreadsheet = client.spreadsheet(cfg["id"])
+            worksheet = sheets_api.call(spreadsheet.add_worksheet, title=cfg["name"], rows=10, cols=2, idempotent=False)
+            storage.update_range(worksheet, "A1:B1", [["Key", "Value"]])
+            return worksheet
+        except Exception:
+            return None # Without a watermark every sync is a full re-scan
+    except Exception:
+        return None
+
+
+def read_sync_state(worksheet):
+    """Reads the watermark; a missing or unreadable state means "nothing processed yet"."""
+    state = {"response_row": 1, "response_timestamp": "", "last_full_scan": ""} # Row 1 is the header
+    if worksheet is None:
+        return state
+    try:
+        rows = storage.values(worksheet)[1:len(SYNC_STATE_KEYS) + 1]
+    except Exception as e:
+        client.handle_error(worksheet, e)
+        return state
+    for row in rows:
+        if len(row) >= 2 and row[0] in state:
+            state[row[0]] = row[1]
+    try:
+        state["response_row"] = max(int(state["response_row"]), 1)
+    except (TypeError, ValueError):
+        state["response_row"] = 1
+    return state
+
+
+def write_sync_state(worksheet, state):
+    """Saves the watermark (one small range write)."""
+    if worksheet is None:
+        return False
+    try:
+        storage.update_range(worksheet, f"A2:B{len(SYNC_STATE_KEYS) + 1}", [[key, str(state[key])] for key in SYNC_STATE_KEYS])
+        return True
+    except Exception as e:
+        client.handle_error(worksheet, e)
+        return False
+
+
+def full_rescan_due(state):
+    """True when no full re-scan is recorded or the last one is older than FULL_RESCAN_HOURS."""
+    try:
+        last = datetime.strptime(state["last_full_scan"], "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return True
+    return (datetime.now() - last).total_seconds() > FULL_RESCAN_HOURS * 3600
+
+
+def fetch_new_responses(response_ws, state):
+    """Reads the responses after the watermark in SYNC_BATCH_ROWS range reads.
+    Returns (DataFrame, last row, last timestamp), or None when the watermark row no longer
+    matches the recorded timestamp and a full re-scan is needed.
+    """
+    cache_key = sheet_cache.key(response_ws)
+    header = response_headers.get(cache_key)
+    try:
+        if header is None:
+            header = [str(h).strip() for h in sheets_read(response_ws, "row_values", 1)]
+            response_headers[cache_key] = header
+        if not header:
+            return None
+        last_col = gspread.utils.rowcol_to_a1(1, len(header))[:-1] # "N1" -> "N"
+        ts_pos = header.index(RESPONSE_COLUMNS["timestamp"]) if RESPONSE_COLUMNS["timestamp"] in header else None
+
+        row = state["response_row"]
+        # Re-read the watermark row itself to check it still is the row we stopped at
+        verify = row > 1 and ts_pos is not None and state["response_timestamp"] != ""
+        start = row if verify else row + 1
+        rows = []
+        while True:
+            batch = sheets_read(response_ws, "get", f"A{start}:{last_col}{start + SYNC_BATCH_ROWS - 1}")
+            rows.extend(batch)
+            if len(batch) < SYNC_BATCH_ROWS:
+                break
+            start += SYNC_BATCH_ROWS
+    except Exception as e:
+        client.handle_error(response_ws, e)
+        return None
+
+    def cell(values, pos):
+        return values[pos] if pos < len(values) else ""
+    if verify:
+        if not rows or str(cell(rows[0], ts_pos)) != state["response_timestamp"]:
+            return None
+        rows = rows[1:]
+
+    last_row = row + len(rows)
+    last_ts = str(cell(rows[-1], ts_pos)) if rows and ts_pos is not None else state["response_timestamp"]
+    rows = [list(r) + [""] * (len(header) - len(r)) for r in rows if any(str(v).strip() for v in r)]
+    responses_df = pd.DataFrame(rows, columns=header, dtype=object) if rows else pd.DataFrame()
+    return responses_df, last_row, last_ts
+
+
+def sync_responses(full_rescan=False, updated_by="Response Sync"):
+    """Updates the issue tracker with responses from the response sheet and logs changes.
+    Only responses after the sync watermark are read, unless full_rescan is set (or due).
+    Makes no Streamlit UI calls and doesn't touch session state, so the background worker can
+    run it; returns a (level, message) pair for the caller to show.
+    """
+    tracker_ws = get_sheet("tracker")
+    response_ws = get_sheet("response")
  
-    # Initialize log sheet header if empty
-    if not log_ws.get_all_values():
-        append_row_to_sheet(log_ws, [
-            LOG_COLUMNS["timestamp"],
-            LOG_COLUMNS["updated_by"],
-            LOG_COLUMNS["field"],
-            LOG_COLUMNS["old_value"],
-            LOG_COLUMNS["new_value"],
-            LOG_COLUMNS["issue_id"]
-        ])
+    if tracker_ws is None or response_ws is None:
+        return "error", "A required worksheet could not be opened." # Exit if any required worksheet is not found
  
-    tracker_df = get_dataframe_from_sheet(tracker_ws)
-    responses_df = get_dataframe_from_sheet(response_ws)
+    # Log rows go to the month's log partition, which gets its header when created
+    try:
+        # Read directly: an empty frame from a failed read would re-initialize the tracker below
+        tracker_df = storage.read(tracker_ws)
+    except Exception as e:
+        client.handle_error(tracker_ws, e)
+        return "error", f"Could not read the tracker: {e}"
+    state_ws = get_sync_state_worksheet()
+    state = read_sync_state(state_ws)
+    new_state = dict(state)
+
+    responses_df = None
+    if not (full_rescan or tracker_df.empty or full_rescan_due(state)):
+        fetched = fetch_new_responses(response_ws, state)
+        if fetched is not None:
+            responses_df, new_state["response_row"], new_state["response_timestamp"] = fetched
+    if responses_df is None: # Full re-scan
+        try:
+            # Read directly: an empty frame from a failed read would reset the watermark below
+            responses_df = storage.read(response_ws, ttl=0)
+        except Exception as e:
+            client.handle_error(response_ws, e)
+            return "error", f"Could not read the form responses: {e}"
+        response_headers.pop(sheet_cache.key(response_ws), None) # Re-read the header next time
+        new_state["response_row"] = len(responses_df) + 1
+        ts_col = RESPONSE_COLUMNS["timestamp"]
+        new_state["response_timestamp"] = (
+            str(responses_df[ts_col].iloc[-1]) if not responses_df.empty and ts_col in responses_df.columns else "")
+        new_state["last_full_scan"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    original_tracker_df = tracker_df.copy() # Baseline for the cell-level diff write
  
     if tracker_df.empty:
-        st.warning("Tracker sheet is empty. Initializing with responses...")
-
         if responses_df.empty:
-            st.info("No responses available to initialize tracker.")
-            return
+            return "info", "No responses available to initialize tracker."
 
         # Create a new tracker DataFrame from the responses
         initial_rows = []
@@ -403,112 +2725,238 @@ def update_tracker_with_responses(log_ws):
                 TRACKER_COLUMNS["date"]: resp.get(RESPONSE_COLUMNS["date_submission"], ""),
                 TRACKER_COLUMNS["status"]: "Open",
                 TRACKER_COLUMNS["response"]: "",
-                TRACKER_COLUMNS["updated_by"]: st.session_state.user_name,
+                TRACKER_COLUMNS["updated_by"]: updated_by,
                 TRACKER_COLUMNS["last_updated"]: datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             }
             initial_rows.append(new_row)
 
-        tracker_df = pd.DataFrame(initial_rows)
-        update_entire_worksheet(tracker_ws, tracker_df)
-        st.success("Tracker initialized with data from responses.")
- 
-    # Define the mapping from response sheet columns to tracker sheet columns
-    response_to_tracker_map = {
-        RESPONSE_COLUMNS["email_phone"]: TRACKER_COLUMNS["email_phone"],
-        RESPONSE_COLUMNS["description"]: TRACKER_COLUMNS["description"],
-        RESPONSE_COLUMNS["issue_type"]: TRACKER_COLUMNS["issue_type"],
-        RESPONSE_COLUMNS["gov_body"]: TRACKER_COLUMNS["gov_body"],
-        RESPONSE_COLUMNS["priority_level"]: TRACKER_COLUMNS["priority"],
-        RESPONSE_COLUMNS["proposed_resolution"]: TRACKER_COLUMNS["resolution"],
-        RESPONSE_COLUMNS["file"]: TRACKER_COLUMNS["file"],
-        RESPONSE_COLUMNS["date_submission"]: TRACKER_COLUMNS["date"]
-    }
- 
-    updated_count = 0
-    for i, resp in responses_df.iterrows():
-        # Match based on 'Contact Person Name & Designation' and 'Title of Issue'
-        contact_person_col = RESPONSE_COLUMNS["contact_person"]
-        issue_title_col = RESPONSE_COLUMNS["issue_title"]
-        tracker_contact_col = TRACKER_COLUMNS["contact"]
-        tracker_issue_title_col = TRACKER_COLUMNS["issue_title"]
- 
-        # Validate existence of matching columns in response data
-        if contact_person_col not in resp or issue_title_col not in resp:
-            st.warning(f"Response row {i+2} is missing required matching columns ('{contact_person_col}' or '{issue_title_col}'). Skipping.")
-            continue
-        # Validate existence of matching columns in tracker dataframe
-        if tracker_contact_col not in tracker_df.columns or tracker_issue_title_col not in tracker_df.columns:
-            st.error(f"Tracker sheet is missing required matching columns ('{tracker_contact_col}' or '{tracker_issue_title_col}'). Cannot process responses.")
-            return
+        tracker_df = pd.DataFrame(initial_rows, dtype=object)
+        if not update_entire_worksheet(tracker_ws, tracker_df):
+            return "error", "Failed to initialize the tracker from responses."
+        original_tracker_df = tracker_df.copy()
+
+    if responses_df.empty:
+        if new_state != state:
+            write_sync_state(state_ws, new_state)
+        return "info", "No new responses found to update the tracker."
  
-        match = tracker_df[
-            (tracker_df[tracker_contact_col] == resp[contact_person_col]) &
-            (tracker_df[tracker_issue_title_col] == resp[issue_title_col])
-        ]
- 
-        if not match.empty:
-            row_idx = match.index[0]
-            # Ensure current_issue_id is converted to string to prevent JSON serialization errors
-            current_issue_id = str(tracker_df.at[row_idx, TRACKER_COLUMNS["id"]])
- 
-            changes_made_to_row = False
-            for resp_col, tracker_col in response_to_tracker_map.items():
-                if tracker_col in tracker_df.columns and resp_col in resp:
-                    # Only update if the tracker field is empty or NaN
-                    if pd.isna(tracker_df.at[row_idx, tracker_col]) or str(tracker_df.at[row_idx, tracker_col]).strip() == "":
-                        old_value = tracker_df.at[row_idx, tracker_col]
-                        new_value = resp[resp_col]
-                        tracker_df.at[row_idx, tracker_col] = new_value
-                        changes_made_to_row = True
- 
-                        # Log the individual change
-                        append_row_to_sheet(log_ws, [
-                            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                            st.session_state.user_name,
-                            tracker_col, # Corrected: Use tracker_col here
-                            str(old_value) if pd.notna(old_value) else "", # Convert NaN to empty string for log
-                            str(new_value) if pd.notna(new_value) else "",
-                            current_issue_id
-                        ])
- 
-            if changes_made_to_row:
-                tracker_df.at[row_idx, TRACKER_COLUMNS["last_updated"]] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                tracker_df.at[row_idx, TRACKER_COLUMNS["updated_by"]] = st.session_state.user_name
-                updated_count += 1
+    try:
+        tracker_df, log_rows, updated_count = reconcile_responses(tracker_df, responses_df, updated_by)
+    except KeyError as e:
+        return "warning", e.args[0]
  
     if updated_count > 0:
-        # Update the entire tracker worksheet with the modified DataFrame
-        if update_entire_worksheet(tracker_ws, tracker_df):
-            st.success(f"Tracker updated successfully with {updated_count} new responses!")
-        else:
-            st.error("Failed to write updated tracker data back to the sheet.")
+        # Write back only the cells that were filled in. tracker_df was read before the lock, so
+        # never rewrite the whole sheet from it: that would undo issue edits saved since.
+        with issue_repository.write_lock: # Don't interleave with a conditional issue edit
+            if list(tracker_df.columns) == list(original_tracker_df.columns):
+                written = write_dataframe_changes(tracker_ws, original_tracker_df, tracker_df, allow_rewrite=False)
+            else: # Columns were added, which needs a rewrite: redo the join on the tracker as it is now
+                try:
+                    current_df = storage.read(tracker_ws, ttl=0)
+                except Exception as e:
+                    client.handle_error(tracker_ws, e)
+                    return "error", f"Could not read the tracker: {e}"
+                tracker_df, log_rows, updated_count = reconcile_responses(current_df, responses_df, updated_by)
+                written = update_entire_worksheet(tracker_ws, tracker_df)
+        if not written:
+            return "error", "Failed to write updated tracker data back to the sheet."
+        audit_log.flush(log_rows)
+        write_sync_state(state_ws, new_state) # Advance the watermark only once the write landed
+        return "success", f"Tracker updated successfully with {updated_count} new responses!"
+    if new_state != state:
+        write_sync_state(state_ws, new_state)
+    return "info", "No new responses found to update the tracker."
+ 
+ 
+# --- Background Response Sync ---
+# Syncing runs on one worker thread per process instead of inside page renders: it wakes every
+# SYNC_INTERVAL_SECONDS (or when an admin asks), and a single-flight lock makes sure concurrent
+# requests never run two syncs at once. Pages render the tracker snapshot they already have and
+# show the worker's status and how far behind it is.
+SYNC_INTERVAL_SECONDS = float(os.getenv("SYNC_INTERVAL_SECONDS", "300"))
+SYNC_UPDATED_BY = "Response Sync"
+
+
+class ResponseSyncService:
+    """Runs sync on an interval or on demand; at most one run at a time per process."""
+
+    def __init__(self, sync, interval):
+        self._sync = sync
+        self.interval = interval
+        self._run_lock = threading.Lock() # Single flight
+        self._state_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._full_requested = False
+        self._thread = None
+        self._status = {"running": False, "last_run": None, "last_success": None,
+                        "level": None, "message": "Waiting for the first sync."}
+
+    def start(self):
+        with self._state_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="response-sync", daemon=True)
+                self._thread.start()
+
+    def request(self, full_rescan=False):
+        """Asks the worker to sync now (coalesced with any request already waiting)."""
+        with self._state_lock:
+            self._full_requested = self._full_requested or full_rescan
+        self._wake.set()
+
+    def run_once(self, full_rescan=False):
+        """Runs one sync unless another is in flight; returns whether it ran."""
+        if not self._run_lock.acquire(blocking=False):
+            return False
+        try:
+            with self._state_lock:
+                self._status["running"] = True
+            started = time.time()
+            with collect_errors() as errors: # Helper errors would otherwise vanish off the page
+                try:
+                    level, message = self._sync(full_rescan=full_rescan, updated_by=SYNC_UPDATED_BY)
+                except Exception as e:
+                    level, message = "error", f"Sync failed: {e}"
+            if errors:
+                level, message = "error", " ".join([message] + errors)
+            with self._state_lock:
+                self._status.update(running=False, last_run=started, level=level, message=message)
+                if level != "error":
+                    self._status["last_success"] = started
+            return True
+        finally:
+            self._run_lock.release()
+
+    def _loop(self):
+        while True:
+            with self._state_lock:
+                full_rescan, self._full_requested = self._full_requested, False
+            self.run_once(full_rescan=full_rescan)
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def status(self):
+        """Copy of the last run's outcome, plus lag in seconds since the last good sync."""
+        with self._state_lock:
+            status = dict(self._status)
+        status["lag"] = None if status["last_success"] is None else time.time() - status["last_success"]
+        return status
+
+
+@st.cache_resource(show_spinner=False)
+def init_response_sync():
+    """Starts the process-wide response sync worker once."""
+    service = ResponseSyncService(sync_responses, SYNC_INTERVAL_SECONDS)
+    service.start()
+    return service
+
+
+def display_sync_status(service):
+    """Shows when responses were last synced and lets admins trigger a sync."""
+    status = service.status()
+    if status["running"]:
+        state = "syncing now"
+    elif status["last_success"] is None:
+        state = "not synced yet"
     else:
-        st.info("No new responses found to update the tracker.")
- 
- 
+        state = f"last synced {int(status['lag'])}s ago"
+    st.caption(f"Form responses: {state} (every {int(service.interval)}s). {status['message']}")
+    pending = storage.pending_count()
+    if pending:
+        st.caption(f"{pending} local write(s) waiting to replicate to Google Sheets."
+                   + (f" Last error: {storage.last_error}" if storage.last_error else ""))
+    if audit_log.partitions.last_error:
+        st.caption(audit_log.partitions.last_error)
+    if status["level"] == "error":
+        st.warning(f"Last response sync failed: {status['message']}")
+
+    if st.session_state.user_name in ADMIN_NAMES:
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Sync responses now", key="sync_responses_now"):
+                service.request()
+                st.info("Sync requested; the table refreshes once it finishes.")
+        with col2:
+            if st.button("Full re-sync of responses", key="full_response_resync",
+                         help="Re-scan every form response instead of only the ones after the sync watermark."):
+                service.request(full_rescan=True)
+                st.info("Full re-sync requested; the table refreshes once it finishes.")
+ 
+ 
+def display_api_diagnostics():
+    """Admin panel: Sheets API usage per page view, tab and user, plus call latency histograms."""
+    with st.expander("API diagnostics"):
+        reruns = api_metrics.recent()
+        if not reruns:
+            st.caption("No page views recorded yet.")
+            return
+        mine = [r for r in reruns if r["user"] == st.session_state.user_name]
+        if mine:
+            last = mine[-1]
+            st.caption(f"Your previous page view: {last['api_calls']} API call(s) taking {last['api_seconds']:.2f}s, "
+                       f"{last['bytes_in'] / 1024:.0f} KB down, {last['seconds']:.2f}s in total.")
+
+        views = pd.DataFrame(reruns)
+        views["KB in"] = views["bytes_in"] / 1024
+        summary = {"page views": ("seconds", "size"), "API calls / view": ("api_calls", "mean"),
+                   "API seconds / view": ("api_seconds", "mean"), "KB in / view": ("KB in", "mean"),
+                   "p50 seconds": ("seconds", "median"), "p95 seconds": ("seconds", lambda s: s.quantile(0.95)),
+                   "429s": ("throttled", "sum")}
+        st.write(f"**By tab** (last {len(views)} page views)")
+        st.dataframe(views.groupby("tab").agg(**summary).round(2), use_container_width=True)
+        st.write("**By user**")
+        st.dataframe(views.groupby("user").agg(**summary).round(2), use_container_width=True)
+        st.write("**API call latency** (calls per bucket since start-up)")
+        st.dataframe(api_metrics.histogram_frame(), use_container_width=True)
+        background = api_metrics.background_frame()
+        if not background.empty:
+            st.write("**Background workers**")
+            st.dataframe(background, use_container_width=True, hide_index=True)
+        st.write("**Recent page views**")
+        st.dataframe(views[["time", "user", "tab", "seconds", "api_calls", "api_seconds", "KB in", "errors"]].iloc[::-1].head(50),
+                     use_container_width=True, hide_index=True)
+        st.caption(f"Each page view is also appended to {api_metrics.path}.")
+
+
 def display_issue_tracker():
     """Displays the issue tracker functionality (admin-only)."""
     st.header("Issue Tracker")
     st.info("Employee-only section for managing issues raised by departments.")
  
-    log_ws = get_worksheet(client, SHEET_CONFIG["log"]["id"], SHEET_CONFIG["log"]["name"])
-    tracker_ws = get_worksheet(client, SHEET_CONFIG["tracker"]["id"], SHEET_CONFIG["tracker"]["name"])
+    tracker_ws = get_sheet("tracker")
  
-    if log_ws is None or tracker_ws is None:
-        return # Exit if any required worksheet is not found
+    if tracker_ws is None:
+        return # Exit if the worksheet is not found
  
-    # First, process any new responses from the response sheet
-    update_tracker_with_responses(log_ws)
+    # New responses are merged in by the background sync worker; show how fresh the data is
+    display_sync_status(init_response_sync())
  
     # Then, display the current tracker data and allow for manual updates
     st.subheader("Current Issue Tracker Data")
-    tracker_df = get_dataframe_from_sheet(tracker_ws)
- 
-    if not tracker_df.empty:
-        if st.session_state.user_name in ADMIN_NAMES:
-            st.dataframe(tracker_df, use_container_width=True)
-        elif st.session_state.user_name in MANAGER_NAMES:
-            tracker_df = tracker_df[tracker_df[""]]
+    repo = get_issue_repository(tracker_ws)
+    positions = repo.view(st.session_state.user_name) # Everything for admins, own verticals for managers
+    if not positions and st.session_state.user_name in MANAGER_NAMES and repo.values("business_vertical"):
+        # Most likely the configured vertical names don't match the form's options exactly
+        st.warning(f"No issues match your business verticals "
+                   f"({', '.join(MANAGER_VERTICALS.get(st.session_state.user_name, [])) or 'none configured'}). "
+                   f"Verticals in the tracker: {', '.join(repo.values('business_vertical'))}. "
+                   f"Ask an admin to check {MANAGER_VERTICALS_FILE}.")
+ 
+    if positions:
+        # Filters are answered from the repository's hash indexes
+        col_status, col_priority, col_contact = st.columns(3)
+        with col_status:
+            status_filter = st.multiselect("Status", repo.values("status"), key="tracker_filter_status")
+        with col_priority:
+            priority_filter = st.multiselect("Priority", repo.values("priority"), key="tracker_filter_priority")
+        with col_contact:
+            contact_filter = st.multiselect("Contact", repo.values("contact"), key="tracker_filter_contact")
+        criteria = {key: values for key, values in
+                    (("status", status_filter), ("priority", priority_filter), ("contact", contact_filter)) if values}
+        if criteria:
+            positions = repo.where(positions, **criteria)
+        tracker_df = repo.rows(positions)
+        st.dataframe(tracker_df, use_container_width=True)
  
         # Initialize session state for editing an issue
         if 'editing_tracker_issue_id' not in st.session_state:
@@ -518,23 +2966,41 @@ def display_issue_tracker():
  
         st.subheader("Update Existing Issue")
  
-        # Create a list of issue titles for the selectbox
-        issue_titles = ["Select an Issue to Edit"] + tracker_df[TRACKER_COLUMNS["issue_title"]].tolist()
-        selected_issue_title = st.selectbox(
+        # Narrow the selectbox with a ranked search over titles, descriptions, resolutions and responses
+        issue_ids = [_index_key(v) for v in tracker_df[TRACKER_COLUMNS["id"]]]
+        issue_query = st.text_input("Search issues", key="issue_search",
+                                    placeholder="Words (or the start of words) from the title, description, resolution or response")
+        if issue_query:
+            visible = set(issue_ids)
+            hits = [(score, fields) for _, score, fields in search_sheet("tracker", issue_query, limit=50)
+                    if _index_key(fields[TRACKER_COLUMNS["id"]]) in visible]
+            if hits:
+                st.dataframe(pd.DataFrame([dict(fields, Score=round(score, 2)) for score, fields in hits]),
+                             use_container_width=True, hide_index=True)
+            else:
+                st.info("No issues match the search.")
+            issue_ids = list(dict.fromkeys(_index_key(fields[TRACKER_COLUMNS["id"]]) for _, fields in hits))
+ 
+        # Issues are selected by ID (titles need not be unique); the label shows the title too
+        titles = dict(zip((_index_key(v) for v in tracker_df[TRACKER_COLUMNS["id"]]),
+                          tracker_df[TRACKER_COLUMNS["issue_title"]]))
+        selected_issue_id = st.selectbox(
             "Choose an Issue to Update",
-            issue_titles,
+            [None] + issue_ids,
+            format_func=lambda issue_id: "Select an Issue to Edit" if issue_id is None else f"{issue_id} — {titles.get(issue_id, '')}",
             key="select_issue_to_edit"
         )
  
-        if selected_issue_title != "Select an Issue to Edit":
-            # Find the selected row in the DataFrame
-            selected_row = tracker_df[tracker_df[TRACKER_COLUMNS["issue_title"]] == selected_issue_title].iloc[0]
+        selected_row = repo.get(selected_issue_id) if selected_issue_id is not None else None
+        if selected_row is not None:
+            # Pre-fill session state for the form. The row as first opened stays the edit's base
+            # (for the conflict check on save) until the edit is saved, cancelled or switched.
+            if (st.session_state.editing_tracker_issue_id != selected_row[TRACKER_COLUMNS["id"]]
+                    or not st.session_state.editing_tracker_data):
+                st.session_state.editing_tracker_issue_id = selected_row[TRACKER_COLUMNS["id"]]
+                st.session_state.editing_tracker_data = selected_row
  
-            # Pre-fill session state for the form
-            st.session_state.editing_tracker_issue_id = selected_row[TRACKER_COLUMNS["id"]]
-            st.session_state.editing_tracker_data = selected_row.to_dict()
- 
-            st.write(f"Editing Issue: **{selected_issue_title}**")
+            st.write(f"Editing Issue: **{selected_row[TRACKER_COLUMNS['issue_title']]}**")
  
             with st.form("edit_tracker_issue_form"):
                 # Display non-editable fields
@@ -582,11 +3048,7 @@ def display_issue_tracker():
                     cancel_edit = st.form_submit_button("Cancel")
  
                 if save_changes:
-                    # Find the original row index in the DataFrame
-                    original_row_idx = tracker_df[tracker_df[TRACKER_COLUMNS["id"]] == st.session_state.editing_tracker_issue_id].index[0]
- 
-                    changes_made = {}
-                    # Compare and update fields, logging changes
+                    base = st.session_state.editing_tracker_data
                     fields_to_update = {
                         TRACKER_COLUMNS["email_phone"]: updated_email_phone,
                         TRACKER_COLUMNS["description"]: updated_description,
@@ -599,35 +3061,31 @@ def display_issue_tracker():
                         TRACKER_COLUMNS["status"]: updated_status,
                         TRACKER_COLUMNS["response"]: updated_response
                     }
- 
-                    for col_name, new_value in fields_to_update.items():
-                        current_value = tracker_df.at[original_row_idx, col_name]
-                        # Convert to string for comparison to handle potential type differences (e.g., int vs str)
-                        if str(current_value).strip() != str(new_value).strip():
-                            tracker_df.at[original_row_idx, col_name] = new_value
-                            changes_made[col_name] = {"old": current_value, "new": new_value}
- 
-                            # Log the change
-                            append_row_to_sheet(log_ws, [
-                                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                st.session_state.user_name,
-                                col_name,
-                                str(current_value) if pd.notna(current_value) else "",
-                                str(new_value) if pd.notna(new_value) else "",
-                                str(st.session_state.editing_tracker_issue_id)
-                            ])
- 
-                    if changes_made:
-                        tracker_df.at[original_row_idx, TRACKER_COLUMNS["last_updated"]] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        tracker_df.at[original_row_idx, TRACKER_COLUMNS["updated_by"]] = st.session_state.user_name
- 
-                        if update_entire_worksheet(tracker_ws, tracker_df):
-                            st.success("Issue updated successfully!")
+                    # Only fields changed in the form relative to the base are sent for merging
+                    edits = {col: value for col, value in fields_to_update.items() if not _same(value, base.get(col, ""))}
+ 
+                    if edits:
+                        applied, conflicts, error = save_issue_edits(
+                            tracker_ws, repo, st.session_state.editing_tracker_issue_id, base, edits, st.session_state.user_name)
+                        if error:
+                            st.error(error)
+                        else:
+                            # Buffer the changes; written in one batch after the tracker
+                            log_rows = [audit_row(st.session_state.editing_tracker_issue_id, col, old, new)
+                                        for col, (old, new) in applied.items()]
+                            if log_rows:
+                                audit_log.flush(log_rows)
                             st.session_state.editing_tracker_issue_id = None
                             st.session_state.editing_tracker_data = {}
-                            st.rerun()
-                        else:
-                            st.error("Failed to save changes to the tracker sheet.")
+                            if conflicts:
+                                # Someone else changed these fields since the form was opened; theirs were kept
+                                st.warning(f"Saved {len(applied)} field(s), but {len(conflicts)} field(s) were changed by someone else "
+                                           "since you opened this issue and were left as they are. Review them and edit again if needed.")
+                                st.table(pd.DataFrame([{"Field": col, "Current value": theirs, "Your value": yours}
+                                                       for col, (theirs, yours) in conflicts.items()]))
+                            else:
+                                st.success("Issue updated successfully!")
+                                st.rerun()
                     else:
                         st.info("No changes detected.")
                         st.session_state.editing_tracker_issue_id = None
@@ -639,10 +3097,249 @@ def display_issue_tracker():
                     st.session_state.editing_tracker_data = {}
                     st.rerun()
  
+    elif st.session_state.user_name in MANAGER_NAMES and len(repo):
+        st.info("No issues for your business verticals yet.")
     else:
         st.info("Tracker is currently empty. No issues to display or update.")
  
  
+# --- Issue Analytics ---
+# Resolution analytics are materialized from the audit log: each refresh folds only the log rows
+# written since the checkpoint (rows processed per log worksheet) into running aggregates, i.e.
+# each issue's current status and since when, completed time-in-status intervals, resolution
+# times and closes/reopens per day. The aggregates and checkpoint are saved to a local JSON file,
+# so a restart resumes where it stopped. Ageing and open/closed counts combine them with the
+# tracker's current rows, which are already in memory.
+ANALYTICS_STATE_FILE = os.getenv("JIO_ANALYTICS_FILE", "jio_issue_analytics.json")
+ANALYTICS_REFRESH_SECONDS = 60 # At most one log check per process this often
+RESOLVED_STATUSES = {"Resolved", "Closed"}
+AGEING_BUCKETS = [(7, "0-7 days"), (30, "8-30 days"), (90, "31-90 days"), (float("inf"), "90+ days")]
+LEGACY_LOG_TITLE = SHEET_CONFIG["log"]["name"] # History written before the log was partitioned
+
+
+def _parse_time(value):
+    try:
+        return datetime.strptime(str(value).strip(), "%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+def _opened_times(df):
+    """Issue id -> when it was opened (the tracker's Date column), as epoch seconds."""
+    id_col, date_col = TRACKER_COLUMNS["id"], TRACKER_COLUMNS["date"]
+    if df.empty or id_col not in df.columns or date_col not in df.columns:
+        return {}
+    dates = pd.to_datetime(df[date_col].astype(str), format="mixed", errors="coerce")
+    return {str(issue): stamp.timestamp() for issue, stamp in zip(df[id_col], dates) if pd.notna(stamp)}
+
+
+class IssueAnalytics:
+    """Aggregates over the audit log, maintained incrementally from a per-worksheet checkpoint."""
+
+    def __init__(self, path=ANALYTICS_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self.checked_at = 0.0
+        self.state = self._empty()
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    self.state.update(json.load(fh))
+            except (OSError, ValueError):
+                pass # Rebuilt from the log on the next refresh
+
+    @staticmethod
+    def _empty():
+        return {"checkpoint": {}, "built_month": None, "status": {}, "durations": {}, "resolved_at": {},
+                "closed_by_day": {}, "reopened_by_day": {}}
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self.state, fh)
+        os.replace(tmp_path, self.path)
+
+    def _sources(self):
+        """(spreadsheet id, title) of the log worksheets that may hold unprocessed rows, oldest first.
+        Checkpoints are keyed by title: rotation moves a partition to the archive under the same title.
+        """
+        log_id = SHEET_CONFIG["log"]["id"]
+        checkpoint = self.state["checkpoint"]
+        current = datetime.now().strftime("%Y-%m")
+        if not checkpoint: # First build: everything in the log spreadsheet and the archive
+            self.state["built_month"] = current
+            found = {}
+            for sheet_id in filter(None, (LOG_ARCHIVE_SHEET_ID, log_id)): # Log last, so a half-finished move reads the original
+                for ws in sheets_api.call(client.spreadsheet(sheet_id).worksheets):
+                    if ws.title.startswith(LOG_PARTITION_PREFIX) or (sheet_id == log_id and ws.title == LEGACY_LOG_TITLE):
+                        found[ws.title] = sheet_id
+            legacy = [(log_id, LEGACY_LOG_TITLE)] if LEGACY_LOG_TITLE in found else []
+            return legacy + [(found[t], t) for t in sorted(found) if t != LEGACY_LOG_TITLE]
+        # Afterwards only the newest processed partition and any created since can grow
+        months = [t[len(LOG_PARTITION_PREFIX):] for t in checkpoint if t.startswith(LOG_PARTITION_PREFIX)]
+        index = _month_index(max(months) if months else self.state.get("built_month") or current)
+        sources = []
+        while index <= _month_index(current):
+            sources.append((log_id, AuditLogPartitions.name(f"{index // 12:04d}-{index % 12 + 1:02d}")))
+            index += 1
+        return sources
+
+    def _fold(self, row, pos, opened):
+        cell = lambda key: str(row[pos[key]]).strip() if pos.get(key) is not None and pos[key] < len(row) else ""
+        if cell("field") != TRACKER_COLUMNS["status"]:
+            return
+        stamp, issue = _parse_time(cell("timestamp")), cell("issue_id")
+        if stamp is None or not issue:
+            return
+        ts, old, new = stamp.timestamp(), cell("old_value"), cell("new_value")
+        state = self.state
+        current = state["status"].get(issue)
+        if current == [new, ts]:
+            return # The same change logged twice (e.g. a retried append); folding it again would skew the figures
+        # The interval that just ended: from the previous change, or from when the issue was opened
+        start, ended = (current[1], current[0]) if current else (opened.get(issue), old or "Open")
+        if start is not None and start <= ts:
+            state["durations"].setdefault(ended, []).append(ts - start)
+        state["status"][issue] = [new, ts]
+        day = stamp.strftime("%Y-%m-%d")
+        if new in RESOLVED_STATUSES and old not in RESOLVED_STATUSES:
+            state["closed_by_day"][day] = state["closed_by_day"].get(day, 0) + 1
+            state["resolved_at"][issue] = ts
+        elif old in RESOLVED_STATUSES and new not in RESOLVED_STATUSES:
+            state["reopened_by_day"][day] = state["reopened_by_day"].get(day, 0) + 1
+            state["resolved_at"].pop(issue, None)
+
+    def refresh(self, opened, force=False):
+        """Folds new log rows into the aggregates; returns how many rows were read.
+        opened maps issue id -> opened time, for the first status interval of each issue.
+        """
+        with self._lock:
+            if not force and time.time() - self.checked_at < ANALYTICS_REFRESH_SECONDS:
+                return 0
+            self.checked_at = time.time()
+            read = 0
+            for sheet_id, title in self._sources():
+                try:
+                    worksheet = client.worksheet(sheet_id, title)
+                except gspread.exceptions.WorksheetNotFound:
+                    continue
+                done = self.state["checkpoint"].get(title, 1) # Row 1 is the header
+                if force:
+                    sheet_cache.invalidate(worksheet) # Don't trust a cached row count
+                total = storage.row_count(worksheet)
+                if total <= done:
+                    self.state["checkpoint"].setdefault(title, done)
+                    continue
+                header = [str(h).strip() for h in storage.read_rows(worksheet, 1, 1)[0]]
+                pos = {key: header.index(col) if col in header else None for key, col in LOG_COLUMNS.items()}
+                rows = storage.read_rows(worksheet, done + 1, total, fresh=True)
+                for row in rows:
+                    self._fold(row, pos, opened)
+                self.state["checkpoint"][title] = total
+                read += len(rows)
+            if read:
+                try:
+                    self._save()
+                except OSError:
+                    pass # Kept in memory; saved with the next change
+            return read
+
+    def rebuild(self, opened):
+        """Drops the aggregates and the checkpoint and re-reads the whole log."""
+        with self._lock:
+            self.state = self._empty()
+        return self.refresh(opened, force=True)
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self.state)) # Private copy for rendering
+
+
+@st.cache_resource(show_spinner=False)
+def init_issue_analytics():
+    """Initializes the shared analytics aggregates once per process."""
+    return IssueAnalytics()
+
+
+def display_issue_analytics():
+    """Admin dashboard: open/closed over time, time in each status and ageing of open issues."""
+    st.header("Issue Analytics")
+    tracker_ws = get_sheet("tracker")
+    if tracker_ws is None:
+        return
+    df = get_issue_repository(tracker_ws).frame()
+    opened = _opened_times(df)
+    analytics = init_issue_analytics()
+
+    col1, col2 = st.columns(2)
+    with col1:
+        force = st.button("Refresh from log", key="analytics_refresh")
+    with col2:
+        rebuild = st.button("Rebuild from full log", key="analytics_rebuild",
+                            help="Re-read every log row instead of only those after the checkpoint.")
+    try:
+        read = analytics.rebuild(opened) if rebuild else analytics.refresh(opened, force=force)
+    except Exception as e:
+        st.warning(f"Could not read new log rows; showing the last saved figures. ({e})")
+        read = 0
+    state = analytics.snapshot()
+    st.caption(f"Folded {read} new log row(s) this time; {sum(state['checkpoint'].values()) - len(state['checkpoint'])} "
+               f"processed in total across {len(state['checkpoint'])} log sheet(s).")
+    if df.empty:
+        st.info("No issues in the tracker yet.")
+        return
+
+    status_col, vertical_col, priority_col = TRACKER_COLUMNS["status"], TRACKER_COLUMNS["business_vertical"], TRACKER_COLUMNS["priority"]
+    ids = df[TRACKER_COLUMNS["id"]].astype(str)
+    statuses = df[status_col].astype(str).str.strip() if status_col in df.columns else pd.Series("Open", index=df.index)
+    is_open = ~statuses.isin(RESOLVED_STATUSES)
+    resolution_days = [(state["resolved_at"][i] - opened[i]) / 86400 for i in ids[~is_open]
+                       if i in state["resolved_at"] and i in opened and state["resolved_at"][i] >= opened[i]]
+    m1, m2, m3 = st.columns(3)
+    m1.metric("Open issues", int(is_open.sum()))
+    m2.metric("Resolved / closed", int((~is_open).sum()))
+    m3.metric("Median time to resolution", f"{np.median(resolution_days):.1f} days" if resolution_days else "n/a")
+
+    st.subheader("Open and closed over time")
+    opened_days = pd.Series([datetime.fromtimestamp(opened[i]).strftime("%Y-%m-%d") for i in ids if i in opened]).value_counts()
+    daily = pd.DataFrame({"opened": opened_days,
+                          "closed": pd.Series(state["closed_by_day"], dtype=float),
+                          "reopened": pd.Series(state["reopened_by_day"], dtype=float)}).fillna(0).sort_index()
+    if daily.empty:
+        st.info("No dated issues yet.")
+    else:
+        daily.index = pd.to_datetime(daily.index)
+        totals = pd.DataFrame({"Opened (total)": daily["opened"].cumsum(),
+                               "Closed (total)": (daily["closed"] - daily["reopened"]).cumsum()})
+        totals["Open"] = totals["Opened (total)"] - totals["Closed (total)"]
+        st.line_chart(totals)
+
+    st.subheader("Median time in each status")
+    durations = state["durations"]
+    if durations:
+        st.dataframe(pd.DataFrame([{"Status": status, "Completed stays": len(values), "Median days": round(np.median(values) / 86400, 1)}
+                                   for status, values in sorted(durations.items())]),
+                     use_container_width=True, hide_index=True)
+    else:
+        st.info("No status changes logged yet.")
+
+    st.subheader("Ageing of open issues")
+    now = time.time()
+    ages = pd.Series([(now - opened[i]) / 86400 if i in opened else np.nan for i in ids], index=df.index)
+    open_df = pd.DataFrame({"Business Vertical": df.get(vertical_col, pd.Series("", index=df.index)).astype(str),
+                            "Priority": df.get(priority_col, pd.Series("", index=df.index)).astype(str),
+                            "age": ages})[is_open & ages.notna()]
+    if open_df.empty:
+        st.info("No open issues with a known opening date.")
+        return
+    labels = [label for _, label in AGEING_BUCKETS]
+    open_df["Age"] = pd.cut(open_df["age"], bins=[-np.inf] + [limit for limit, _ in AGEING_BUCKETS], labels=labels)
+    for group in ["Business Vertical", "Priority"]:
+        table = open_df.pivot_table(index=group, columns="Age", values="age", aggfunc="count", observed=False).fillna(0).astype(int)
+        st.write(f"**By {group.lower()}**")
+        st.dataframe(table.reindex(columns=labels, fill_value=0), use_container_width=True)
+
+
 # --- Authentication ---
 def login():
     """Handles user login."""
@@ -682,7 +3379,8 @@ def logout():
         # Clear blog post related session states on logout
         st.session_state.temp_blog_title = ""
         st.session_state.temp_blog_content = ""
-        st.session_state.edit_blog_idx = None
+        st.session_state.edit_blog_row = None
+        st.session_state.edit_blog_original = {}
         st.session_state.edit_blog_title = ""
         st.session_state.edit_blog_content = ""
         # Clear tracker related session states on logout
@@ -709,8 +3407,10 @@ def main():
         st.session_state.temp_blog_title = ""
     if "temp_blog_content" not in st.session_state:
         st.session_state.temp_blog_content = ""
-    if 'edit_blog_idx' not in st.session_state:
-        st.session_state.edit_blog_idx = None
+    if 'edit_blog_row' not in st.session_state:
+        st.session_state.edit_blog_row = None
+    if 'edit_blog_original' not in st.session_state:
+        st.session_state.edit_blog_original = {}
     if 'edit_blog_title' not in st.session_state:
         st.session_state.edit_blog_title = ""
     if 'edit_blog_content' not in st.session_state:
@@ -724,6 +3424,7 @@ def main():
  
     # Display login or main content based on login status
     if not st.session_state.logged_in:
+        api_metrics.set_tab("Login")
         st.write("Please log in to access the portal features.")
         login()
     else:
@@ -735,8 +3436,12 @@ def main():
         # Blog Board is now visible to all logged-in users (Admins, Chairman, and other Interns)
         if st.session_state.user_name in ADMIN_NAMES + MANAGER_NAMES:
             tabs.append("Issue Tracker")
+        if st.session_state.user_name in ADMIN_NAMES:
+            tabs.append("Issue Analytics")
  
         selected_tab = st.selectbox("Select a tab", tabs)
+        api_metrics.set_tab(selected_tab)
+        prefetch_sheets(TAB_PREFETCH.get(selected_tab, []))
  
         # Display content based on selected tab
         if selected_tab == "Tasks":
@@ -747,7 +3452,16 @@ def main():
             display_intern_profiles()
         elif selected_tab == "Issue Tracker":
             display_issue_tracker()
+        elif selected_tab == "Issue Analytics":
+            display_issue_analytics()
+
+        if st.session_state.user_name in ADMIN_NAMES:
+            display_api_diagnostics()
  
  
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    finally:
+        # Also runs when st.rerun()/st.stop() end the run early
+        api_metrics.end_rerun(st.session_state.get("user_name") or "(login)")
@@ -0,0 +1,274 @@
+"""Multi-session load test for jio.py against the in-process fake Sheets server (fake_sheets.py).
+
+Each simulated session is a Streamlit AppTest of jio.py running in its own thread, so sessions
+share the process-wide caches, request layer and background workers exactly as browser
+sessions on one server would. A session logs in, opens the Blog Board (and pages through it),
+and, for admins and managers, opens the Issue Tracker and runs a search. Every script run is
+one page view. The report gives Sheets API calls per page view, page-view latency (p50/p95)
+and quota errors, from the fake server's call log.
+
+    python jio_loadtest.py --sessions 50 --latency-ms 150 --quota-per-minute 300
+
+Sheet ids, column names and passwords are read from jio.py itself (literal assignments only),
+so the seeded workbook always matches the app.
+"""
+import argparse
+import ast
+import contextlib
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import fake_sheets
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jio.py")
+CONFIG_NAMES = ["SHEET_CONFIG", "TRACKER_COLUMNS", "RESPONSE_COLUMNS", "BLOG_COLUMNS", "LOG_COLUMNS",
+                "ADMIN_NAMES", "MANAGER_NAMES", "INTERN_NAMES", "MANAGER_VERTICALS",
+                "ADMIN_PASSWORD", "MANAGER_PASSWORD", "USER_PASSWORD"]
+
+
+def read_app_config(path=APP_PATH):
+    """Literal config assignments from jio.py, without executing the Streamlit script."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    config = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+            name = node.targets[0].id
+            if name in CONFIG_NAMES:
+                config[name] = ast.literal_eval(node.value)
+    return config
+
+
+def seed_workbook(server, config, issues, responses, posts, rand):
+    """Fills the fake server with a tracker, form responses, blog posts and an empty change log."""
+    sheets, tracker, response, blog, log = (config[name] for name in
+                                            ("SHEET_CONFIG", "TRACKER_COLUMNS", "RESPONSE_COLUMNS", "BLOG_COLUMNS", "LOG_COLUMNS"))
+    verticals = [v for names in config["MANAGER_VERTICALS"].values() for v in names]
+    start = datetime(2025, 1, 1, 9, 0, 0)
+    words = ["spectrum", "licence", "tariff", "privacy", "consent", "retail", "gst", "trai", "dot", "meity",
+             "filing", "renewal", "audit", "kyc", "tower", "fibre", "roaming", "data", "policy", "notice"]
+
+    def text(n):
+        return " ".join(rand.choice(words) for _ in range(n))
+
+    response_rows = []
+    for i in range(responses):
+        submitted = start + timedelta(hours=6 * i)
+        row = {col: "" for col in response.values()}
+        row.update({response["timestamp"]: submitted.strftime("%m/%d/%Y %H:%M:%S"),
+                    response["business_vertical"]: rand.choice(verticals),
+                    response["department_name"]: "Regulatory",
+                    response["contact_person"]: f"Contact {i}",
+                    response["email_phone"]: f"contact{i}@example.com",
+                    response["issue_title"]: text(4).title(),
+                    response["description"]: text(25),
+                    response["issue_type"]: rand.choice(["Regulatory", "Legal", "Tax"]),
+                    response["gov_body"]: rand.choice(["TRAI", "DoT", "MeitY"]),
+                    response["priority_level"]: rand.choice(["High", "Medium", "Low"]),
+                    response["date_submission"]: submitted.strftime("%Y-%m-%d")})
+        response_rows.append(list(row.values()))
+    server.seed(sheets["response"]["id"], sheets["response"]["name"], [list(response.values())] + response_rows)
+
+    tracker_rows = []
+    for i in range(issues):
+        row = {col: "" for col in tracker.values()}
+        row.update({tracker["id"]: f"Issue-{i + 1:03d}",
+                    tracker["business_vertical"]: rand.choice(verticals),
+                    tracker["team"]: "Regulatory",
+                    tracker["contact"]: f"Contact {i}",
+                    tracker["issue_title"]: text(4).title(),
+                    tracker["description"]: text(25),
+                    tracker["priority"]: rand.choice(["High", "Medium", "Low"]),
+                    tracker["status"]: rand.choice(["Open", "In Progress", "Resolved", "Closed"]),
+                    tracker["date"]: (start + timedelta(days=i % 180)).strftime("%Y-%m-%d")})
+        tracker_rows.append(list(row.values()))
+    server.seed(sheets["tracker"]["id"], sheets["tracker"]["name"], [list(tracker.values())] + tracker_rows)
+
+    authors = config["ADMIN_NAMES"] + config["INTERN_NAMES"]
+    blog_rows = [[rand.choice(authors), text(5).title(), text(60), (start + timedelta(hours=i)).strftime("%Y-%m-%d %H:%M:%S")]
+                 for i in range(posts)]
+    server.seed(sheets["blog"]["id"], sheets["blog"]["name"], [list(blog.values())] + blog_rows)
+    server.seed(sheets["log"]["id"], sheets["log"]["name"], [list(log.values())])
+
+
+class PageViews:
+    """Thread-safe record of page-view latencies and app errors, by page."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = Counter()
+        self.failed_sessions = []
+
+    def add(self, page, seconds, errors):
+        with self._lock:
+            self.latencies[page].append(seconds)
+            self.errors[page] += errors
+
+    def all(self):
+        with self._lock:
+            return [s for values in self.latencies.values() for s in values]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (0 for no values)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))]
+
+
+def prepare_concurrent_apptest():
+    """Lets AppTest sessions run in parallel threads, as browser sessions do on one server.
+    AppTest assumes one run at a time: for each run it installs a mock Runtime, patches the
+    config to test mode (both process-global, and undone when the run ends) and compiles the
+    script afresh. Here the first mock Runtime is kept for all sessions, test mode stays on for
+    the whole load test and one compiled copy of the script is shared (parallel compiles also
+    trip an AST race in CPython 3.11).
+    """
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+    from streamlit.runtime.scriptrunner import script_cache
+    from streamlit.testing.v1 import app_test, util
+
+    lock = threading.Lock()
+    pinned = {}
+    compiled = {}
+    get_bytecode = script_cache.ScriptCache.get_bytecode
+
+    def instance(cls):
+        with lock:
+            if cls._instance is not None:
+                pinned.setdefault("runtime", cls._instance)
+            if "runtime" not in pinned:
+                raise RuntimeError("Runtime hasn't been created!")
+            return pinned["runtime"]
+
+    def exists(cls):
+        return cls._instance is not None or "runtime" in pinned
+
+    def shared_get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compiled:
+                compiled[script_path] = get_bytecode(self, script_path)
+            return compiled[script_path]
+
+    # Session threads run outside a script context between runs; that is expected here
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+    config.get_option = util.build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(exists)
+    script_cache.ScriptCache.get_bytecode = shared_get_bytecode
+
+
+def run_session(user, password, is_staff, args, views, rand):
+    """Drives one session through login, Blog Board and (for staff) Issue Tracker flows."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=args.timeout)
+
+    def view(page, action=None):
+        if action is not None:
+            action()
+        started = time.perf_counter()
+        at.run()
+        views.add(page, time.perf_counter() - started, len(at.exception) + len(at.error))
+
+    def select_tab(tab):
+        [s for s in at.selectbox if s.label == "Select a tab"][0].set_value(tab)
+
+    view("login")
+    view("login", lambda: (at.sidebar.selectbox[0].set_value(user),
+                           at.sidebar.text_input[0].set_value(password),
+                           [b for b in at.sidebar.button if b.label == "Login"][0].click()))
+    for _ in range(args.iterations):
+        time.sleep(rand.uniform(0, args.think_seconds))
+        view("blog", lambda: select_tab("Blog Board"))
+        pages = [n for n in at.number_input if n.key == "blog_page"]
+        if pages and pages[0].max > 1:
+            view("blog", lambda: pages[0].set_value(rand.randint(2, int(pages[0].max))))
+        if is_staff:
+            time.sleep(rand.uniform(0, args.think_seconds))
+            view("tracker", lambda: select_tab("Issue Tracker"))
+            searches = [t for t in at.text_input if t.key == "issue_search"]
+            if searches:
+                view("tracker", lambda: searches[0].set_value(rand.choice(["spectrum", "trai lic", "privacy notice"])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent sessions to simulate")
+    parser.add_argument("--iterations", type=int, default=2, help="Blog Board / Issue Tracker rounds per session")
+    parser.add_argument("--think-seconds", type=float, default=1.0, help="max random pause between page views")
+    parser.add_argument("--latency-ms", type=float, default=fake_sheets.FAKE_LATENCY_MS, help="fake API latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=fake_sheets.FAKE_JITTER_MS, help="+/- random latency per call")
+    parser.add_argument("--error-rate", type=float, default=fake_sheets.FAKE_ERROR_RATE, help="fraction of calls answered with a 429")
+    parser.add_argument("--quota-per-minute", type=int, default=fake_sheets.FAKE_QUOTA_PER_MINUTE,
+                        help="calls per minute before the fake answers 429 (0 = no quota)")
+    parser.add_argument("--issues", type=int, default=300)
+    parser.add_argument("--responses", type=int, default=300)
+    parser.add_argument("--posts", type=int, default=60)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per page view")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Must be set before the first session imports the app
+    os.environ["JIO_FAKE_SHEETS"] = "1"
+    rand = random.Random(args.seed)
+    config = read_app_config()
+    server = fake_sheets.default_server()
+    server.latency_ms, server.jitter_ms = args.latency_ms, args.jitter_ms
+    server.error_rate, server.quota_per_minute = args.error_rate, args.quota_per_minute
+    seed_workbook(server, config, args.issues, args.responses, args.posts, rand)
+    server.reset_log()
+    prepare_concurrent_apptest()
+
+    staff = [(name, config["ADMIN_PASSWORD"]) for name in config["ADMIN_NAMES"]] + \
+            [(name, config["MANAGER_PASSWORD"]) for name in config["MANAGER_NAMES"]]
+    interns = [(name, config["USER_PASSWORD"]) for name in config["INTERN_NAMES"]]
+    users = staff + interns
+    views = PageViews()
+
+    def worker(i):
+        user, password = users[i % len(users)]
+        try:
+            run_session(user, password, (user, password) in staff, args, views, random.Random(args.seed + i))
+        except Exception as e:
+            with views._lock:
+                views.failed_sessions.append(f"{user}: {type(e).__name__}: {e}\n{traceback.format_exc()}")
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,), name=f"session-{i}") for i in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    summary = server.summary()
+    latencies = views.all()
+    n_views = len(latencies)
+    print(f"Sessions: {args.sessions}   page views: {n_views}   wall time: {elapsed:.1f}s")
+    print(f"Sheets API calls: {summary['calls']}   per page view: {summary['calls'] / max(n_views, 1):.2f}")
+    for method, count in summary["by_method"].most_common():
+        print(f"  {method:<20}{count}")
+    print(f"Page view latency: p50 {percentile(latencies, 50) * 1000:.0f} ms   p95 {percentile(latencies, 95) * 1000:.0f} ms")
+    for page, values in sorted(views.latencies.items()):
+        print(f"  {page:<10}{len(values):>5} views   p50 {percentile(values, 50) * 1000:>7.0f} ms   "
+              f"p95 {percentile(values, 95) * 1000:>7.0f} ms   app errors {views.errors[page]}")
+    print(f"Quota errors (429) served: {summary['by_status'].get(429, 0)}")
+    for failure in views.failed_sessions:
+        print(f"  failed session - {failure}")
+    return 1 if views.failed_sessions or sum(views.errors.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
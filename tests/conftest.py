@@ -0,0 +1,71 @@
+"""Runs jio.py against the in-process fake Sheets server (fake_sheets.py).
+
+jio is imported once, like a Streamlit server process would; the portal fixture swaps its
+process-wide caches and writers for fresh ones and empties the fake server, so every test
+starts from the workbook it seeds.
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["JIO_FAKE_SHEETS"] = "1"
+os.environ.setdefault("FAKE_SHEETS_LATENCY_MS", "0")
+os.environ.setdefault("FAKE_SHEETS_JITTER_MS", "0")
+os.environ.setdefault("SHEETS_REQUESTS_PER_MINUTE", "100000") # Tests don't model the quota
+os.environ.setdefault("SHEETS_BURST", "1000")
+
+import fake_sheets # noqa: E402
+import jio # noqa: E402
+
+TRACKER = jio.SHEET_CONFIG["tracker"]
+RESPONSE = jio.SHEET_CONFIG["response"]
+LOG = jio.SHEET_CONFIG["log"]
+
+
+def tracker_row(**fields):
+    """A tracker row in sheet column order, from TRACKER_COLUMNS keys."""
+    return [fields.get(key, "") for key in jio.TRACKER_COLUMNS]
+
+
+def response_row(**fields):
+    """A form-response row in sheet column order, from RESPONSE_COLUMNS keys."""
+    return [fields.get(key, "") for key in jio.RESPONSE_COLUMNS]
+
+
+@pytest.fixture
+def server():
+    server = fake_sheets.default_server()
+    server.clear()
+    return server
+
+
+@pytest.fixture
+def portal(server, tmp_path, monkeypatch):
+    """The jio module with fresh shared state and an empty log spreadsheet."""
+    jio.client.refresh() # Handles from an earlier test point at sheets that are gone
+    search_index, issue_repository = jio.SearchIndex(), jio.IssueRepository()
+    monkeypatch.setattr(jio, "sheet_cache", jio.SheetReadCache(jio.SHEET_CACHE_TTL_SECONDS))
+    monkeypatch.setattr(jio, "change_probe", type(jio.change_probe)())
+    monkeypatch.setattr(jio, "search_index", search_index)
+    monkeypatch.setattr(jio, "issue_repository", issue_repository)
+    monkeypatch.setattr(jio, "WRITE_LISTENERS", [search_index, issue_repository])
+    monkeypatch.setattr(jio, "response_headers", {})
+    monkeypatch.setattr(jio.AuditLogPartitions, "_maybe_rotate", lambda self, month: None)
+    monkeypatch.setattr(jio, "audit_log", jio.AuditLogWriter(str(tmp_path / "audit_log_spill.jsonl"),
+                                                             jio.AuditLogPartitions(LOG["id"])))
+    server.seed(LOG["id"], LOG["name"], [jio.LOG_HEADER])
+    return jio
+
+
+def seed_tracker(server, rows):
+    return server.seed(TRACKER["id"], TRACKER["name"], [list(jio.TRACKER_COLUMNS.values())] + rows)
+
+
+def seed_responses(server, rows):
+    return server.seed(RESPONSE["id"], RESPONSE["name"], [list(jio.RESPONSE_COLUMNS.values())] + rows)
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from conftest import TRACKER, seed_tracker, tracker_row
+
+
+def frame(rows, columns=("A", "B", "C")):
+    return pd.DataFrame(rows, columns=list(columns), dtype=object)
+
+
+def test_diff_ranges_unchanged_frame_sends_nothing(portal):
+    df = frame([["1", "2", "3"], ["4", "5", "6"]])
+    assert portal.diff_ranges(df, df.copy()) == []
+
+
+def test_diff_ranges_coalesces_runs_and_rows(portal):
+    original = frame([["1", "2", "3"], ["4", "5", "6"], ["7", "8", "9"]])
+    modified = original.copy()
+    modified.iloc[0, 1:] = ["x", "y"] # One run of two cells ...
+    modified.iloc[1, 1:] = ["z", "w"] # ... continued on the next row with the same columns
+    modified.iloc[2, 0] = "q"
+    assert portal.diff_ranges(original, modified) == [
+        {"range": "B2:C3", "values": [["x", "y"], ["z", "w"]]},
+        {"range": "A4", "values": [["q"]]},
+    ]
+
+
+def test_diff_ranges_writes_appended_rows_whole(portal):
+    original = frame([["1", "2", "3"]])
+    modified = frame([["1", "2", "3"], ["4", "", "6"]])
+    assert portal.diff_ranges(original, modified) == [{"range": "A3:C3", "values": [["4", "", "6"]]}]
+
+
+def test_diff_ranges_treats_nan_as_blank(portal):
+    original = frame([["1", None, "3"]])
+    modified = frame([["1", "", "3"]])
+    assert portal.diff_ranges(original, modified) == []
+
+
+def test_diff_ranges_refuses_structural_changes(portal):
+    original = frame([["1", "2", "3"], ["4", "5", "6"]])
+    assert portal.diff_ranges(original, original.iloc[:1]) is None # Rows removed
+    assert portal.diff_ranges(original, original.rename(columns={"C": "D"})) is None
+    assert portal.diff_ranges(frame([]), original) is None
+
+
+def test_write_dataframe_changes_sends_one_batch_update(portal, server):
+    seed_tracker(server, [tracker_row(id=f"Issue-{i:03d}", status="Open") for i in range(1, 21)])
+    worksheet = portal.get_sheet("tracker")
+    original = portal.get_dataframe_from_sheet(worksheet)
+    modified = original.copy()
+    modified.at[4, portal.TRACKER_COLUMNS["status"]] = "Closed"
+    server.reset_log()
+
+    assert portal.write_dataframe_changes(worksheet, original, modified)
+    assert [call[1] for call in server.calls] == ["batch_update"]
+    status = list(portal.TRACKER_COLUMNS).index("status")
+    assert [row[status] for row in server.rows(TRACKER["id"], TRACKER["name"])[1:]] == ["Open"] * 4 + ["Closed"] + ["Open"] * 15
+
+
+def test_write_dataframe_changes_without_rewrite_rejects_structural_change(portal, server):
+    seed_tracker(server, [tracker_row(id="Issue-001")])
+    worksheet = portal.get_sheet("tracker")
+    original = portal.get_dataframe_from_sheet(worksheet)
+    server.reset_log()
+
+    assert not portal.write_dataframe_changes(worksheet, original, original.assign(Extra="x"), allow_rewrite=False)
+    assert server.calls == []
@@ -0,0 +1,108 @@
+import pytest
+
+import jio
+from conftest import TRACKER, seed_tracker, tracker_row
+
+STATUS, PRIORITY = jio.TRACKER_COLUMNS["status"], jio.TRACKER_COLUMNS["priority"]
+
+
+@pytest.fixture
+def tracker(portal, server):
+    seed_tracker(server, [
+        tracker_row(id="Issue-001", contact="A", issue_title="Spectrum", status="Open", priority="Low",
+                    updated_by="Admin", last_updated="2025-01-01 09:00:00"),
+        tracker_row(id="Issue-002", contact="B", issue_title="Tariff", status="Open", priority="High",
+                    updated_by="Admin", last_updated="2025-01-01 09:00:00"),
+    ])
+    worksheet = portal.get_sheet("tracker")
+    return worksheet, portal.get_issue_repository(worksheet)
+
+
+def base_of(repo, issue_id):
+    """The issue as the edit form captured it when opened."""
+    return dict(repo.rows([repo.position(issue_id)]).iloc[0])
+
+
+def sheet_row(server, issue_id):
+    rows = server.rows(TRACKER["id"], TRACKER["name"])
+    return next(dict(zip(rows[0], row)) for row in rows[1:] if row[0] == issue_id)
+
+
+def rewrite_sheet(server, rows):
+    """Replaces the tracker's contents in place, as someone editing the sheet directly would."""
+    worksheet = server.spreadsheet(TRACKER["id"]).worksheet(TRACKER["name"])
+    worksheet.clear()
+    worksheet.update("A1", rows)
+
+
+def edit_on_sheet(server, issue_id, **fields):
+    rows = server.rows(TRACKER["id"], TRACKER["name"])
+    row = next(row for row in rows[1:] if row[0] == issue_id)
+    for key, value in fields.items():
+        row[rows[0].index(jio.TRACKER_COLUMNS[key])] = value
+    rewrite_sheet(server, rows)
+
+
+def test_untouched_row_is_written_with_a_new_version(portal, server, tracker):
+    worksheet, repo = tracker
+    base = base_of(repo, "Issue-001")
+    server.reset_log()
+
+    applied, conflicts, error = portal.save_issue_edits(worksheet, repo, "Issue-001", base, {STATUS: "Resolved"}, "Tester")
+
+    assert (applied, conflicts, error) == ({STATUS: ("Open", "Resolved")}, {}, None)
+    row = sheet_row(server, "Issue-001")
+    assert row[STATUS] == "Resolved" and row[jio.TRACKER_COLUMNS["updated_by"]] == "Tester"
+    assert row[jio.TRACKER_COLUMNS["last_updated"]] != "2025-01-01 09:00:00"
+    assert sheet_row(server, "Issue-002")[STATUS] == "Open"
+    assert [call[1] for call in server.calls] == ["get", "batch_update"] # Re-read the row, write the cells
+
+
+def test_field_changed_by_someone_else_is_a_conflict(portal, server, tracker):
+    worksheet, repo = tracker
+    base = base_of(repo, "Issue-001")
+    edit_on_sheet(server, "Issue-001", status="Closed", updated_by="Other", last_updated="2025-02-01 10:00:00")
+
+    applied, conflicts, error = portal.save_issue_edits(
+        worksheet, repo, "Issue-001", base, {STATUS: "Resolved", PRIORITY: "High"}, "Tester")
+
+    assert error is None
+    assert conflicts == {STATUS: ("Closed", "Resolved")}
+    assert applied == {PRIORITY: ("Low", "High")} # Fields only this user changed still merge
+    row = sheet_row(server, "Issue-001")
+    assert (row[STATUS], row[PRIORITY]) == ("Closed", "High")
+
+
+def test_same_value_set_by_both_is_not_a_conflict(portal, server, tracker):
+    worksheet, repo = tracker
+    base = base_of(repo, "Issue-001")
+    edit_on_sheet(server, "Issue-001", status="Resolved", updated_by="Other", last_updated="2025-02-01 10:00:00")
+
+    applied, conflicts, error = portal.save_issue_edits(worksheet, repo, "Issue-001", base, {STATUS: "Resolved"}, "Tester")
+
+    assert (applied, conflicts, error) == ({}, {}, None)
+    assert sheet_row(server, "Issue-001")[jio.TRACKER_COLUMNS["updated_by"]] == "Other" # Nothing was written
+
+
+def test_moved_row_is_found_again(portal, server, tracker):
+    worksheet, repo = tracker
+    base = base_of(repo, "Issue-002")
+    rows = server.rows(TRACKER["id"], TRACKER["name"])
+    rewrite_sheet(server, rows[:1] + [tracker_row(id="Issue-000", status="Open")] + rows[1:])
+
+    applied, conflicts, error = portal.save_issue_edits(worksheet, repo, "Issue-002", base, {STATUS: "Closed"}, "Tester")
+
+    assert (conflicts, error) == ({}, None) and applied == {STATUS: ("Open", "Closed")}
+    assert sheet_row(server, "Issue-002")[STATUS] == "Closed"
+    assert sheet_row(server, "Issue-000")[STATUS] == "Open"
+
+
+def test_deleted_issue_reports_an_error(portal, server, tracker):
+    worksheet, repo = tracker
+    base = base_of(repo, "Issue-002")
+    rows = server.rows(TRACKER["id"], TRACKER["name"])
+    rewrite_sheet(server, rows[:2])
+
+    applied, conflicts, error = portal.save_issue_edits(worksheet, repo, "Issue-002", base, {STATUS: "Closed"}, "Tester")
+
+    assert (applied, conflicts) == ({}, {}) and error == "This issue no longer exists in the tracker."
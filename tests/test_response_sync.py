@@ -0,0 +1,107 @@
+import pytest
+
+import jio
+from conftest import RESPONSE, TRACKER, response_row, seed_responses, seed_tracker, tracker_row
+
+EMAIL = jio.TRACKER_COLUMNS["email_phone"]
+
+
+def response(i, **fields):
+    return response_row(timestamp=f"01/0{i}/2025 09:00:00", contact_person=f"Contact {i}",
+                        issue_title=f"Issue {i}", email_phone=f"c{i}@example.com", **fields)
+
+
+def issue(i):
+    return tracker_row(id=f"Issue-{i:03d}", contact=f"Contact {i}", issue_title=f"Issue {i}", status="Open")
+
+
+def tracker_emails(server):
+    rows = server.rows(TRACKER["id"], TRACKER["name"])
+    return [row[rows[0].index(EMAIL)] for row in rows[1:]]
+
+
+def state(portal):
+    return portal.read_sync_state(portal.get_sync_state_worksheet())
+
+
+@pytest.fixture
+def workbook(portal, server):
+    seed_tracker(server, [issue(i) for i in range(1, 5)])
+    seed_responses(server, [response(1), response(2)])
+    return server
+
+
+def test_first_sync_fills_blanks_and_sets_the_watermark(portal, workbook):
+    level, _ = portal.sync_responses()
+
+    assert level == "success"
+    assert tracker_emails(workbook) == ["c1@example.com", "c2@example.com", "", ""]
+    saved = state(portal)
+    assert (saved["response_row"], saved["response_timestamp"]) == (3, "01/02/2025 09:00:00")
+    assert saved["last_full_scan"]
+
+
+def test_next_sync_reads_only_rows_after_the_watermark(portal, workbook):
+    portal.sync_responses()
+    workbook.spreadsheet(RESPONSE["id"]).worksheet(RESPONSE["name"]).append_rows([response(3)])
+    workbook.reset_log()
+
+    level, _ = portal.sync_responses()
+
+    assert level == "success"
+    assert tracker_emails(workbook)[2] == "c3@example.com"
+    response_reads = [call[1] for call in workbook.calls if call[3] == RESPONSE["name"]]
+    assert "get_all_records" not in response_reads and "get" in response_reads
+    assert state(portal)["response_row"] == 4
+
+
+def test_changed_watermark_row_falls_back_to_a_full_rescan(portal, workbook):
+    portal.sync_responses()
+    worksheet = workbook.spreadsheet(RESPONSE["id"]).worksheet(RESPONSE["name"])
+    worksheet.update("A3", [["01/09/2025 09:00:00"]]) # The watermark row's timestamp no longer matches
+    workbook.reset_log()
+
+    portal.sync_responses()
+
+    assert "get_all_records" in [call[1] for call in workbook.calls if call[3] == RESPONSE["name"]]
+    assert state(portal)["response_timestamp"] == "01/09/2025 09:00:00"
+
+
+def test_failed_rescan_read_keeps_the_sync_state(portal, workbook, monkeypatch):
+    portal.sync_responses()
+    before = state(portal)
+    read = portal.storage.read
+
+    def failing_read(worksheet, ttl=None):
+        if worksheet.title == RESPONSE["name"]:
+            raise RuntimeError("backend unavailable")
+        return read(worksheet, ttl)
+    monkeypatch.setattr(portal.storage, "read", failing_read)
+
+    level, message = portal.sync_responses(full_rescan=True)
+
+    assert level == "error" and "backend unavailable" in message
+    assert state(portal) == before
+
+
+def test_failed_tracker_write_does_not_advance_the_watermark(portal, workbook, monkeypatch):
+    monkeypatch.setattr(portal, "write_dataframe_changes", lambda *args, **kwargs: False)
+
+    level, _ = portal.sync_responses()
+
+    assert level == "error"
+    assert state(portal)["response_row"] == 1
+    assert tracker_emails(workbook) == ["", "", "", ""]
+
+
+def test_large_fill_is_written_as_cells_not_a_rewrite(portal, workbook):
+    seed_responses(workbook, [response(i, description="d", issue_type="Legal", gov_body="TRAI", priority_level="High",
+                                        proposed_resolution="r", date_submission="2025-01-01") for i in range(1, 5)])
+    workbook.reset_log()
+
+    portal.sync_responses() # Fills most of every row: far past FULL_REWRITE_FRACTION of the cells
+
+    tracker_writes = [call[1] for call in workbook.calls if call[2] == TRACKER["id"] and call[3] == TRACKER["name"]
+                      and call[1] in ("update", "batch_update")]
+    assert tracker_writes == ["batch_update"]
+    assert tracker_emails(workbook) == [f"c{i}@example.com" for i in range(1, 5)]